@@ -4,51 +4,66 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+import storage
+import instrumentation
 
 class Base(DeclarativeBase):
     pass
 
 db = SQLAlchemy(model_class=Base)
 
-# create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Set up absolute path for the database
 basedir = os.path.abspath(os.path.dirname(__file__))
 instance_path = os.path.join(basedir, 'instance')
-db_path = os.path.join(instance_path, 'financial_tracker.db')
-
-# Create instance directory if it doesn't exist
-os.makedirs(instance_path, exist_ok=True)
-
-# configure SQLite database with absolute path
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# initialize the app with the extension
-db.init_app(app)
 
-with app.app_context():
-    # Make sure to import the models here or their tables won't be created
-    import models  # noqa: F401
-    
-    db.create_all()
 
-
-@app.template_filter('strftime')
 def strftime_filter(date, format='%b %d, %Y'):
     if isinstance(date, str):
         return date
     return date.strftime(format)
 
-# Import routes after app creation
-import routes  # noqa: F401
\ No newline at end of file
+
+def create_app():
+    """
+    Build the Flask application
+
+    Worker boot only configures the app: the schema is created and migrated
+    by `flask migrate-db` (run it once per deploy), or here when AUTO_MIGRATE
+    is set for single-process setups. NumPy and the forecasting stack are
+    imported by the first request that needs them.
+
+    Returns:
+        Flask: The configured application
+    """
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Database URI and engine tuning come from the storage profile (see storage.py)
+    storage.configure_storage(app, instance_path)
+    instrumentation.configure_instrumentation(app)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # initialize the app with the extension
+    db.init_app(app)
+
+    with app.app_context():
+        import models  # noqa: F401
+
+        storage.init_engine(app, db)
+        instrumentation.init_instrumentation(app, db)
+        if os.environ.get('AUTO_MIGRATE', '0').lower() in ('1', 'true', 'yes'):
+            import migrations
+            migrations.upgrade_schema()
+
+    app.add_template_filter(strftime_filter, 'strftime')
+
+    import routes
+    import commands
+    import http_cache
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(commands.bp)
+    http_cache.init_http_cache(app)
+
+    return app
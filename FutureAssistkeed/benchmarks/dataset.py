@@ -0,0 +1,30 @@
+"""
+Seeded benchmark datasets built with synthetic_data.py.
+
+A dataset of `count` rows is a mixed-profile population whose history
+grows with the row count (45 days minimum, 3 years maximum). Users are
+added until `count` rows exist, so large datasets are dense rather than
+centuries long. History ends today, so the recent windows the calculators
+read always have data.
+
+The generator (and with it the app) is imported on first use, so the
+suite's parent process can read DATASET_VERSION without binding an engine.
+"""
+
+# Bump when the generated data changes, so cached benchmark databases are rebuilt
+DATASET_VERSION = 2
+
+
+def history_days_for(count):
+    return int(min(max(45, count // 3), 3 * 365))
+
+
+def seed_database(count, seed=0, chunk_size=50000, progress=None):
+    """Bulk-insert `count` generated transactions into the current database"""
+    from synthetic_data import generate_dataset
+
+    summary = generate_dataset(
+        seed=seed, users=None, years=history_days_for(count) / 365, profile='mixed',
+        max_rows=count, chunk_size=chunk_size, progress=progress
+    )
+    return summary['rows']
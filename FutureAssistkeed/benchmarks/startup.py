@@ -0,0 +1,115 @@
+"""
+Worker start-up cost: WSGI import and cold gunicorn workers.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --skip-gunicorn
+
+Two measurements, each repeated --runs times in fresh processes:
+
+- wsgi_import: `import main` in a new interpreter, i.e. what every worker
+  pays before it can serve. Also reports the modules loaded by then, so a
+  heavy import creeping back onto the boot path shows up, and the time of
+  the first dashboard request, which loads NumPy and the forecast engine.
+- gunicorn_cold_worker: from starting gunicorn with one worker to the first
+  200 response on a cheap route.
+
+Both run against a throwaway SQLite database migrated beforehand, as a
+deploy would with `flask migrate-db`.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load when a request needs them
+HEAVY_MODULES = ('numpy', 'pandas', 'services.forecast_engine', 'services.forecasting', 'synthetic_data')
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+status = main.app.test_client().get('/').status_code
+print(json.dumps({{
+    'import_seconds': imported - started,
+    'first_request_seconds': time.perf_counter() - imported,
+    'first_request_status': status,
+    'loaded_at_import': loaded,
+}}))
+"""
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'median_s': statistics.median(values), 'min_s': values[0], 'max_s': values[-1], 'runs': len(values)}
+
+
+def wsgi_import(env, runs):
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=APP_DIR, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        'import': summarize([sample['import_seconds'] for sample in samples]),
+        'first_request': summarize([sample['first_request_seconds'] for sample in samples]),
+        'loaded_at_import': samples[-1]['loaded_at_import'],
+    }
+
+
+def gunicorn_cold_worker(env, runs, port):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}',
+             '--log-level', 'warning', 'main:app'],
+            cwd=APP_DIR, env=env
+        )
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError('gunicorn exited during start-up')
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/cache_stats', timeout=2):
+                        break
+                except OSError:
+                    time.sleep(0.01)
+            samples.append(time.perf_counter() - started)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return summarize(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement.')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--skip-gunicorn', action='store_true', help='Only measure the WSGI import.')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+        env.pop('AUTO_MIGRATE', None)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'migrate-db'],
+                       cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+
+        report = {'python': sys.version.split()[0], 'wsgi_import': wsgi_import(env, args.runs)}
+        if not args.skip_gunicorn:
+            report['gunicorn_cold_worker'] = gunicorn_cold_worker(env, args.runs, args.port)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
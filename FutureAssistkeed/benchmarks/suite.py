@@ -0,0 +1,284 @@
+"""
+Benchmark suite for the calculator, forecasting, categorization and routes.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 1000,100000 --output results.json
+    python -m benchmarks.suite --output results.json --baseline benchmarks/baseline.json
+
+Each dataset size (1k, 100k and 1M transactions by default, generated by
+synthetic_data.py through benchmarks/dataset.py) runs in its own
+interpreter against its own SQLite database, since the app binds its
+engine when it is created. Databases are kept in --data-dir by size, seed
+and dataset version, so only the first run pays for seeding. Every timed
+call starts with the forecast cache cleared, so the numbers measure
+computation rather than cache hits.
+
+Results are JSON. With --baseline, any benchmark whose median is more than
+--tolerance slower than the baseline (and at least --min-delta-ms slower
+in absolute terms) is reported, and the exit status is 1.
+benchmarks/baseline.json is a reference run; timings only compare on the
+same machine, so regenerate it with --output where the check runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.dataset import DATASET_VERSION
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+ROUTES = (
+    ('route_dashboard', '/'),
+    ('route_transactions', '/transactions'),
+    ('route_transactions_filtered', '/transactions?type=expense&category=food'),
+    ('route_forecast', '/forecast'),
+    ('route_chart_data', '/api/chart_data'),
+    ('route_chart_data_365', '/api/chart_data?range=365'),
+    ('route_probabilistic_forecast', '/api/forecast/probabilistic?days=90&paths=10000'),
+)
+
+
+def time_call(function, repeat, warmup=1, before=None):
+    """Run function warmup + repeat times; timings in milliseconds"""
+    timings = []
+    for iteration in range(warmup + repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - started) * 1000
+        if iteration >= warmup:
+            timings.append(elapsed)
+
+    timings.sort()
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': timings[0],
+        'p95_ms': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        'repeat': repeat
+    }
+
+
+def build_benchmarks(app):
+    """Ordered {name: callable} for the loaded app"""
+    from models import Transaction
+    import transaction_frame
+    import rolling_stats
+    from financial_calculator import FinancialCalculator
+    from services.categorization import categorize_transaction
+    from services.forecasting import generate_forecast
+    from services.alerts import LEDGER_USER_ID
+    from sample_data import INCOME_SOURCES, EXPENSE_CATEGORIES
+
+    descriptions = [source[0] for source in INCOME_SOURCES] + [expense[0] for expense in EXPENSE_CATEGORIES]
+    samples = [(descriptions[i % len(descriptions)] + f' #{i % 97}', (-1) ** i * (50 + i % 900))
+               for i in range(1000)]
+
+    def categorize_1000():
+        for description, amount in samples:
+            categorize_transaction(description, amount)
+
+    functions = {
+        'get_current_balance': Transaction.get_current_balance,
+        'calculate_moving_average': FinancialCalculator.calculate_moving_average,
+        'forecast_balance': FinancialCalculator.forecast_balance,
+        'forecast_balance_365': lambda: FinancialCalculator.forecast_balance(365),
+        'generate_alerts': FinancialCalculator.generate_alerts,
+        'get_chart_data': FinancialCalculator.get_chart_data,
+        'get_chart_data_all': lambda: FinancialCalculator.get_chart_data(None),
+        'categorize_transaction_x1000': categorize_1000,
+    }
+
+    def load_frame():
+        transaction_frame.reset()
+        transaction_frame.current_frame()
+    functions['transaction_frame_load'] = load_frame
+
+    def build_rolling_stats():
+        frame = transaction_frame.current_frame()
+        rolling_stats.RollingStats.from_frame(frame, transaction_frame.day_number(datetime.now()))
+    functions['rolling_stats_build'] = build_rolling_stats
+    functions['rolling_window_stats_30'] = lambda: rolling_stats.window_stats(30)
+
+    # The production entry point, history read included; a failure would be
+    # logged and answered with an empty forecast, as in a request
+    functions['generate_forecast'] = lambda: generate_forecast(LEDGER_USER_ID, days=30)
+
+    # Each call gets its own app context (and so a fresh session and g), like
+    # a request; routes must run outside one or requests would share g
+    def in_app_context(function):
+        def run():
+            with app.app_context():
+                function()
+        return run
+
+    benchmarks = {name: in_app_context(function) for name, function in functions.items()}
+
+    client = app.test_client()
+    for name, path in ROUTES:
+        def get(path=path):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {path} returned {response.status_code}')
+        benchmarks[name] = get
+
+    # Revalidation of an unchanged dashboard, and a compressed chart payload
+    etags = {}
+    def revalidate_dashboard():
+        if '/' not in etags:
+            etags['/'] = client.get('/').headers['ETag']
+        response = client.get('/', headers={'If-None-Match': etags['/']})
+        if response.status_code != 304:
+            raise RuntimeError(f'GET / revalidation returned {response.status_code}')
+    benchmarks['route_dashboard_revalidate'] = revalidate_dashboard
+
+    def chart_data_gzip():
+        response = client.get('/api/chart_data?range=365', headers={'Accept-Encoding': 'gzip'})
+        if response.status_code != 200:
+            raise RuntimeError(f'GET /api/chart_data returned {response.status_code}')
+    benchmarks['route_chart_data_365_gzip'] = chart_data_gzip
+
+    return benchmarks
+
+
+def run_size(size, seed, database, repeat):
+    """Seed (if needed) and benchmark one dataset size in this interpreter"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ.setdefault('STORAGE_PROFILE', 'sqlite')
+
+    from app import create_app, db
+    from models import Transaction
+    from cache import forecast_cache
+    from benchmarks.dataset import seed_database
+    import migrations
+    import transaction_frame
+
+    app = create_app()
+    result = {'size': size, 'seed': seed, 'benchmarks': {}}
+    with app.app_context():
+        migrations.upgrade_schema()
+        if Transaction.query.count() != size:
+            db.drop_all()
+            migrations.upgrade_schema()
+            started = time.perf_counter()
+            seed_database(size, seed=seed)
+            result['seed_seconds'] = time.perf_counter() - started
+        benchmarks = build_benchmarks(app)
+
+    with app.app_context():
+        frame = transaction_frame.current_frame()
+        result['transaction_frame'] = {
+            'rows': len(frame),
+            'bytes': frame.nbytes,
+            'mb_per_100k_rows': frame.nbytes / max(len(frame), 1) * 100000 / 2 ** 20
+        }
+
+    for name, function in benchmarks.items():
+        result['benchmarks'][name] = time_call(function, repeat, before=forecast_cache.clear)
+
+    return result
+
+
+def compare(current, baseline, tolerance=0.25, min_delta_ms=1.0):
+    """Benchmarks whose median regressed beyond tolerance versus the baseline"""
+    regressions = []
+    for size, entry in current['results'].items():
+        base_entry = baseline.get('results', {}).get(size)
+        if base_entry is None:
+            continue
+        for name, stats in entry['benchmarks'].items():
+            base = base_entry['benchmarks'].get(name)
+            if not base or 'median_ms' not in base or 'median_ms' not in stats:
+                continue
+            delta = stats['median_ms'] - base['median_ms']
+            if delta > min_delta_ms and stats['median_ms'] > base['median_ms'] * (1 + tolerance):
+                regressions.append({
+                    'size': size,
+                    'benchmark': name,
+                    'baseline_ms': base['median_ms'],
+                    'current_ms': stats['median_ms'],
+                    'ratio': stats['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+                })
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated transaction counts.')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset seed.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (after one warm-up).')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'futureassist-bench'),
+                        help='Where seeded databases are kept between runs.')
+    parser.add_argument('--output', help='Write the JSON results here (default: stdout).')
+    parser.add_argument('--baseline', help='Results JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown, as a fraction.')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore slowdowns smaller than this.')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_size is not None:
+        print(json.dumps(run_size(args.run_size, args.seed, args.database, args.repeat)))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {}
+    }
+
+    for size in (int(size) for size in args.sizes.split(',')):
+        database = os.path.join(args.data_dir, f'bench-{size}-{args.seed}-v{DATASET_VERSION}.db')
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.suite', '--run-size', str(size), '--seed', str(args.seed),
+             '--database', database, '--repeat', str(args.repeat)],
+            cwd=APP_DIR, stdout=subprocess.PIPE, text=True, check=True
+        )
+        results['results'][str(size)] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f'benchmarked {size} transactions', file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression['size']} {regression['benchmark']}: "
+                  f"{regression['baseline_ms']:.2f} ms -> {regression['current_ms']:.2f} ms "
+                  f"(x{regression['ratio']:.2f})", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import os
+import click
+from flask import Blueprint, current_app
+from app import db
+from models import BalanceLedger, Alert, rebuild_aggregates
+from importer import import_statement, StatementError
+import jobs
+import migrations
+import partitioning
+import storage
+
+# Commands are registered on the app's top-level `flask` group
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('check-ledger')
+@click.option('--repair', is_flag=True, help='Rebuild the ledger from the transaction table if it has drifted.')
+def check_ledger(repair):
+    """Verify the persisted balance ledger against the raw transactions"""
+    report = BalanceLedger.check_consistency(repair=repair)
+    
+    status = 'OK' if report['consistent'] else 'MISMATCH'
+    click.echo(f"Ledger {status}: ledger balance P{report['ledger_balance']:.2f} "
+               f"({report['ledger_count']} rows), actual P{report['actual_balance']:.2f} "
+               f"({report['actual_count']} rows)")
+    if report['repaired']:
+        click.echo('Ledger rebuilt from transaction table.')
+
+
+@bp.cli.command('rebuild-aggregates')
+def rebuild_aggregates_command():
+    """Recompute the balance ledger, category counts and daily_totals rollup"""
+    rebuild_aggregates()
+    db.session.commit()
+    report = BalanceLedger.check_consistency()
+    click.echo(f"Aggregates rebuilt: balance P{report['ledger_balance']:.2f} "
+               f"({report['ledger_count']} transactions)")
+
+
+@bp.cli.command('migrate-db')
+def migrate_db():
+    """Create missing tables and apply pending schema migrations"""
+    for name, result in migrations.upgrade_schema().items():
+        click.echo(f'{name}: {result}')
+
+
+@bp.cli.command('storage-info')
+def storage_info():
+    """Show the active storage profile and the engine's effective settings"""
+    click.echo(f"Profile: {current_app.config['STORAGE_PROFILE']}")
+    for name, value in storage.describe(db).items():
+        click.echo(f'{name}: {value}')
+
+
+@bp.cli.command('partition-transactions')
+@click.option('--months-ahead', default=partitioning.MONTHS_AHEAD, show_default=True,
+              help='Future monthly partitions to create.')
+def partition_transactions_command(months_ahead):
+    """Convert the transaction table to monthly range partitions (PostgreSQL)"""
+    try:
+        created = partitioning.partition_transactions(months_ahead=months_ahead)
+    except partitioning.PartitioningError as e:
+        raise click.ClickException(str(e))
+    
+    if created is None:
+        click.echo('Transaction table is already partitioned.')
+    else:
+        click.echo(f'Partitioned transaction table into {len(created)} monthly partitions.')
+
+
+@bp.cli.command('create-partitions')
+@click.option('--months-ahead', default=partitioning.MONTHS_AHEAD, show_default=True,
+              help='Create partitions up to this many months after the current one.')
+def create_partitions(months_ahead):
+    """Create missing future monthly transaction partitions (PostgreSQL)"""
+    try:
+        created = partitioning.ensure_future_partitions(months_ahead=months_ahead)
+    except partitioning.PartitioningError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Created: {', '.join(created) if created else 'none'}")
+
+
+@bp.cli.command('list-partitions')
+def list_partitions():
+    """List attached transaction partitions with their bounds"""
+    try:
+        partitions = partitioning.list_partitions()
+    except partitioning.PartitioningError as e:
+        raise click.ClickException(str(e))
+    for partition in partitions:
+        click.echo(f"{partition['name']}: {partition['bounds']} (~{partition['rows']} rows)")
+
+
+@bp.cli.command('detach-partition')
+@click.argument('month')
+def detach_partition(month):
+    """Detach the MONTH (YYYY-MM) transaction partition for archiving"""
+    try:
+        result = partitioning.detach_partition(partitioning.parse_month(month))
+    except partitioning.PartitioningError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Detached {result['partition']} ({result['rows']} rows); "
+               f"it is now a standalone table ready for pg_dump.")
+
+
+@bp.cli.command('check-indexes')
+@click.option('--verbose', is_flag=True, help='Print the full query plan for each query.')
+def check_indexes(verbose):
+    """EXPLAIN the hot Transaction queries and verify each uses its index"""
+    report = migrations.check_index_usage()
+    
+    for entry in report:
+        status = 'OK' if entry['uses_index'] else 'NOT USED'
+        click.echo(f"{entry['query']}: {entry['index']} {status}")
+        if verbose:
+            click.echo(entry['plan'])
+    
+    if not all(entry['uses_index'] for entry in report):
+        raise SystemExit(1)
+
+
+@bp.cli.command('import-statement')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'statement_format', type=click.Choice(['csv', 'ofx', 'qfx']),
+              help='Statement format (defaults to the file extension).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per bulk insert and commit.')
+def import_statement_command(path, statement_format, chunk_size):
+    """Stream a CSV or OFX bank statement into the transaction table"""
+    statement_format = statement_format or os.path.splitext(path)[1].lstrip('.').lower()
+    
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as stream:
+        def progress(summary):
+            click.echo(f"\r{summary['imported']} rows imported ({summary['skipped']} skipped)", nl=False)
+        
+        try:
+            summary = import_statement(stream, statement_format, chunk_size=chunk_size, progress=progress)
+        except StatementError as e:
+            click.echo()
+            imported = (e.summary or {}).get('imported', 0)
+            raise click.ClickException(f'{e} ({imported} rows before it were imported)')
+    
+    click.echo()
+    click.echo(f"Imported {summary['imported']} transactions: income P{summary['income']:.2f}, "
+               f"expenses P{summary['expenses']:.2f}")
+
+
+@bp.cli.command('generate-data')
+@click.option('--seed', default=0, show_default=True, help='Dataset seed; same inputs give the same rows.')
+@click.option('--users', default=1, show_default=True, help='Independent user histories to generate.')
+@click.option('--years', default=1.0, show_default=True, help='Years of history per user.')
+@click.option('--profile', default='mixed', show_default=True,
+              help='Income profile of the generated users: salaried, irregular, informal or mixed.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Last day of history (default today); pin it for reproducible datasets.')
+@click.option('--max-rows', type=int, help='Stop after this many rows.')
+@click.option('--replace', is_flag=True, help='Delete all existing transactions first.')
+@click.option('--chunk-size', default=50000, show_default=True, help='Rows per bulk insert and commit.')
+def generate_data(seed, users, years, profile, end_date, max_rows, replace, chunk_size):
+    """Bulk-insert a seeded synthetic transaction history"""
+    # NumPy is only needed here, so it is not loaded with the other commands
+    from synthetic_data import generate_dataset, INCOME_PROFILES
+    if profile != 'mixed' and profile not in INCOME_PROFILES:
+        raise click.BadParameter(f'expected one of {", ".join(INCOME_PROFILES)} or mixed', param_hint='--profile')
+    
+    def progress(inserted):
+        click.echo(f'\r{inserted} rows inserted', nl=False)
+    
+    summary = generate_dataset(
+        seed=seed, users=users, years=years, profile=profile,
+        end_date=end_date.date() if end_date else None, max_rows=max_rows,
+        replace=replace, chunk_size=chunk_size, progress=progress
+    )
+    click.echo()
+    click.echo(f"Generated {summary['rows']} transactions; balance P{summary['balance']:.2f}")
+
+
+@bp.cli.command('run-worker')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when no job is due.')
+@click.option('--batch-size', default=10, show_default=True, help='Jobs claimed per poll.')
+@click.option('--once', is_flag=True, help='Exit once no job is due instead of polling.')
+def run_worker(poll_interval, batch_size, once):
+    """Process background jobs (alert evaluation) from the jobs table"""
+    click.echo(f'Worker started; queue: {jobs.queue_stats()}')
+    processed = jobs.work(poll_interval=poll_interval, batch_size=batch_size, once=once)
+    click.echo(f'Worker stopped after {processed} jobs; queue: {jobs.queue_stats()}')
+
+
+@bp.cli.command('compact-alerts')
+@click.option('--days', default=30, show_default=True, help='Keep inactive alerts raised within this many days.')
+def compact_alerts(days):
+    """Delete inactive alerts older than the retention window"""
+    deleted = Alert.compact(retention_days=days)
+    click.echo(f'Deleted {deleted} inactive alerts older than {days} days')
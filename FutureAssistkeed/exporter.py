@@ -0,0 +1,80 @@
+"""
+Streaming export of the transaction history (CSV or NDJSON, optionally gzip).
+
+Rows are read through a server-side cursor (yield_per) as plain column
+tuples and encoded batch by batch, so memory stays constant however many
+rows are exported.
+"""
+
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import select
+from app import db
+from models import Transaction
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+EXPORT_COLUMNS = ('id', 'date_created', 'description', 'amount', 'transaction_type', 'category')
+
+BATCH_SIZE = 1000
+
+
+def iter_rows(transaction_type='all', category='all', batch_size=BATCH_SIZE):
+    """Yield lists of row tuples, oldest first, batch_size rows at a time"""
+    statement = select(*(getattr(Transaction, column) for column in EXPORT_COLUMNS))
+    statement = Transaction.apply_filters(statement, transaction_type, category)
+    statement = statement.order_by(Transaction.date_created.asc(), Transaction.id.asc())
+
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def encode_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        for row in batch:
+            writer.writerow((row[0], row[1].isoformat() if row[1] else '', *row[2:]))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(batches):
+    for batch in batches:
+        yield ''.join(
+            json.dumps({
+                'id': row[0],
+                'date_created': row[1].isoformat() if row[1] else None,
+                'description': row[2],
+                'amount': row[3],
+                'transaction_type': row[4],
+                'category': row[5]
+            }) + '\n'
+            for row in batch
+        )
+
+
+def gzip_chunks(chunks):
+    """Incrementally gzip an iterable of byte strings"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(export_format='csv', transaction_type='all', category='all', compress=False):
+    """Byte chunks of the encoded export, ready for a streaming response"""
+    encoder = encode_csv if export_format == 'csv' else encode_ndjson
+    chunks = (text.encode('utf-8') for text in encoder(iter_rows(transaction_type, category)) if text)
+    return gzip_chunks(chunks) if compress else chunks
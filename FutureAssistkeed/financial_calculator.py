@@ -1,51 +1,104 @@
 from models import Transaction
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract, and_
+from sqlalchemy import func, case
+from flask import g
 from app import db
+from models import BalanceLedger, DailyTotal
+from cache import forecast_cache
 import statistics
 
+# Monday-first expense multipliers for the dashboard forecast (weekends +20%)
+WEEKEND_EXPENSE_FACTORS = (1.0, 1.0, 1.0, 1.0, 1.0, 1.2, 1.2)
+
+
+class FinancialSnapshot:
+    """Request-scoped memo of the figures the dashboard and alerts share.
+    
+    Each figure (balance, monthly summary, moving averages, each forecast
+    horizon, alerts) is computed at most once per snapshot; every
+    FinancialCalculator entry point accepts one via `snapshot=`. Forecasts,
+    alerts and chart data are additionally shared across requests through
+    forecast_cache, keyed by the ledger version and today's date.
+    """
+    
+    def __init__(self, window_days=30):
+        self.window_days = window_days
+        self._values = {}
+    
+    @staticmethod
+    def for_request():
+        """Return the snapshot bound to the current request, creating it once"""
+        if 'financial_snapshot' not in g:
+            g.financial_snapshot = FinancialSnapshot()
+        return g.financial_snapshot
+    
+    def cached(self, key, compute):
+        if key not in self._values:
+            self._values[key] = compute()
+        return self._values[key]
+    
+    def versioned(self, key, compute):
+        """Memoize per request and in the cross-request ledger-versioned LRU"""
+        cache_key = (self.ledger_version, datetime.now().date()) + key
+        return self.cached(key, lambda: forecast_cache.get_or_compute(cache_key, compute))
+    
+    @property
+    def ledger_state(self):
+        def read_ledger():
+            ledger = BalanceLedger.get()
+            return ledger.balance, ledger.version
+        return self.cached('ledger_state', read_ledger)
+    
+    @property
+    def current_balance(self):
+        return self.ledger_state[0]
+    
+    @property
+    def ledger_version(self):
+        return self.ledger_state[1]
+    
+    @property
+    def monthly_summary(self):
+        return self.cached('monthly_summary', Transaction.get_monthly_summary)
+    
+    @property
+    def averages(self):
+        return FinancialCalculator.calculate_moving_average(self.window_days, snapshot=self)
+    
+    def forecast(self, days_ahead=30):
+        return FinancialCalculator.forecast_balance(days_ahead, snapshot=self)
+    
+    @property
+    def alerts(self):
+        return FinancialCalculator.generate_alerts(snapshot=self)
+
+
 class FinancialCalculator:
     
     @staticmethod
-    def calculate_moving_average(days=30):
+    def calculate_moving_average(days=30, snapshot=None):
         """Calculate moving average for income and expenses with daily analysis"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Get all transactions within the period
-        transactions = Transaction.query.filter(
-            Transaction.date_created >= start_date,
-            Transaction.date_created <= end_date
-        ).order_by(Transaction.date_created.asc()).all()
-        
-        # Create daily totals for all days in the period
-        daily_data = {}
-        current_date = start_date.date()
-        
-        while current_date <= end_date.date():
-            daily_data[current_date] = {'income': 0, 'expenses': 0}
-            current_date += timedelta(days=1)
-        
-        # Fill in actual transaction data
-        for transaction in transactions:
-            date_key = transaction.date_created.date()
-            if transaction.transaction_type == 'income':
-                daily_data[date_key]['income'] += transaction.amount
-            else:
-                daily_data[date_key]['expenses'] += transaction.amount
-        
-        # Calculate daily patterns and averages
-        daily_incomes = [data['income'] for data in daily_data.values()]
-        daily_expenses = [data['expenses'] for data in daily_data.values()]
-        daily_nets = [data['income'] - data['expenses'] for data in daily_data.values()]
-        
-        # Calculate statistics
-        avg_income = statistics.mean(daily_incomes) if daily_incomes else 0
-        avg_expenses = statistics.mean(daily_expenses) if daily_expenses else 0
-        median_expenses = statistics.median(daily_expenses) if daily_expenses else 0
-        
-        # Calculate expense volatility (standard deviation)
-        expense_volatility = statistics.stdev(daily_expenses) if len(daily_expenses) > 1 else 0
+        if snapshot is not None:
+            return snapshot.cached(('averages', days),
+                                   lambda: FinancialCalculator.calculate_moving_average(days))
+        
+        # 7/30/90-day windows are maintained incrementally as transactions arrive
+        import rolling_stats
+        window = rolling_stats.window_stats(days)
+        ewma = rolling_stats.ewma_stats()
+        
+        first_day = window['end_date'] - timedelta(days=days - 1)
+        daily_data = {
+            first_day + timedelta(days=offset): {'income': income, 'expenses': expenses}
+            for offset, (income, expenses) in enumerate(zip(window['income'], window['expenses']))
+        }
+        daily_nets = [income - expenses for income, expenses in zip(window['income'], window['expenses'])]
+        
+        avg_income = window['avg_income']
+        avg_expenses = window['avg_expenses']
+        # The median is not maintained incrementally, so it is taken over the window's days
+        median_expenses = statistics.median(window['expenses']) if window['expenses'] else 0
+        expense_volatility = window['expense_volatility']
         
         return {
             'avg_daily_income': avg_income,
@@ -54,76 +107,131 @@ class FinancialCalculator:
             'expense_volatility': expense_volatility,
             'avg_daily_net': avg_income - avg_expenses,
             'daily_data': daily_data,
-            'daily_nets': daily_nets
+            'daily_nets': daily_nets,
+            'ewma_daily_income': ewma['avg_income'],
+            'ewma_daily_expenses': ewma['avg_expenses'],
+            'ewma_expense_volatility': ewma['expense_volatility']
         }
     
     @staticmethod
-    def forecast_balance(days_ahead=30):
+    def forecast_balance(days_ahead=30, snapshot=None):
         """Advanced forecast based on historical patterns with daily shortfall analysis"""
-        averages = FinancialCalculator.calculate_moving_average()
-        current_balance = Transaction.get_current_balance()
+        if snapshot is not None:
+            return snapshot.versioned(
+                ('forecast', days_ahead),
+                lambda: FinancialCalculator.project_balance(days_ahead, snapshot.averages, snapshot.current_balance)
+            )
+        
+        return FinancialCalculator.project_balance(
+            days_ahead,
+            FinancialCalculator.calculate_moving_average(),
+            Transaction.get_current_balance()
+        )
+    
+    @staticmethod
+    def project_balance(days_ahead, averages, current_balance):
+        """Project current_balance forward from precomputed averages.
+        
+        Computed as NumPy arrays over the whole horizon, so long horizons
+        (365+ days) cost about the same as 30; daily_forecast is a lazy
+        list-of-dicts view over those arrays.
+        """
+        # NumPy and the forecast engine load on the first forecast, not at worker boot
+        import numpy as np
+        from services.forecast_engine import DailyForecastView, weekday_factors, running_balance, first_shortfall_day
         
         # Get more sophisticated daily patterns
         avg_income = averages['avg_daily_income']
         avg_expenses = averages['avg_daily_expenses']
         expense_volatility = averages['expense_volatility']
         
-        # Day-by-day forecast with volatility consideration
-        daily_forecast = []
-        running_balance = current_balance
-        shortfall_detected = False
-        shortfall_day = None
+        # Whole-horizon arrays: one element per forecast day
+        today = datetime.now()
+        projected_income = np.full(days_ahead, float(avg_income))
         
-        for day in range(1, days_ahead + 1):
-            # Use historical patterns with some volatility
-            projected_income = avg_income
-            projected_expenses = avg_expenses
-            
-            # Add some variance for weekends (typically higher expenses)
-            forecast_date = datetime.now() + timedelta(days=day)
-            if forecast_date.weekday() >= 5:  # Weekend
-                projected_expenses *= 1.2
-            
-            # Account for expense volatility (conservative estimate)
-            if expense_volatility > 0:
-                projected_expenses += expense_volatility * 0.5
-            
-            daily_net = projected_income - projected_expenses
-            running_balance += daily_net
-            
-            daily_forecast.append({
-                'day': day,
-                'date': forecast_date.strftime('%Y-%m-%d'),
-                'projected_income': projected_income,
-                'projected_expenses': projected_expenses,
-                'daily_net': daily_net,
-                'running_balance': running_balance
-            })
-            
-            # Check for shortfall
-            if running_balance <= 0 and not shortfall_detected:
-                shortfall_detected = True
-                shortfall_day = day
+        # Add some variance for weekends (typically higher expenses)
+        projected_expenses = avg_expenses * weekday_factors(today, days_ahead, WEEKEND_EXPENSE_FACTORS)
+        
+        # Account for expense volatility (conservative estimate)
+        if expense_volatility > 0:
+            projected_expenses += expense_volatility * 0.5
+        
+        daily_net = projected_income - projected_expenses
+        balances = running_balance(current_balance, daily_net)
+        shortfall_day = first_shortfall_day(balances)
+        
+        daily_forecast = DailyForecastView(today, {
+            'projected_income': projected_income,
+            'projected_expenses': projected_expenses,
+            'daily_net': daily_net,
+            'running_balance': balances
+        })
         
         return {
             'current_balance': current_balance,
-            'projected_balance': running_balance,
+            'projected_balance': float(balances[-1]) if days_ahead else current_balance,
             'daily_net_change': avg_income - avg_expenses,
             'days_ahead': days_ahead,
             'daily_forecast': daily_forecast,
-            'shortfall_detected': shortfall_detected,
+            'shortfall_detected': shortfall_day is not None,
             'shortfall_day': shortfall_day,
             'expense_volatility': expense_volatility
         }
     
     @staticmethod
-    def generate_alerts():
+    def forecast_probabilistic(days_ahead=90, paths=10000, snapshot=None, time_budget_ms=50):
+        """Monte Carlo forecast: shortfall probability and balance bands per day.
+        
+        Simulates `paths` balance paths by resampling the daily income/expense
+        history of the moving-average window. The simulation stops early if it
+        would exceed time_budget_ms, so it is safe to run on the request path.
+        """
+        if snapshot is None:
+            snapshot = FinancialSnapshot()
+        
+        def simulate():
+            from services.forecast_engine import simulate_balance_paths
+            history = snapshot.averages['daily_data'].values()
+            result = simulate_balance_paths(
+                snapshot.current_balance,
+                [day['income'] for day in history],
+                [day['expenses'] for day in history],
+                days_ahead,
+                paths=paths,
+                seed=snapshot.ledger_version,
+                time_budget_ms=time_budget_ms
+            )
+            
+            today = datetime.now()
+            return {
+                'current_balance': snapshot.current_balance,
+                'days_ahead': days_ahead,
+                'paths': result['paths'],
+                'dates': [(today + timedelta(days=day)).strftime('%Y-%m-%d')
+                          for day in range(1, days_ahead + 1)],
+                'shortfall_probability': result['shortfall_probability'].tolist(),
+                'any_shortfall_probability': result['any_shortfall_probability'],
+                'percentiles': {str(p): band.tolist() for p, band in result['percentiles'].items()},
+                'elapsed_ms': result['elapsed_ms']
+            }
+        
+        return snapshot.versioned(('probabilistic', days_ahead, paths), simulate)
+    
+    @staticmethod
+    def generate_alerts(snapshot=None):
         """Generate enhanced financial alerts with shortfall detection"""
+        if snapshot is None:
+            snapshot = FinancialSnapshot()
+        return snapshot.versioned(('alerts',), lambda: FinancialCalculator.build_alerts(snapshot))
+    
+    @staticmethod
+    def build_alerts(snapshot):
+        """Evaluate every alert rule against the figures held by a snapshot"""
         alerts = []
-        current_balance = Transaction.get_current_balance()
-        monthly_summary = Transaction.get_monthly_summary()
-        averages = FinancialCalculator.calculate_moving_average()
-        forecast = FinancialCalculator.forecast_balance()
+        current_balance = snapshot.current_balance
+        monthly_summary = snapshot.monthly_summary
+        averages = snapshot.averages
+        forecast = snapshot.forecast()
         
         # CRITICAL: Shortfall detection alert
         if forecast['shortfall_detected']:
@@ -152,7 +260,7 @@ class FinancialCalculator:
             })
         
         # Weekly shortfall warnings
-        weekly_forecast = FinancialCalculator.forecast_balance(7)
+        weekly_forecast = snapshot.forecast(7)
         if weekly_forecast['shortfall_detected']:
             alerts.append({
                 'type': 'warning',
@@ -199,37 +307,77 @@ class FinancialCalculator:
         return alerts
     
     @staticmethod
-    def get_chart_data():
+    def get_balance_trend(days=30):
+        """Daily closing balance for the last `days` days (None = all history).
+        
+        Runs a single query over the daily_totals rollup: days before the
+        window are folded into the first bucket as the opening balance, and a
+        window SUM produces the running balance. Days without transactions are
+        filled in Python, so the query count does not grow with the range.
+        """
+        today = datetime.now().date()
+        signed_amount = case(
+            (DailyTotal.transaction_type == 'income', DailyTotal.total),
+            else_=-DailyTotal.total
+        )
+        day = DailyTotal.day
+        
+        if days is not None:
+            start_day = today - timedelta(days=days - 1)
+            day = case(
+                (DailyTotal.day < start_day, start_day),
+                else_=DailyTotal.day
+            )
+        
+        daily = db.session.query(
+            day.label('day'),
+            func.sum(signed_amount).label('net')
+        ).group_by(day).subquery()
+        
+        rows = db.session.query(
+            daily.c.day,
+            func.sum(daily.c.net).over(order_by=daily.c.day)
+        ).order_by(daily.c.day).all()
+        
+        closing_balances = {}
+        for row_day, balance in rows:
+            if isinstance(row_day, str):
+                row_day = datetime.strptime(row_day, '%Y-%m-%d').date()
+            closing_balances[row_day] = balance
+        
+        if days is None:
+            start_day = min(closing_balances, default=today)
+        
+        # Short ranges keep the compact label the dashboard has always used
+        label_format = '%m/%d' if days is not None and days <= 366 else '%Y-%m-%d'
+        
+        labels = []
+        data = []
+        balance = 0
+        current_day = start_day
+        while current_day <= today:
+            balance = closing_balances.get(current_day, balance)
+            labels.append(current_day.strftime(label_format))
+            data.append(balance)
+            current_day += timedelta(days=1)
+        
+        return {'labels': labels, 'data': data}
+    
+    @staticmethod
+    def get_chart_data(days=30, snapshot=None):
         """Get data formatted for Chart.js"""
-        # Last 30 days balance trend
-        balance_data = []
-        dates = []
+        if snapshot is not None:
+            return snapshot.versioned(('chart_data', days),
+                                      lambda: FinancialCalculator.get_chart_data(days))
         
-        for i in range(29, -1, -1):
-            date = datetime.now() - timedelta(days=i)
-            dates.append(date.strftime('%m/%d'))
-            
-            # Calculate balance up to this date
-            income = db.session.query(func.sum(Transaction.amount)).filter(
-                Transaction.transaction_type == 'income',
-                Transaction.date_created <= date
-            ).scalar() or 0
-            
-            expenses = db.session.query(func.sum(Transaction.amount)).filter(
-                Transaction.transaction_type == 'expense',
-                Transaction.date_created <= date
-            ).scalar() or 0
-            
-            balance_data.append(income - expenses)
+        # Balance trend over the requested range
+        balance_trend = FinancialCalculator.get_balance_trend(days)
         
         # Category breakdown for current month
         expense_categories = Transaction.get_category_breakdown('expense')
         
         return {
-            'balance_trend': {
-                'labels': dates,
-                'data': balance_data
-            },
+            'balance_trend': balance_trend,
             'expense_categories': {
                 'labels': [cat['category'] for cat in expense_categories],
                 'data': [cat['amount'] for cat in expense_categories]
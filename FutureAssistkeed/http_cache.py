@@ -0,0 +1,147 @@
+"""
+Conditional requests and response compression.
+
+Views whose output is derived from the ledger (/, /forecast and
+/api/chart_data) are wrapped in @ledger_conditional. Their validators:
+
+- ETag (weak): a digest of the ledger version, today's date (forecasts
+  and moving averages are relative to today), the request path and query
+  string, and the build token
+- Last-Modified: the later of the ledger's date_updated and today's
+  midnight
+
+A request whose If-None-Match (or, without one, If-Modified-Since) still
+matches gets a 304 before the view runs, which costs one ledger read.
+Responses are sent with `Cache-Control: private, no-cache`, so browsers
+and the service worker keep the body but revalidate on every use, and
+shared caches do not store it. Pages with pending flash messages are
+rendered normally and sent without validators.
+
+The build token (HTTP_CACHE_BUILD, e.g. a commit hash) is part of every
+ETag, so a deploy that changes templates or code invalidates cached
+pages. Without it, the newest modification time of the templates and
+Python modules is used.
+
+HTML and JSON bodies of at least COMPRESS_MIN_BYTES (default 1024) are
+compressed. Brotli is used when the client accepts it and the optional
+`brotli` package is installed, otherwise gzip at COMPRESS_LEVEL (default
+6). Streamed responses (exports, which gzip themselves) and bodies that
+are already encoded are sent as they are.
+"""
+
+import gzip
+import hashlib
+import os
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+from models import BalanceLedger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES_DEFAULT = 1024
+COMPRESS_LEVEL_DEFAULT = 6
+# Brotli quality for dynamic responses: close to level 11's size at a fraction of its CPU
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json')
+
+
+def build_token(root):
+    """Newest modification time of the templates and Python modules under root"""
+    newest = 0
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = [name for name in subdirectories
+                             if name not in ('instance', 'static', '__pycache__') and not name.startswith('.')]
+        for name in files:
+            if name.endswith(('.py', '.html')):
+                newest = max(newest, os.path.getmtime(os.path.join(directory, name)))
+    return str(int(newest))
+
+
+def ledger_validators():
+    """(etag, last_modified) for a ledger-derived response to the current request"""
+    ledger = BalanceLedger.get()
+    today = date.today()
+    key = f"{ledger.version}:{today.isoformat()}:{current_app.config['HTTP_CACHE_BUILD']}:{request.full_path}"
+    etag = f'{ledger.version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}'
+
+    # date_updated is naive UTC; today's midnight is local
+    midnight = datetime.combine(today, time()).astimezone(timezone.utc)
+    updated = ledger.date_updated.replace(tzinfo=timezone.utc) if ledger.date_updated else midnight
+    return etag, max(updated, midnight)
+
+
+def ledger_conditional(view):
+    """Answer revalidations of a ledger-derived view with 304 Not Modified"""
+    @wraps(view)
+    def conditional_view(*args, **kwargs):
+        # Flashed messages are part of the page, so it must not be revalidated later
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+
+        etag, last_modified = ledger_validators()
+        if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        else:
+            response = current_app.response_class(status=304)
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return conditional_view
+
+
+def choose_encoding():
+    """Best content coding the client accepts: 'br', 'gzip' or None"""
+    accepted = request.accept_encodings
+    gzip_quality = accepted.quality('gzip')
+    if brotli is not None and accepted.quality('br') and accepted.quality('br') >= gzip_quality:
+        return 'br'
+    return 'gzip' if gzip_quality else None
+
+
+def compress_response(response):
+    """after_request hook: compress large HTML and JSON bodies"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.is_streamed or response.direct_passthrough:
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers or not 200 <= response.status_code < 300:
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_BYTES']:
+        return response
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL'], mtime=0)
+    if len(body) >= len(data):
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # Each coding has different bytes, so any validator can only be weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_http_cache(app):
+    """Read the compression settings and register the compression hook"""
+    app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', COMPRESS_MIN_BYTES_DEFAULT))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', COMPRESS_LEVEL_DEFAULT))
+    app.config['HTTP_CACHE_BUILD'] = os.environ.get('HTTP_CACHE_BUILD') or build_token(app.root_path)
+    app.after_request(compress_response)
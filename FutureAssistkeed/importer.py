@@ -0,0 +1,230 @@
+"""
+Streaming bank-statement import (CSV and OFX).
+
+Statements are read row by row and never held in memory as a whole. Rows
+are categorized in batches through services/categorization and written
+with one executemany INSERT per chunk, each chunk committed together with
+its balance ledger update and a queued alert check. Memory use therefore depends on the chunk size,
+not on the file size.
+"""
+
+import csv
+import io
+import re
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import insert
+from app import db
+from models import Transaction, BalanceLedger, TRANSACTION_CATEGORIES, record_bulk_write
+from services.categorization import categorize_many
+from services.alerts import queue_alert_check, LEDGER_USER_ID
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%d %b %Y', '%Y%m%d')
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posting date', 'value date'),
+    'description': ('description', 'narrative', 'details', 'reference', 'memo', 'payee'),
+    'amount': ('amount', 'value'),
+    'debit': ('debit', 'withdrawal', 'money out'),
+    'credit': ('credit', 'deposit', 'money in'),
+}
+
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+# Currency codes, thousands separators and spaces; BWP is tried before P,
+# so 'BWP 1,200.00' loses the whole code
+AMOUNT_NOISE = re.compile(r'BWP|P|,|\s', re.IGNORECASE)
+
+
+class StatementError(ValueError):
+    """Raised when a statement cannot be parsed
+
+    import_statement() sets `summary` to the summary of the chunks it had
+    already committed when the error was found.
+    """
+    summary = None
+
+
+def parse_date(value):
+    value = value.strip()
+    # OFX dates look like 20250603120000[+2:CAT]
+    if value[:8].isdigit() and len(value) >= 8:
+        value = value[:8]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise StatementError(f'Unrecognised date: {value!r}')
+
+
+def parse_amount(value):
+    text = AMOUNT_NOISE.sub('', value or '')
+    if not text:
+        return 0.0
+    if text.startswith('(') and text.endswith(')'):
+        text = '-' + text[1:-1]
+    try:
+        return float(text)
+    except ValueError:
+        raise StatementError(f'Unrecognised amount: {value!r}') from None
+
+
+def iter_csv_rows(stream):
+    """Yield (date, description, signed amount) from a CSV statement.
+
+    Accepts either a signed amount column or separate debit/credit columns;
+    header names are matched case-insensitively against CSV_COLUMNS.
+    """
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+
+    def column(field):
+        for alias in CSV_COLUMNS[field]:
+            if alias in header:
+                return header.index(alias)
+        return None
+
+    date_col, description_col = column('date'), column('description')
+    amount_col, debit_col, credit_col = column('amount'), column('debit'), column('credit')
+    if date_col is None or description_col is None or (amount_col is None and debit_col is None):
+        raise StatementError('CSV needs date, description and amount (or debit/credit) columns')
+
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        try:
+            if amount_col is not None:
+                amount = parse_amount(row[amount_col])
+            else:
+                credit = parse_amount(row[credit_col]) if credit_col is not None else 0.0
+                amount = credit - abs(parse_amount(row[debit_col]))
+            parsed = parse_date(row[date_col]), row[description_col].strip(), amount
+        except IndexError:
+            raise StatementError(f'Row {reader.line_num}: missing columns') from None
+        except StatementError as e:
+            raise StatementError(f'Row {reader.line_num}: {e}') from None
+        yield parsed
+
+
+def iter_ofx_rows(stream):
+    """Yield (date, description, signed amount) from an OFX/QFX statement.
+
+    Reads line by line and only keeps the current <STMTTRN> block, so both
+    SGML (OFX 1.x, unclosed tags) and XML (OFX 2.x) files stream.
+    """
+    fields = None
+    number = 0
+    for line in stream:
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            fields = {}
+        if fields is not None:
+            for tag, value in OFX_FIELD.findall(line):
+                fields[tag.upper()] = value.strip()
+        if '</STMTTRN>' in upper and fields is not None:
+            number += 1
+            description = fields.get('NAME') or fields.get('MEMO') or fields.get('PAYEE') or 'Imported transaction'
+            try:
+                missing = [tag for tag in ('DTPOSTED', 'TRNAMT') if not fields.get(tag)]
+                if missing:
+                    raise StatementError(f"missing {', '.join(missing)}")
+                parsed = parse_date(fields['DTPOSTED']), description, parse_amount(fields['TRNAMT'])
+            except StatementError as e:
+                raise StatementError(f'Transaction {number}: {e}') from None
+            yield parsed
+            fields = None
+
+
+def iter_statement_rows(stream, statement_format):
+    if statement_format == 'csv':
+        return iter_csv_rows(stream)
+    if statement_format in ('ofx', 'qfx'):
+        return iter_ofx_rows(stream)
+    raise StatementError(f'Unsupported statement format: {statement_format}')
+
+
+def build_rows(chunk):
+    """Categorize a chunk of parsed rows and shape them for INSERT"""
+    categories = categorize_many([row[1] for row in chunk], [row[2] for row in chunk])
+    income_categories = TRANSACTION_CATEGORIES['income']
+    expense_categories = TRANSACTION_CATEGORIES['expenses']
+
+    rows = []
+    for (date_created, description, amount), match in zip(chunk, categories):
+        if amount == 0:
+            continue
+        transaction_type = 'income' if amount > 0 else 'expense'
+        allowed = income_categories if transaction_type == 'income' else expense_categories
+        category = match['category'] if match['category'] in allowed else f'other_{transaction_type}'
+        rows.append({
+            'description': (description or 'Imported transaction')[:200],
+            'amount': abs(amount),
+            'transaction_type': transaction_type,
+            'category': category,
+            'date_created': date_created
+        })
+    return rows
+
+
+def import_statement(stream, statement_format='csv', chunk_size=1000, progress=None):
+    """
+    Stream a statement into the transaction table in committed chunks
+
+    Args:
+        stream: Text stream (file object) positioned at the start of the statement
+        statement_format (str): 'csv' or 'ofx'
+        chunk_size (int): Rows per executemany INSERT and commit
+        progress (callable): Called with the running summary after every chunk
+
+    Returns:
+        dict: Rows imported and skipped, total income and expenses
+
+    Raises:
+        StatementError: For a malformed statement or row, naming the row.
+            Chunks before it stay committed; the error's summary says what
+            they held.
+    """
+    summary = {'imported': 0, 'skipped': 0, 'income': 0.0, 'expenses': 0.0, 'chunks': 0}
+    rows = iter_statement_rows(stream, statement_format)
+
+    # Make sure the ledger exists before any chunk lands, so a first-time
+    # rebuild cannot count the imported rows twice
+    BalanceLedger.get()
+
+    while True:
+        try:
+            chunk = list(islice(rows, chunk_size))
+        except StatementError as e:
+            e.summary = dict(summary)
+            raise
+        if not chunk:
+            break
+
+        values = build_rows(chunk)
+        income = sum(row['amount'] for row in values if row['transaction_type'] == 'income')
+        expenses = sum(row['amount'] for row in values if row['transaction_type'] == 'expense')
+
+        try:
+            if values:
+                db.session.execute(insert(Transaction), values)
+                record_bulk_write(values)
+                queue_alert_check(LEDGER_USER_ID)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        summary['imported'] += len(values)
+        summary['skipped'] += len(chunk) - len(values)
+        summary['income'] += income
+        summary['expenses'] += expenses
+        summary['chunks'] += 1
+        if progress is not None:
+            progress(summary)
+
+    return summary
+
+
+def open_text_stream(binary_stream, encoding='utf-8-sig'):
+    """Wrap an uploaded (binary) file for line-by-line text reading"""
+    return io.TextIOWrapper(binary_stream, encoding=encoding, errors='replace', newline='')
@@ -0,0 +1,263 @@
+"""
+Per-request SQL and timing instrumentation.
+
+SQLAlchemy cursor events time every statement. When a statement runs inside
+a Flask request, its duration is added to that request's totals, kept on g.
+When the request ends, the totals go into a per-route registry. For a
+streamed response (exports), the request ends once the body has been sent.
+The registry records:
+
+- requests, by method and status code
+- wall time, with a latency histogram
+- SQL statements and SQL time
+- Python time (wall time minus SQL time)
+- the slowest statement seen, with its duration
+
+The registry is per process, so each gunicorn worker reports its own
+numbers; Prometheus sums them across the scrape targets. Routes are
+labelled by URL rule (e.g. /delete_transaction/<int:transaction_id>), so
+the label set stays bounded. The text of each route's slowest statement is
+not a label; /api/metrics serves it with the rest of the JSON snapshot.
+
+Any statement slower than SLOW_QUERY_MS (default 200; 0 disables the log)
+is logged on the futureassist.slow_queries logger. This applies inside and
+outside requests, so CLI commands and the job worker are covered too.
+Parameters are never logged, since they carry transaction data.
+"""
+
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+SLOW_QUERY_MS_DEFAULT = 200
+STATEMENT_LABEL_LENGTH = 200
+
+# Upper bounds, in seconds, of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger('futureassist.slow_queries')
+
+
+def one_line(statement, length=STATEMENT_LABEL_LENGTH):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= length else statement[:length - 3] + '...'
+
+
+class RouteStats:
+    """Accumulated figures for one route"""
+
+    def __init__(self):
+        self.responses = {}  # (method, status) -> count
+        self.requests = 0
+        self.seconds = 0.0
+        self.sql_seconds = 0.0
+        self.queries = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def add(self, method, status, seconds, queries, sql_seconds, slowest):
+        key = (method, status)
+        self.responses[key] = self.responses.get(key, 0) + 1
+        self.requests += 1
+        self.seconds += seconds
+        self.sql_seconds += sql_seconds
+        self.queries += queries
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+        if slowest is not None and slowest[0] > self.slowest_seconds:
+            self.slowest_seconds, self.slowest_statement = slowest
+
+
+class MetricsRegistry:
+    """Thread-safe per-route request statistics"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+
+    def record(self, route, method, status, seconds, queries, sql_seconds, slowest):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.add(method, status, seconds, queries, sql_seconds, slowest)
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.slow_queries = 0
+
+    def snapshot(self):
+        """{route: {requests, seconds, queries, sql_seconds, python_seconds, slowest_*}}"""
+        with self._lock:
+            return {
+                route: {
+                    'requests': stats.requests,
+                    'seconds': stats.seconds,
+                    'queries': stats.queries,
+                    'sql_seconds': stats.sql_seconds,
+                    'python_seconds': max(stats.seconds - stats.sql_seconds, 0.0),
+                    'slowest_query_seconds': stats.slowest_seconds,
+                    'slowest_statement': stats.slowest_statement,
+                }
+                for route, stats in self._routes.items()
+            }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def family(name, kind, help_text, samples):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for suffix, labels, value in samples:
+                    lines.append(f'{name}{suffix}{format_labels(labels)} {format_value(value)}')
+
+            family('futureassist_http_requests_total', 'counter', 'Requests handled, by route, method and status.', [
+                ('', {'route': route, 'method': method, 'status': status}, count)
+                for route, stats in routes
+                for (method, status), count in sorted(stats.responses.items())
+            ])
+
+            latency = []
+            for route, stats in routes:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    latency.append(('_bucket', {'route': route, 'le': bound}, count))
+                latency.append(('_bucket', {'route': route, 'le': '+Inf'}, stats.requests))
+                latency.append(('_sum', {'route': route}, stats.seconds))
+                latency.append(('_count', {'route': route}, stats.requests))
+            family('futureassist_http_request_duration_seconds', 'histogram',
+                   'Wall time per request, including SQL.', latency)
+
+            family('futureassist_sql_queries_total', 'counter', 'SQL statements executed by requests.', [
+                ('', {'route': route}, stats.queries) for route, stats in routes
+            ])
+            family('futureassist_sql_duration_seconds_total', 'counter', 'Time spent in SQL statements.', [
+                ('', {'route': route}, stats.sql_seconds) for route, stats in routes
+            ])
+            family('futureassist_python_duration_seconds_total', 'counter',
+                   'Request time outside SQL statements.', [
+                       ('', {'route': route}, max(stats.seconds - stats.sql_seconds, 0.0))
+                       for route, stats in routes
+                   ])
+            family('futureassist_slowest_query_seconds', 'gauge', 'Slowest SQL statement seen per route.', [
+                ('', {'route': route}, stats.slowest_seconds)
+                for route, stats in routes if stats.slowest_statement is not None
+            ])
+            family('futureassist_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS.', [
+                ('', {}, self.slow_queries)
+            ])
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = MetricsRegistry()
+
+
+def current_route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+
+def start_request():
+    g.instrumentation = {'started': time.perf_counter(), 'queries': 0, 'sql_seconds': 0.0, 'slowest': None}
+
+
+def note_response(response):
+    state = g.get('instrumentation')
+    if state is None:
+        return response
+    state['status'] = response.status_code
+    if response.is_streamed:
+        # Streamed bodies (exports) query after the view returns, and the
+        # request context is torn down before streaming starts, so the
+        # totals are recorded when the server closes the response instead
+        state['deferred'] = True
+        route, method = current_route(), request.method
+        response.call_on_close(lambda: record_request(state, route, method))
+    return response
+
+
+def finish_request(error=None):
+    state = g.get('instrumentation')
+    if state is None or state.get('deferred'):
+        return
+    g.pop('instrumentation')
+    record_request(state, current_route(), request.method)
+
+
+def record_request(state, route, method):
+    seconds = time.perf_counter() - state['started']
+    metrics.record(route, method, state.get('status', 500), seconds,
+                   state['queries'], state['sql_seconds'], state['slowest'])
+
+
+def install_query_timing(engine, slow_query_ms):
+    """Time every statement on engine, attribute it to the current request and log slow ones"""
+    threshold = slow_query_ms / 1000 if slow_query_ms > 0 else None
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_timer(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - connection.info['query_started'].pop()
+
+        in_request = has_request_context() and 'instrumentation' in g
+        if in_request:
+            state = g.instrumentation
+            state['queries'] += 1
+            state['sql_seconds'] += seconds
+            if state['slowest'] is None or seconds > state['slowest'][0]:
+                state['slowest'] = (seconds, one_line(statement))
+
+        if threshold is not None and seconds >= threshold:
+            metrics.record_slow_query()
+            where = f'{request.method} {current_route()}' if in_request else 'outside a request'
+            slow_query_log.warning(f'Slow query ({seconds * 1000:.1f} ms, {where}): {one_line(statement, 1000)}')
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_timer(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def configure_instrumentation(app):
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', SLOW_QUERY_MS_DEFAULT))
+
+
+def init_instrumentation(app, db):
+    """Register the request hooks and engine events; call inside an app context"""
+    install_query_timing(db.engine, app.config.get('SLOW_QUERY_MS', SLOW_QUERY_MS_DEFAULT))
+    app.before_request(start_request)
+    app.after_request(note_response)
+    app.teardown_request(finish_request)
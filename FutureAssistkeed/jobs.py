@@ -0,0 +1,208 @@
+"""
+Local, database-backed job queue.
+
+Jobs are rows in the `jobs` table with a unique dedupe key, so enqueueing
+the same work twice never creates two jobs:
+
+- a pending job is left alone, so writes arriving within the coalescing
+  delay ride on the job that is already scheduled;
+- a running job is flagged to run once more when it finishes;
+- a finished or failed job is re-armed.
+
+`flask run-worker` claims due jobs with a conditional UPDATE, so several
+worker processes can share the queue safely. A claim is a lease of
+JOB_LEASE_SECONDS: if the worker dies mid-handler, the job is claimed
+again once the lease expires, until it has used MAX_ATTEMPTS.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from importlib import import_module
+from sqlalchemy import update, case, or_, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Job
+
+# Handlers are resolved lazily by dotted path so the worker only imports
+# the modules (and their heavy dependencies) it actually needs
+JOB_HANDLERS = {
+    'check_alerts': 'services.alerts:run_alert_job',
+}
+
+# Default coalescing window per job type, in seconds
+JOB_COALESCE_SECONDS = {
+    'check_alerts': 30,
+}
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 60
+# A running job whose worker has not finished within this many seconds is
+# presumed dead and claimed again; keep it well above the slowest handler
+JOB_LEASE_SECONDS = 600
+
+
+def enqueue(job_type, dedupe_key, payload=None, delay_seconds=None):
+    """
+    Schedule a job, de-duplicated and coalesced by dedupe_key
+
+    On SQLite and PostgreSQL this is one INSERT ... ON CONFLICT DO UPDATE,
+    so concurrent enqueues of the same key never fail on the unique key
+    (which would roll back the caller's write) and always see the job's
+    latest state. Other databases insert inside a savepoint and fall back
+    to updating the existing row.
+
+    Args:
+        job_type (str): Key into JOB_HANDLERS
+        dedupe_key (str): At most one live job exists per key
+        payload (dict): JSON-serialisable handler arguments
+        delay_seconds (int): Coalescing window before the job becomes due
+            (defaults to JOB_COALESCE_SECONDS for the job type)
+
+    Returns:
+        Job: The scheduled job (not committed, so it lands with the caller's write)
+    """
+    if delay_seconds is None:
+        delay_seconds = JOB_COALESCE_SECONDS.get(job_type, 0)
+    now = datetime.utcnow()
+    values = {
+        'job_type': job_type,
+        'dedupe_key': dedupe_key,
+        'payload': json.dumps(payload or {}),
+        'status': 'pending',
+        'rerun': False,
+        'attempts': 0,
+        'run_after': now + timedelta(seconds=delay_seconds),
+        'date_created': now,
+        'date_updated': now,
+    }
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(Job).values(**values)
+        live = Job.status.in_(('pending', 'running'))
+        # SET expressions read the existing row: a pending job is left alone,
+        # a running one is flagged to rerun, anything else is re-armed
+        statement = statement.on_conflict_do_update(
+            index_elements=['dedupe_key'],
+            set_={
+                'status': case((live, Job.status), else_='pending'),
+                'rerun': case((Job.status == 'running', True), else_=Job.rerun),
+                'payload': case((Job.status == 'pending', Job.payload), else_=statement.excluded.payload),
+                'attempts': case((live, Job.attempts), else_=0),
+                'run_after': case((live, Job.run_after), else_=statement.excluded.run_after),
+                'date_updated': statement.excluded.date_updated,
+            }
+        )
+        db.session.execute(statement)
+        return Job.query.filter_by(dedupe_key=dedupe_key).populate_existing().one()
+
+    try:
+        with db.session.begin_nested():
+            job = Job(**values)
+            db.session.add(job)
+        return job
+    except IntegrityError:
+        pass
+
+    job = Job.query.filter_by(dedupe_key=dedupe_key).populate_existing().with_for_update().one()
+    if job.status == 'running':
+        job.rerun = True
+        job.payload = values['payload']
+    elif job.status != 'pending':
+        job.status = 'pending'
+        job.attempts = 0
+        job.payload = values['payload']
+        job.run_after = values['run_after']
+    return job
+
+
+def claim_due_jobs(limit=10):
+    """Atomically move up to `limit` due jobs (or expired leases) to running"""
+    now = datetime.utcnow()
+    due = and_(Job.status == 'pending', Job.run_after <= now)
+    expired = and_(Job.status == 'running', Job.claimed_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+
+    # Jobs that crashed their worker on every attempt are given up on
+    db.session.execute(
+        update(Job)
+        .where(expired, Job.attempts >= MAX_ATTEMPTS)
+        .values(status='failed', claimed_at=None, last_error='Worker lease expired')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    candidates = db.session.query(Job.id).filter(
+        or_(due, expired)
+    ).order_by(Job.run_after.asc()).limit(limit).all()
+
+    claimed = []
+    for (job_id,) in candidates:
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, or_(due, expired))
+            .values(status='running', attempts=Job.attempts + 1, rerun=False, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            claimed.append(db.session.get(Job, job_id))
+    return claimed
+
+
+def resolve_handler(job_type):
+    module_name, function_name = JOB_HANDLERS[job_type].split(':')
+    return getattr(import_module(module_name), function_name)
+
+
+def run_job(job):
+    """Execute one claimed job and record its outcome"""
+    try:
+        resolve_handler(job.job_type)(**json.loads(job.payload))
+        db.session.refresh(job)
+        job.claimed_at = None
+        if job.rerun:
+            job.status = 'pending'
+            job.rerun = False
+            job.run_after = datetime.utcnow() + timedelta(seconds=JOB_COALESCE_SECONDS.get(job.job_type, 0))
+        else:
+            job.status = 'done'
+        job.last_error = None
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f'Job {job.dedupe_key} failed: {str(e)}')
+        job = db.session.get(Job, job.id)
+        job.last_error = str(e)[:500]
+        job.claimed_at = None
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_DELAY_SECONDS * job.attempts)
+    db.session.commit()
+    return job.status
+
+
+def work(poll_interval=1.0, batch_size=10, once=False, stop=None):
+    """Worker loop: claim and run due jobs until stopped (or the queue drains, with once)"""
+    processed = 0
+    while stop is None or not stop():
+        jobs = claim_due_jobs(batch_size)
+        for job in jobs:
+            run_job(job)
+            processed += 1
+        if not jobs:
+            if once:
+                break
+            time.sleep(poll_interval)
+    return processed
+
+
+def queue_stats():
+    """Job counts by status"""
+    rows = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    return {status: count for status, count in rows}
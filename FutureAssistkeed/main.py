@@ -1,4 +1,10 @@
-from app import app  # noqa: F401
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
+    # The development server creates and migrates the schema itself
+    import migrations
+    with app.app_context():
+        migrations.upgrade_schema()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,220 @@
+"""
+Lightweight schema migrations for existing databases.
+
+db.create_all() only creates missing tables, so indexes and other objects
+added to existing tables are applied here. Every step is idempotent.
+upgrade_schema() runs both; `flask migrate-db` calls it once per deploy
+rather than every worker doing it on boot.
+"""
+
+from sqlalchemy import select, inspect, text, func
+from app import db
+from models import Transaction, BalanceLedger, CategoryCount, DailyTotal, Alert, current_month_range
+import partitioning
+
+
+def create_indexes(model):
+    """Create the indexes a model declares in __table_args__"""
+    created = []
+    for index in model.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+        created.append(index.name)
+    return created
+
+
+def add_missing_columns(model):
+    """ALTER TABLE ADD COLUMN for nullable model columns the table lacks"""
+    table = model.__table__
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    added = []
+    with db.engine.begin() as connection:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(column.name)
+    return added
+
+
+def create_transaction_indexes():
+    """Create the Transaction indexes declared in __table_args__"""
+    return create_indexes(Transaction)
+
+
+# Integer counters on balance_ledger that ledgers created before them lack
+LEDGER_COUNTER_COLUMNS = ('version', 'epoch', 'deletions')
+
+
+def add_ledger_counter_column(name):
+    """Add balance_ledger.<name> as INTEGER NOT NULL DEFAULT 0 if it is missing"""
+    columns = {column['name'] for column in inspect(db.engine).get_columns(BalanceLedger.__tablename__)}
+    if name in columns:
+        return False
+
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            f'ALTER TABLE {BalanceLedger.__tablename__} ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'
+        ))
+    return True
+
+
+def add_ledger_counter_columns():
+    """Add every missing ledger counter column; returns the names added"""
+    return [name for name in LEDGER_COUNTER_COLUMNS if add_ledger_counter_column(name)]
+
+
+def populate_category_counts():
+    """Fill category_counts the first time it exists alongside transactions"""
+    if db.session.query(CategoryCount.category).first() is not None:
+        return False
+    if db.session.query(Transaction.id).first() is None:
+        return False
+
+    CategoryCount.rebuild()
+    db.session.commit()
+    return True
+
+
+def populate_daily_totals():
+    """Fill daily_totals the first time it exists alongside transactions"""
+    if db.session.query(DailyTotal.day).first() is not None:
+        return False
+    if db.session.query(Transaction.id).first() is None:
+        return False
+
+    DailyTotal.rebuild()
+    db.session.commit()
+    return True
+
+
+def upgrade_alert_table():
+    """Add fingerprint/upsert columns and the active-feed index to alert"""
+    added = add_missing_columns(Alert)
+    return {'columns': added, 'indexes': create_indexes(Alert)}
+
+
+def maintain_transaction_partitions():
+    """PostgreSQL: partition a still-empty transaction table, keep future months created
+
+    Converting a populated table copies every row, so that is left to
+    `flask partition-transactions`.
+    """
+    if not partitioning.is_supported():
+        return False
+    if not partitioning.is_partitioned():
+        has_rows = db.session.query(Transaction.id).first() is not None
+        db.session.commit()  # release the read lock before the table is swapped
+        if has_rows:
+            return 'not partitioned; run `flask partition-transactions`'
+        return partitioning.partition_transactions()
+    return partitioning.ensure_future_partitions()
+
+
+MIGRATIONS = [
+    create_transaction_indexes,
+    add_ledger_counter_columns,
+    populate_category_counts,
+    upgrade_alert_table,
+    populate_daily_totals,
+    maintain_transaction_partitions,
+]
+
+
+def run_migrations():
+    """Apply every migration step in order"""
+    results = {}
+    for migration in MIGRATIONS:
+        results[migration.__name__] = migration()
+    return results
+
+
+def upgrade_schema():
+    """Create missing tables, then apply every migration step"""
+    db.create_all()
+    return run_migrations()
+
+
+def index_usage_queries():
+    """Representative hot queries paired with the index each should use"""
+    month_start, month_end = current_month_range()
+
+    # Monthly summaries and category breakdowns read the daily_totals rollup
+    # through its (day, transaction_type, category) primary key
+    rollup_index = 'daily_totals_pkey' if db.engine.dialect.name == 'postgresql' else 'sqlite_autoindex_daily_totals_1'
+
+    return [
+        (
+            'monthly summary',
+            rollup_index,
+            select(DailyTotal.transaction_type, func.sum(DailyTotal.total)).where(
+                DailyTotal.day >= month_start.date(),
+                DailyTotal.day < month_end.date()
+            ).group_by(DailyTotal.transaction_type)
+        ),
+        (
+            'transactions filtered by type',
+            'ix_transaction_type_date',
+            select(Transaction.id).where(
+                Transaction.transaction_type == 'income'
+            ).order_by(Transaction.date_created.desc()).limit(20)
+        ),
+        (
+            'transactions filtered by category',
+            'ix_transaction_category_date',
+            select(Transaction.id).where(
+                Transaction.category == 'food'
+            ).order_by(Transaction.date_created.desc()).limit(20)
+        ),
+        (
+            'dashboard recent transactions',
+            'ix_transaction_date_created',
+            select(Transaction.id).order_by(Transaction.date_created.desc()).limit(5)
+        ),
+    ]
+
+
+def explain(statement):
+    """Return the database's query plan for a statement as a single string"""
+    compiled = statement.compile(dialect=db.engine.dialect)
+    sql = str(compiled)
+
+    if db.engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        prefix = 'EXPLAIN '
+        params = compiled.params
+
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + sql, params).fetchall()
+
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+def check_index_usage():
+    """EXPLAIN each hot query and report whether the expected index is used.
+
+    On PostgreSQL the planner may still prefer a sequential scan for very
+    small tables, so run this against a realistically sized database. On a
+    partitioned transaction table the per-partition copies also count.
+    """
+    # Partitions get their own copies of each index, named <partition>_<columns>_idx
+    partition_suffixes = {}
+    if partitioning.is_partitioned():
+        partition_suffixes = {
+            index.name: '_'.join(column.name for column in index.columns) + '_idx'
+            for index in Transaction.__table__.indexes
+        }
+
+    report = []
+    for name, index_name, statement in index_usage_queries():
+        plan = explain(statement)
+        suffix = partition_suffixes.get(index_name)
+        report.append({
+            'query': name,
+            'index': index_name,
+            'uses_index': index_name in plan or (suffix is not None and suffix in plan),
+            'plan': plan
+        })
+    return report
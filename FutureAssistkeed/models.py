@@ -1,8 +1,114 @@
 from app import db
-from datetime import datetime
-from sqlalchemy import func
+from datetime import datetime, timedelta
+import hashlib
+from collections import Counter
+from sqlalchemy import func, update, and_, or_, not_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Keyword table used by services/categorization, keyed by the categories
+# offered in TransactionForm. Order matters: earlier keywords win ties.
+TRANSACTION_CATEGORIES = {
+    'income': {
+        'salary': ['salary', 'wage', 'wages', 'payroll', 'pay'],
+        'freelance': ['freelance', 'contract', 'consulting', 'invoice', 'piece job'],
+        'investment': ['dividend', 'interest', 'investment', 'unit trust'],
+        'gift': ['gift', 'present', 'family support'],
+        'other_income': ['refund', 'transfer in', 'deposit', 'sales', 'side business']
+    },
+    'expenses': {
+        'food': ['choppies', 'spar', 'pick n pay', 'shoprite', 'sefalana', 'grocery', 'groceries',
+                 'restaurant', 'nandos', 'steers', 'kfc', 'takeaway', 'lunch', 'breakfast', 'food'],
+        'transportation': ['combi', 'combis', 'taxi', 'bus', 'fuel', 'petrol', 'diesel', 'shell',
+                           'engen', 'puma', 'car repair', 'transport'],
+        'housing': ['rent', 'landlord', 'mortgage', 'bhc', 'flat'],
+        'utilities': ['bpc', 'electricity', 'water', 'wuc', 'airtime', 'mascom', 'orange', 'btc',
+                      'internet', 'data', 'dstv'],
+        'healthcare': ['clinic', 'hospital', 'pharmacy', 'doctor', 'medical', 'dentist'],
+        'entertainment': ['movies', 'cinema', 'netflix', 'showmax', 'entertainment', 'concert'],
+        'shopping': ['game', 'woolworths', 'edgars', 'clothing', 'shoes', 'laptop', 'furniture'],
+        'education': ['school', 'fees', 'university', 'college', 'books', 'tuition'],
+        'insurance': ['insurance', 'premium', 'funeral cover', 'botswana life'],
+        'savings': ['savings', 'motshelo', 'investment deposit'],
+        'other_expense': ['purchase', 'payment', 'fee', 'charge']
+    }
+}
+
+
+def upsert_increments(model, key_names, delta_names, rows):
+    """INSERT each row, or add its delta columns to the existing row with the same keys.
+
+    One executemany statement on SQLite and PostgreSQL, however many rows.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_names),
+            set_={name: getattr(model, name) + statement.excluded[name] for name in delta_names}
+        )
+        db.session.execute(statement, rows)
+        return
+    
+    for row in rows:
+        result = db.session.execute(
+            update(model)
+            .where(*(getattr(model, name) == row[name] for name in key_names))
+            .values(**{name: getattr(model, name) + row[name] for name in delta_names})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.execute(model.__table__.insert().values(**row))
+
+
+def record_transaction_write(transaction, reverse=False):
+    """Keep every maintained aggregate in step with one inserted/deleted row.
+    
+    Call inside the same DB transaction as the write itself.
+    """
+    BalanceLedger.record(transaction, reverse=reverse)
+    CategoryCount.record(transaction, reverse=reverse)
+    DailyTotal.record(transaction, reverse=reverse)
+
+
+def record_bulk_write(rows):
+    """Aggregate counterpart of record_transaction_write() for bulk inserts"""
+    income = sum(row['amount'] for row in rows if row['transaction_type'] == 'income')
+    expenses = sum(row['amount'] for row in rows if row['transaction_type'] == 'expense')
+    BalanceLedger.record_totals(income=income, expenses=expenses, count=len(rows))
+    CategoryCount.record_counts(Counter((row['category'], row['transaction_type']) for row in rows))
+    DailyTotal.record_rows(rows)
+
+
+def rebuild_aggregates():
+    """Recompute every maintained aggregate from the transaction table (not committed)"""
+    BalanceLedger.rebuild()
+    CategoryCount.rebuild()
+    DailyTotal.rebuild()
+
+
+def current_month_range(now=None):
+    """Half-open [start, end) datetime range covering the current month"""
+    now = now or datetime.now()
+    start = datetime(now.year, now.month, 1)
+    if now.month == 12:
+        end = datetime(now.year + 1, 1, 1)
+    else:
+        end = datetime(now.year, now.month + 1, 1)
+    return start, end
+
 
 class Transaction(db.Model):
+    __table_args__ = (
+        db.Index('ix_transaction_date_created', 'date_created'),
+        db.Index('ix_transaction_type_date', 'transaction_type', 'date_created'),
+        db.Index('ix_transaction_category_date', 'category', 'date_created'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -13,9 +119,28 @@ class Transaction(db.Model):
     def __repr__(self):
         return f'<Transaction {self.description}: {self.amount}>'
     
+    @staticmethod
+    def apply_filters(query, transaction_type='all', category='all'):
+        """Apply the /transactions type and category filters to a query or select()"""
+        if transaction_type != 'all':
+            query = query.filter(Transaction.transaction_type == transaction_type)
+        
+        if category != 'all':
+            query = query.filter(Transaction.category == category)
+        
+        return query
+    
     @staticmethod
     def get_current_balance():
-        """Calculate current balance from all transactions"""
+        """Read current balance from the persisted balance ledger"""
+        return BalanceLedger.get_balance()
+    
+    @staticmethod
+    def calculate_balance_totals():
+        """Sum income and expenses over all transactions (full table scan)
+        
+        Includes the totals of partitions detached for archiving.
+        """
         income = db.session.query(func.sum(Transaction.amount)).filter(
             Transaction.transaction_type == 'income'
         ).scalar() or 0
@@ -24,27 +149,19 @@ class Transaction(db.Model):
             Transaction.transaction_type == 'expense'
         ).scalar() or 0
         
-        return income - expenses
+        count = db.session.query(func.count(Transaction.id)).scalar() or 0
+        
+        archived_income, archived_expenses, archived_count = ArchivedPartition.totals()
+        return income + archived_income, expenses + archived_expenses, count + archived_count
     
     @staticmethod
     def get_monthly_summary():
-        """Get monthly income and expense totals"""
-        from sqlalchemy import extract
+        """Get monthly income and expense totals (from the daily_totals rollup)"""
+        month_start, month_end = current_month_range()
+        totals = DailyTotal.totals_by_type(month_start.date(), month_end.date())
         
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_income = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'income',
-            extract('month', Transaction.date_created) == current_month,
-            extract('year', Transaction.date_created) == current_year
-        ).scalar() or 0
-        
-        monthly_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'expense',
-            extract('month', Transaction.date_created) == current_month,
-            extract('year', Transaction.date_created) == current_year
-        ).scalar() or 0
+        monthly_income = totals.get('income', 0)
+        monthly_expenses = totals.get('expense', 0)
         
         return {
             'income': monthly_income,
@@ -54,30 +171,494 @@ class Transaction(db.Model):
     
     @staticmethod
     def get_category_breakdown(transaction_type='expense'):
-        """Get spending breakdown by category"""
-        from sqlalchemy import extract
+        """Get spending breakdown by category (from the daily_totals rollup)"""
+        month_start, month_end = current_month_range()
+        
+        categories = DailyTotal.totals_by_category(transaction_type, month_start.date(), month_end.date())
+        
+        return [{'category': category, 'amount': total} for category, total in categories]
+
+
+class BalanceLedger(db.Model):
+    """Single-row running totals kept in step with the transaction table.
+    
+    Write paths call record() inside the same DB transaction as the insert or
+    delete, so reading the balance never has to scan the transaction table.
+    """
+    __tablename__ = 'balance_ledger'
+    
+    LEDGER_ID = 1
+    
+    id = db.Column(db.Integer, primary_key=True)
+    total_income = db.Column(db.Float, nullable=False, default=0)
+    total_expenses = db.Column(db.Float, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped on every write
+    # Bumped when the ledger is rebuilt or rows leave the table uncounted
+    # (detached partitions); deletes bump `deletions` instead, so the
+    # in-memory frame can re-read just their days (see transaction_frame.py)
+    epoch = db.Column(db.Integer, nullable=False, default=0)
+    deletions = db.Column(db.Integer, nullable=False, default=0)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BalanceLedger {self.total_income - self.total_expenses}>'
+    
+    @property
+    def balance(self):
+        return self.total_income - self.total_expenses
+    
+    @staticmethod
+    def get():
+        """Return the ledger row, building it from the raw rows if missing"""
+        ledger = db.session.get(BalanceLedger, BalanceLedger.LEDGER_ID)
+        if ledger is None:
+            ledger = BalanceLedger.rebuild()
+            db.session.commit()
+        return ledger
+    
+    @staticmethod
+    def get_balance():
+        """O(1) current balance"""
+        return BalanceLedger.get().balance
+    
+    @staticmethod
+    def get_version():
+        """Counter that changes whenever the transaction table is written"""
+        return BalanceLedger.get().version
+    
+    @staticmethod
+    def record(transaction, reverse=False):
+        """Apply a transaction (or its removal) to the running totals.
+        
+        Issues an atomic UPDATE on the current session so the change commits or
+        rolls back together with the transaction row itself.
+        """
+        sign = -1 if reverse else 1
+        amount = sign * transaction.amount
+        if transaction.transaction_type == 'income':
+            BalanceLedger.record_totals(income=amount, count=sign)
+        else:
+            BalanceLedger.record_totals(expenses=amount, count=sign)
+    
+    @staticmethod
+    def record_totals(income=0, expenses=0, count=0, removed=False):
+        """Apply aggregate deltas, e.g. for a bulk-inserted chunk of rows
+        
+        A negative count (deleted rows) bumps the deletion counter;
+        removed=True, for removals the totals do not reflect (detached
+        partitions), starts a new epoch.
+        """
+        # Without autoflush, a first-time rebuild cannot count the pending
+        # row that this call is about to add on top
+        with db.session.no_autoflush:
+            if db.session.get(BalanceLedger, BalanceLedger.LEDGER_ID) is None:
+                BalanceLedger.rebuild()
+        
+        values = {
+            'total_income': BalanceLedger.total_income + income,
+            'total_expenses': BalanceLedger.total_expenses + expenses,
+            'transaction_count': BalanceLedger.transaction_count + count,
+            'version': BalanceLedger.version + 1,
+            'date_updated': datetime.utcnow()
+        }
+        if count < 0:
+            values['deletions'] = BalanceLedger.deletions + 1
+        if removed:
+            values['epoch'] = BalanceLedger.epoch + 1
+        
+        db.session.execute(
+            update(BalanceLedger)
+            .where(BalanceLedger.id == BalanceLedger.LEDGER_ID)
+            .values(**values)
+            .execution_options(synchronize_session='fetch')
+        )
+    
+    @staticmethod
+    def rebuild():
+        """Recompute the running totals from the transaction table (not committed)
+        
+        Pending inserts/deletes are not flushed first, so a write path that calls
+        record() afterwards is still counted exactly once.
+        """
+        with db.session.no_autoflush:
+            income, expenses, count = Transaction.calculate_balance_totals()
+            ledger = db.session.get(BalanceLedger, BalanceLedger.LEDGER_ID)
+        
+        if ledger is None:
+            ledger = BalanceLedger(id=BalanceLedger.LEDGER_ID)
+            db.session.add(ledger)
+        
+        ledger.total_income = income
+        ledger.total_expenses = expenses
+        ledger.transaction_count = count
+        ledger.version = (ledger.version or 0) + 1
+        ledger.epoch = (ledger.epoch or 0) + 1
+        ledger.date_updated = datetime.utcnow()
+        db.session.flush()
+        
+        return ledger
+    
+    @staticmethod
+    def check_consistency(repair=False, tolerance=0.005):
+        """Compare the ledger against the raw rows, optionally rebuilding it"""
+        ledger = BalanceLedger.get()
+        income, expenses, count = Transaction.calculate_balance_totals()
+        
+        consistent = (
+            abs(ledger.total_income - income) <= tolerance and
+            abs(ledger.total_expenses - expenses) <= tolerance and
+            ledger.transaction_count == count
+        )
+        report = {
+            'consistent': consistent,
+            'ledger_balance': ledger.balance,
+            'actual_balance': income - expenses,
+            'ledger_count': ledger.transaction_count,
+            'actual_count': count,
+            'repaired': False
+        }
+        
+        if not consistent and repair:
+            BalanceLedger.rebuild()
+            db.session.commit()
+            report['repaired'] = True
+        
+        return report
+
+
+class CategoryCount(db.Model):
+    """Row count per (category, transaction_type), maintained on write.
+    
+    Serves the /transactions category dropdown and filtered totals without
+    a SELECT DISTINCT or COUNT(*) over the transaction table.
+    """
+    __tablename__ = 'category_counts'
+    
+    category = db.Column(db.String(50), primary_key=True)
+    transaction_type = db.Column(db.String(10), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CategoryCount {self.transaction_type}/{self.category}: {self.count}>'
+    
+    @staticmethod
+    def record(transaction, reverse=False):
+        CategoryCount.record_counts({
+            (transaction.category, transaction.transaction_type): -1 if reverse else 1
+        })
+    
+    @staticmethod
+    def record_counts(deltas):
+        """Apply {(category, transaction_type): delta} changes"""
+        upsert_increments(
+            CategoryCount,
+            ('category', 'transaction_type'),
+            ('count',),
+            [
+                {'category': category, 'transaction_type': transaction_type, 'count': delta}
+                for (category, transaction_type), delta in deltas.items()
+            ]
+        )
+    
+    @staticmethod
+    def rebuild():
+        """Recompute all counts from the transaction table (not committed)"""
+        with db.session.no_autoflush:
+            counts = db.session.query(
+                Transaction.category,
+                Transaction.transaction_type,
+                func.count(Transaction.id)
+            ).group_by(Transaction.category, Transaction.transaction_type).all()
+        
+        db.session.query(CategoryCount).delete()
+        db.session.add_all([
+            CategoryCount(category=category, transaction_type=transaction_type, count=count)
+            for category, transaction_type, count in counts
+        ])
+        db.session.flush()
+    
+    @staticmethod
+    def list_categories():
+        """Distinct categories that currently have at least one transaction"""
+        rows = db.session.query(CategoryCount.category).filter(
+            CategoryCount.count > 0
+        ).distinct().order_by(CategoryCount.category).all()
+        return [row[0] for row in rows]
+    
+    @staticmethod
+    def total(transaction_type='all', category='all'):
+        """Number of transactions matching the /transactions filters"""
+        query = db.session.query(func.sum(CategoryCount.count))
+        if transaction_type != 'all':
+            query = query.filter(CategoryCount.transaction_type == transaction_type)
+        if category != 'all':
+            query = query.filter(CategoryCount.category == category)
+        return query.scalar() or 0
+
+
+class DailyTotal(db.Model):
+    """Amount and row count per (day, transaction_type, category), maintained on write.
+    
+    Monthly summaries, category breakdowns, moving averages and the balance
+    trend aggregate this rollup instead of the transaction table, so their
+    cost grows with the number of days in range rather than with rows.
+    """
+    __tablename__ = 'daily_totals'
+    
+    day = db.Column(db.Date, primary_key=True)
+    transaction_type = db.Column(db.String(10), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyTotal {self.day} {self.transaction_type}/{self.category}: {self.total}>'
+    
+    @staticmethod
+    def record(transaction, reverse=False):
+        if transaction.date_created is None:
+            # date_created is filled in by its column default on flush
+            db.session.flush()
+        sign = -1 if reverse else 1
+        DailyTotal.record_totals({
+            (transaction.date_created.date(), transaction.transaction_type, transaction.category):
+                (sign * transaction.amount, sign)
+        })
+    
+    @staticmethod
+    def record_rows(rows):
+        """Fold bulk-inserted row dicts into the rollup"""
+        deltas = {}
+        for row in rows:
+            key = (row['date_created'].date(), row['transaction_type'], row['category'])
+            total, count = deltas.get(key, (0, 0))
+            deltas[key] = (total + row['amount'], count + 1)
+        DailyTotal.record_totals(deltas)
+    
+    @staticmethod
+    def record_totals(deltas):
+        """Apply {(day, transaction_type, category): (amount, count)} changes"""
+        upsert_increments(
+            DailyTotal,
+            ('day', 'transaction_type', 'category'),
+            ('total', 'count'),
+            [
+                {'day': day, 'transaction_type': transaction_type, 'category': category,
+                 'total': total, 'count': count}
+                for (day, transaction_type, category), (total, count) in deltas.items()
+            ]
+        )
+    
+    @staticmethod
+    def rebuild():
+        """Recompute the rollup from the transaction table (not committed)
         
-        current_month = datetime.now().month
-        current_year = datetime.now().year
+        Days inside archived partitions are left as they are: their rows are
+        gone from the transaction table, and any backdated row written there
+        since was already recorded on top of the preserved totals.
+        """
+        archived_ranges = db.session.query(ArchivedPartition.range_start, ArchivedPartition.range_end).all()
         
-        categories = db.session.query(
+        day = func.date(Transaction.date_created)
+        query = db.session.query(
+            day,
+            Transaction.transaction_type,
             Transaction.category,
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            Transaction.transaction_type == transaction_type,
-            extract('month', Transaction.date_created) == current_month,
-            extract('year', Transaction.date_created) == current_year
-        ).group_by(Transaction.category).all()
+            func.sum(Transaction.amount),
+            func.count(Transaction.id)
+        )
+        stale = db.session.query(DailyTotal)
+        if archived_ranges:
+            query = query.filter(not_(or_(*(
+                and_(Transaction.date_created >= datetime.combine(start, datetime.min.time()),
+                     Transaction.date_created < datetime.combine(end, datetime.min.time()))
+                for start, end in archived_ranges
+            ))))
+            stale = stale.filter(not_(or_(*(
+                and_(DailyTotal.day >= start, DailyTotal.day < end) for start, end in archived_ranges
+            ))))
+        
+        with db.session.no_autoflush:
+            rows = query.group_by(day, Transaction.transaction_type, Transaction.category).all()
         
-        return [{'category': cat.category, 'amount': cat.total} for cat in categories]
+        stale.delete(synchronize_session=False)
+        db.session.add_all([
+            DailyTotal(
+                day=datetime.strptime(row_day, '%Y-%m-%d').date() if isinstance(row_day, str) else row_day,
+                transaction_type=transaction_type, category=category, total=total, count=count
+            )
+            for row_day, transaction_type, category, total, count in rows
+        ])
+        db.session.flush()
+        return len(rows)
+    
+    @staticmethod
+    def totals_by_type(start_day, end_day):
+        """{transaction_type: amount} over the half-open day range [start_day, end_day)"""
+        rows = db.session.query(
+            DailyTotal.transaction_type,
+            func.sum(DailyTotal.total)
+        ).filter(
+            DailyTotal.day >= start_day,
+            DailyTotal.day < end_day
+        ).group_by(DailyTotal.transaction_type).all()
+        return {transaction_type: total or 0 for transaction_type, total in rows}
+    
+    @staticmethod
+    def totals_by_category(transaction_type, start_day, end_day):
+        """[(category, amount)] for categories with rows in [start_day, end_day)"""
+        return db.session.query(
+            DailyTotal.category,
+            func.sum(DailyTotal.total)
+        ).filter(
+            DailyTotal.transaction_type == transaction_type,
+            DailyTotal.day >= start_day,
+            DailyTotal.day < end_day
+        ).group_by(DailyTotal.category).having(func.sum(DailyTotal.count) > 0).all()
+    
+    @staticmethod
+    def totals_by_day(start_day, end_day):
+        """[(day, transaction_type, amount)] per day in [start_day, end_day)"""
+        return db.session.query(
+            DailyTotal.day,
+            DailyTotal.transaction_type,
+            func.sum(DailyTotal.total)
+        ).filter(
+            DailyTotal.day >= start_day,
+            DailyTotal.day < end_day
+        ).group_by(DailyTotal.day, DailyTotal.transaction_type).all()
+
+
+class ArchivedPartition(db.Model):
+    """Monthly transaction partition detached for archiving (see partitioning.py).
+    
+    Its totals stay part of the balance ledger, so consistency checks add
+    them back to the live rows.
+    """
+    __tablename__ = 'archived_partitions'
+    
+    name = db.Column(db.String(63), primary_key=True)
+    range_start = db.Column(db.Date, nullable=False)
+    range_end = db.Column(db.Date, nullable=False)  # exclusive
+    total_income = db.Column(db.Float, nullable=False, default=0)
+    total_expenses = db.Column(db.Float, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    date_detached = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivedPartition {self.name}: {self.transaction_count} rows>'
+    
+    @staticmethod
+    def totals():
+        """(income, expenses, count) summed over every archived partition"""
+        income, expenses, count = db.session.query(
+            func.sum(ArchivedPartition.total_income),
+            func.sum(ArchivedPartition.total_expenses),
+            func.sum(ArchivedPartition.transaction_count)
+        ).one()
+        return income or 0, expenses or 0, count or 0
+
+
+class Job(db.Model):
+    """Background job row for the database-backed queue in jobs.py"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    dedupe_key = db.Column(db.String(100), nullable=False, unique=True)  # one live job per key
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(10), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    rerun = db.Column(db.Boolean, nullable=False, default=False)  # re-enqueued while running
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+    claimed_at = db.Column(db.DateTime)  # start of the running worker's lease
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Job {self.dedupe_key}: {self.status}>'
 
 
 class Alert(db.Model):
+    __table_args__ = (
+        db.Index('ix_alert_fingerprint', 'fingerprint', unique=True),
+        db.Index('ix_alert_active_date', 'is_active', 'date_created'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     alert_type = db.Column(db.String(20), nullable=False)  # 'warning', 'caution', 'info'
     message = db.Column(db.String(500), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer)
+    severity = db.Column(db.String(10))
+    details = db.Column(db.Text)  # JSON metadata
+    fingerprint = db.Column(db.String(40))  # see Alert.make_fingerprint
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow)  # last time the alert was raised
     
     def __repr__(self):
         return f'<Alert {self.alert_type}: {self.message}>'
+    
+    @staticmethod
+    def make_fingerprint(alert_type, subject, forecast_date=None, user_id=None):
+        """Stable identity of an alert: same type, subject and forecast date -> same row"""
+        key = f'{user_id or ""}|{alert_type}|{subject}|{forecast_date or ""}'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def upsert(alert_type, message, fingerprint, user_id=None, severity=None, details=None):
+        """Insert an alert or refresh the existing row with the same fingerprint"""
+        now = datetime.utcnow()
+        values = {
+            'alert_type': alert_type,
+            'message': message,
+            'user_id': user_id,
+            'severity': severity,
+            'details': details,
+            'fingerprint': fingerprint,
+            'is_active': True,
+            'date_created': now,
+            'date_updated': now
+        }
+        refreshed = {name: values[name] for name in ('message', 'severity', 'details', 'is_active', 'date_updated')}
+        
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            statement = insert(Alert).values(**values).on_conflict_do_update(
+                index_elements=['fingerprint'], set_=refreshed
+            )
+            db.session.execute(statement)
+            return
+        
+        alert = Alert.query.filter_by(fingerprint=fingerprint).first()
+        if alert is None:
+            db.session.add(Alert(**values))
+        else:
+            for name, value in refreshed.items():
+                setattr(alert, name, value)
+    
+    @staticmethod
+    def resolve_missing(user_id, fingerprints):
+        """Deactivate a user's active alerts that were not raised again"""
+        query = Alert.query.filter(Alert.is_active == True, Alert.user_id == user_id)  # noqa: E712
+        if fingerprints:
+            query = query.filter(Alert.fingerprint.notin_(list(fingerprints)))
+        return query.update({'is_active': False, 'date_updated': datetime.utcnow()},
+                            synchronize_session=False)
+    
+    @staticmethod
+    def compact(retention_days=30):
+        """Delete inactive alerts not raised within the retention window"""
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        deleted = Alert.query.filter(
+            Alert.is_active == False,  # noqa: E712
+            func.coalesce(Alert.date_updated, Alert.date_created) < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
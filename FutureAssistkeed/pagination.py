@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination over Transaction ordered by (date_created, id).
+
+Each page seeks directly past the last row of the previous one instead of
+counting and skipping OFFSET rows, so page 1000 costs the same as page 1.
+"""
+
+from datetime import datetime
+from sqlalchemy import and_, or_
+from models import Transaction
+
+
+def encode_cursor(transaction):
+    return f'{transaction.date_created.isoformat()}_{transaction.id}'
+
+
+def decode_cursor(value):
+    """Parse a cursor from the query string; invalid cursors mean 'first page'"""
+    if not value:
+        return None
+    try:
+        date_part, id_part = value.rsplit('_', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except ValueError:
+        return None
+
+
+class KeysetPage:
+    """One page of newest-first transactions plus cursors to its neighbours"""
+
+    def __init__(self, items, has_next, has_prev, total=None):
+        self.items = items
+        self.has_next = has_next and bool(items)
+        self.has_prev = has_prev and bool(items)
+        self.total = total
+        self.next_cursor = encode_cursor(items[-1]) if self.has_next else None
+        self.prev_cursor = encode_cursor(items[0]) if self.has_prev else None
+
+
+def keyset_paginate(query, after=None, before=None, per_page=20, total=None):
+    """
+    Fetch the page of `query` just older than `after` or just newer than `before`
+
+    Args:
+        query: Transaction query with filters applied (no ordering)
+        after (tuple): (date_created, id) cursor of the last row already shown
+        before (tuple): (date_created, id) cursor of the first row already shown
+        per_page (int): Rows per page
+        total (int): Optional precomputed total to display
+
+    Returns:
+        KeysetPage
+    """
+    date_col, id_col = Transaction.date_created, Transaction.id
+
+    if before is not None:
+        cursor_date, cursor_id = before
+        rows = query.filter(or_(
+            date_col > cursor_date,
+            and_(date_col == cursor_date, id_col > cursor_id)
+        )).order_by(date_col.asc(), id_col.asc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        return KeysetPage(list(reversed(rows[:per_page])), has_next=True, has_prev=has_prev, total=total)
+
+    if after is not None:
+        cursor_date, cursor_id = after
+        query = query.filter(or_(
+            date_col < cursor_date,
+            and_(date_col == cursor_date, id_col < cursor_id)
+        ))
+
+    rows = query.order_by(date_col.desc(), id_col.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPage(rows[:per_page], has_next=has_next, has_prev=after is not None, total=total)
@@ -0,0 +1,264 @@
+"""
+Monthly range partitioning of the transaction table (PostgreSQL only).
+
+Nearly every hot query filters on a recent date_created window, so with one
+partition per calendar month the planner prunes everything outside the
+window. Layout:
+
+- "transaction" is PARTITION BY RANGE (date_created). Its primary key is
+  (id, date_created), because PostgreSQL requires the partition key in
+  every unique constraint. ids still come from a single sequence.
+- transaction_yYYYYmMM holds [first of month, first of next month).
+- transaction_default catches rows outside every month partition, so an
+  insert never fails when maintenance falls behind. When a month
+  partition is created later, its rows are moved out of the default.
+
+ensure_future_partitions() runs on start-up (through migrations) and from
+`flask create-partitions`. Schedule the command monthly for instances that
+are rarely restarted.
+
+Old months are archived with detach_partition(). The detached table is kept
+for pg_dump or moving elsewhere. Its totals are recorded in
+archived_partitions, so the balance ledger and the daily_totals history stay
+consistent after its rows leave the transaction table.
+"""
+
+from datetime import date, datetime
+from sqlalchemy import text, func, case, select, table, column
+from app import db
+from models import Transaction, BalanceLedger, CategoryCount, ArchivedPartition
+
+PARENT_TABLE = Transaction.__tablename__
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+ID_SEQUENCE = f'{PARENT_TABLE}_partitioned_id_seq'
+MONTHS_AHEAD = 3
+
+
+class PartitioningError(RuntimeError):
+    """Raised when partition maintenance cannot be applied"""
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def parse_month(value):
+    """'2025-06' -> date(2025, 6, 1)"""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise PartitioningError(f'Expected a month as YYYY-MM, got {value!r}')
+
+
+def is_supported():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def require_postgresql():
+    if not is_supported():
+        raise PartitioningError('Transaction partitioning requires the postgresql storage profile')
+
+
+def is_partitioned(connection=None):
+    if not is_supported():
+        return False
+    sql = text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND c.relnamespace = to_regnamespace(current_schema())"
+    )
+    if connection is not None:
+        return connection.execute(sql, {'name': PARENT_TABLE}).first() is not None
+    with db.engine.connect() as connection:
+        return connection.execute(sql, {'name': PARENT_TABLE}).first() is not None
+
+
+def list_partitions():
+    """[{'name', 'bounds', 'rows'}] for every attached partition, oldest first"""
+    require_postgresql()
+    with db.engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "WHERE parent.relname = :name "
+            "AND parent.relnamespace = to_regnamespace(current_schema()) "
+            "ORDER BY c.relname"
+        ), {'name': PARENT_TABLE}).fetchall()
+    return [{'name': name, 'bounds': bounds, 'rows': max(estimate, 0)} for name, bounds, estimate in rows]
+
+
+def create_month_partition(connection, month):
+    """Create and attach the partition for month, moving matching default rows.
+
+    Returns False if it already exists.
+    """
+    name = partition_name(month)
+    exists = connection.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar()
+    if exists is not None:
+        return False
+
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    # Built detached, filled from the default partition and then attached,
+    # because attaching would fail while the default still held its rows
+    connection.execute(text(
+        f'CREATE TABLE {name} (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    ))
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE date_created >= :start AND date_created < :end RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved'
+    ), bounds)
+    connection.execute(text(
+        f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION {name} '
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    return True
+
+
+def ensure_future_partitions(months_ahead=MONTHS_AHEAD, today=None):
+    """Create partitions from the current month to months_ahead months out"""
+    require_postgresql()
+    current = month_start(today or date.today())
+    created = []
+    with db.engine.begin() as connection:
+        if not is_partitioned(connection):
+            raise PartitioningError(f'"{PARENT_TABLE}" is not partitioned; run `flask partition-transactions`')
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if create_month_partition(connection, month):
+                created.append(partition_name(month))
+    return created
+
+
+def partition_transactions(months_ahead=MONTHS_AHEAD):
+    """Convert the plain transaction table into a monthly-partitioned one.
+
+    Rows are copied in one DB transaction while the old table is locked, so
+    run it in a maintenance window on large tables. Returns the partitions
+    created, or None if the table was already partitioned.
+    """
+    require_postgresql()
+    transaction_table = Transaction.__table__
+    dialect = db.engine.dialect
+    legacy = f'{PARENT_TABLE}_unpartitioned'
+
+    with db.engine.begin() as connection:
+        if is_partitioned(connection):
+            return None
+
+        connection.execute(text(f'LOCK TABLE "{PARENT_TABLE}" IN ACCESS EXCLUSIVE MODE'))
+        bounds = connection.execute(text(
+            f'SELECT min(date_created), max(date_created) FROM "{PARENT_TABLE}"'
+        )).first()
+        connection.execute(text(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO {legacy}'))
+        for index in transaction_table.indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+        connection.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {ID_SEQUENCE}'))
+        connection.execute(text(
+            f"SELECT setval('{ID_SEQUENCE}', COALESCE((SELECT max(id) FROM {legacy}), 0) + 1, false)"
+        ))
+
+        columns = []
+        for mapped in transaction_table.columns:
+            definition = f'{mapped.name} {mapped.type.compile(dialect=dialect)}'
+            if mapped.name == 'id':
+                definition += f" NOT NULL DEFAULT nextval('{ID_SEQUENCE}')"
+            elif not mapped.nullable or mapped.name == 'date_created':
+                definition += ' NOT NULL'
+            columns.append(definition)
+        connection.execute(text(
+            f'CREATE TABLE "{PARENT_TABLE}" ({", ".join(columns)}, '
+            f'CONSTRAINT {PARENT_TABLE}_partitioned_pkey PRIMARY KEY (id, date_created)) '
+            f'PARTITION BY RANGE (date_created)'
+        ))
+        connection.execute(text(f'ALTER SEQUENCE {ID_SEQUENCE} OWNED BY "{PARENT_TABLE}".id'))
+        for index in transaction_table.indexes:
+            index.create(connection)
+        connection.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF "{PARENT_TABLE}" DEFAULT'))
+
+        oldest = bounds[0].date() if bounds[0] else date.today()
+        newest = max(bounds[1].date() if bounds[1] else date.today(), date.today())
+        first, last = month_start(oldest), add_months(month_start(newest), months_ahead)
+        created = []
+        month = first
+        while month <= last:
+            create_month_partition(connection, month)
+            created.append(partition_name(month))
+            month = add_months(month, 1)
+
+        names = ', '.join(mapped.name for mapped in transaction_table.columns)
+        connection.execute(text(
+            f'INSERT INTO "{PARENT_TABLE}" ({names}) '
+            f'SELECT {names.replace("date_created", "COALESCE(date_created, now()) AS date_created")} '
+            f'FROM {legacy}'
+        ))
+        connection.execute(text(f'DROP TABLE {legacy}'))
+
+    return created
+
+
+def detach_partition(month):
+    """Detach one month for archiving and keep the aggregates consistent.
+
+    The partition becomes a standalone table with the same name. Its totals
+    are recorded in archived_partitions, and the category counts (which
+    describe the live table) are reduced by its rows.
+
+    The parent table (and with it every partition) is locked against writes
+    before the totals are read, so a back-dated insert cannot land in the
+    partition between the read and the detach. Readers are not blocked.
+    """
+    require_postgresql()
+    name = partition_name(month)
+
+    attached = {partition['name'] for partition in list_partitions()}
+    if name not in attached:
+        raise PartitioningError(f'{name} is not an attached partition')
+    if db.session.get(ArchivedPartition, name) is not None:
+        raise PartitioningError(f'{name} was already archived')
+
+    try:
+        # Held until the commit below; the detach then upgrades it to ACCESS EXCLUSIVE
+        db.session.execute(text(f'LOCK TABLE "{PARENT_TABLE}" IN SHARE ROW EXCLUSIVE MODE'))
+
+        partition = table(name, column('amount'), column('transaction_type'), column('category'))
+        totals = db.session.execute(select(
+            func.coalesce(func.sum(case((partition.c.transaction_type == 'income', partition.c.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((partition.c.transaction_type == 'expense', partition.c.amount), else_=0)), 0),
+            func.count()
+        ).select_from(partition)).first()
+        counts = db.session.execute(select(
+            partition.c.category, partition.c.transaction_type, func.count()
+        ).group_by(partition.c.category, partition.c.transaction_type)).all()
+
+        db.session.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION {name}'))
+        db.session.add(ArchivedPartition(
+            name=name,
+            range_start=month,
+            range_end=add_months(month, 1),
+            total_income=totals[0],
+            total_expenses=totals[1],
+            transaction_count=totals[2]
+        ))
+        CategoryCount.record_counts({
+            (category, transaction_type): -count for category, transaction_type, count in counts
+        })
+        # The ledger keeps counting archived rows; only the epoch moves on
+        BalanceLedger.record_totals(removed=True)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'partition': name, 'income': totals[0], 'expenses': totals[1], 'rows': totals[2]}
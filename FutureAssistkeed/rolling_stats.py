@@ -0,0 +1,299 @@
+"""
+Incremental rolling statistics over daily income and expense totals.
+
+RollingStats keeps, for the 7, 30 and 90 days ending today:
+
+- the per-day income and expense totals, in ring buffers
+- their mean and variance, maintained Welford-style
+
+It also keeps an exponentially weighted mean and variance over the whole
+history (EWMA_HALFLIFE_DAYS), for a trend that reacts faster than a flat
+window.
+
+The stats hang off the shared TransactionFrame (transaction_frame.py) and
+are built from its columns on first use:
+
+- appended rows update each window in O(1) per distinct day
+- the first read on a new day rolls the windows over in O(1) per day
+- a reloaded frame, or the copy made when deleted days are re-read,
+  starts without stats, so deletes and rebuilds start from scratch
+
+Only a back-dated row older than today triggers a recomputation, and only
+of the EWMA, which is rebuilt from the frame's daily totals.
+
+Windows count every calendar day, including days with no transactions.
+"""
+
+from datetime import date, timedelta
+import math
+import threading
+import numpy as np
+import transaction_frame
+from transaction_frame import EPOCH_DAY, day_number
+
+WINDOWS = (7, 30, 90)
+EWMA_HALFLIFE_DAYS = 14
+
+
+def day_date(number):
+    return EPOCH_DAY + timedelta(days=int(number))
+
+
+class RollingWindow:
+    """Daily totals of the `days` days ending at end_day, with their mean and variance"""
+
+    def __init__(self, days, end_day, totals=None):
+        self.days = days
+        self.end_day = end_day
+        # Ring buffer: the total for day d lives in slot d % days
+        self.totals = [0.0] * days
+        self.mean = 0.0
+        self.m2 = 0.0
+        if totals is not None:
+            for day, total in zip(range(end_day - days + 1, end_day + 1), totals[-days:]):
+                self.totals[day % days] = float(total)
+            self.mean = math.fsum(self.totals) / days
+            self.m2 = math.fsum((total - self.mean) ** 2 for total in self.totals)
+
+    def set_slot(self, slot, value):
+        """Replace one day's total; the window size is fixed, so mean and M2 update in O(1)"""
+        old = self.totals[slot]
+        delta = value - old
+        if not delta:
+            return
+        mean = self.mean + delta / self.days
+        self.m2 += delta * (value - mean + old - self.mean)
+        self.mean = mean
+        self.totals[slot] = value
+
+    def add(self, day, amount):
+        """Add to the total of `day`; days outside the window are ignored"""
+        if self.end_day - self.days < day <= self.end_day:
+            slot = day % self.days
+            self.set_slot(slot, self.totals[slot] + amount)
+
+    def advance(self, end_day):
+        """Move the window to end at end_day; each new day evicts the oldest"""
+        if end_day - self.end_day >= self.days:
+            self.totals = [0.0] * self.days
+            self.mean = self.m2 = 0.0
+        else:
+            for day in range(self.end_day + 1, end_day + 1):
+                self.set_slot(day % self.days, 0.0)
+        self.end_day = max(self.end_day, end_day)
+
+    @property
+    def variance(self):
+        """Sample variance, as statistics.variance"""
+        return max(self.m2, 0.0) / (self.days - 1) if self.days > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def values(self):
+        """Daily totals, oldest first"""
+        return [self.totals[day % self.days] for day in range(self.end_day - self.days + 1, self.end_day + 1)]
+
+
+class ExponentialStats:
+    """Exponentially weighted mean and variance of daily totals.
+
+    Closed days are folded in as they roll over; the open day (end_day) is
+    folded into the reported figures without being committed, since its
+    total can still change.
+    """
+
+    def __init__(self, halflife_days, end_day):
+        self.alpha = 1 - 0.5 ** (1 / halflife_days)
+        self.end_day = end_day
+        self.open_total = 0.0
+        self.mean = None
+        self.variance = 0.0
+
+    @classmethod
+    def from_totals(cls, halflife_days, end_day, totals):
+        """Fold a series of daily totals ending at end_day (the open day)"""
+        stats = cls(halflife_days, end_day)
+        for total in totals[:-1]:
+            stats.mean, stats.variance = stats.fold(float(total))
+        if len(totals):
+            stats.open_total = float(totals[-1])
+        return stats
+
+    def fold(self, value):
+        if self.mean is None:
+            return value, 0.0
+        delta = value - self.mean
+        return (self.mean + self.alpha * delta,
+                (1 - self.alpha) * (self.variance + self.alpha * delta * delta))
+
+    def add(self, day, amount):
+        """Add to the open day's total; returns False for a closed day, which needs a rebuild"""
+        if day < self.end_day:
+            return False
+        if day == self.end_day:
+            self.open_total += amount
+        return True
+
+    def advance(self, end_day):
+        for _ in range(self.end_day, end_day):
+            self.mean, self.variance = self.fold(self.open_total)
+            self.open_total = 0.0
+        self.end_day = max(self.end_day, end_day)
+
+    def current(self):
+        """(mean, standard deviation) including the open day"""
+        mean, variance = self.fold(self.open_total)
+        return mean, math.sqrt(max(variance, 0.0))
+
+
+class RollingStats:
+    """Income and expense windows (WINDOWS) plus their EWMA, kept current by the frame"""
+
+    def __init__(self, today, windows=WINDOWS, halflife_days=EWMA_HALFLIFE_DAYS):
+        self.today = today
+        self.windows = {days: (RollingWindow(days, today), RollingWindow(days, today)) for days in windows}
+        self.halflife_days = halflife_days
+        self.ewma = (ExponentialStats(halflife_days, today), ExponentialStats(halflife_days, today))
+        self.ewma_stale = False
+        # Totals for days after today, applied as the windows reach them
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, frame, today, windows=WINDOWS, halflife_days=EWMA_HALFLIFE_DAYS):
+        stats = cls(today, windows, halflife_days)
+        income, expenses = stats.history(frame)
+        for days in windows:
+            stats.windows[days] = (RollingWindow(days, today, income), RollingWindow(days, today, expenses))
+        stats.rebuild_ewma(frame, (income, expenses))
+
+        days, amounts, _ = frame.columns()
+        future = days > today
+        stats.add_many(days[future], amounts[future])
+        return stats
+
+    def history(self, frame):
+        """Daily (income, expenses) totals from the first transaction (or longest window) to today"""
+        days = frame.columns()[0]
+        first_day = self.today - max(self.windows, default=1) + 1
+        if len(days):
+            first_day = min(first_day, int(days[0]))
+        return frame.daily_totals(day_date(first_day), day_date(self.today + 1))
+
+    def rebuild_ewma(self, frame, history=None):
+        income, expenses = history if history is not None else self.history(frame)
+        self.ewma = tuple(ExponentialStats.from_totals(self.halflife_days, self.today, totals)
+                          for totals in (income, expenses))
+        self.ewma_stale = False
+
+    def add_many(self, days, amounts):
+        """Apply appended rows (day numbers and signed amounts); O(1) per distinct day"""
+        if not len(days):
+            return
+        unique_days, index = np.unique(days, return_inverse=True)
+        income = np.bincount(index, weights=np.where(amounts > 0, amounts, 0))
+        expenses = np.bincount(index, weights=np.where(amounts < 0, -amounts, 0))
+
+        with self._lock:
+            for day, day_income, day_expenses in zip(unique_days.tolist(), income.tolist(), expenses.tolist()):
+                self.add_day(day, day_income, day_expenses)
+
+    def add_day(self, day, income, expenses):
+        if day > self.today:
+            pending = self.pending.setdefault(day, [0.0, 0.0])
+            pending[0] += income
+            pending[1] += expenses
+            return
+        for window_pair in self.windows.values():
+            for window, amount in zip(window_pair, (income, expenses)):
+                if amount:
+                    window.add(day, amount)
+        for ewma, amount in zip(self.ewma, (income, expenses)):
+            if amount and not ewma.add(day, amount):
+                self.ewma_stale = True
+
+    def advance(self, today):
+        """Roll every window over to end at `today`"""
+        with self._lock:
+            # Future-dated totals are applied on their own day, while it is still open
+            for day in sorted(day for day in self.pending if day <= today):
+                self.roll(day)
+                self.add_day(day, *self.pending.pop(day))
+            self.roll(today)
+
+    def roll(self, today):
+        if today <= self.today:
+            return
+        for window_pair in self.windows.values():
+            for window in window_pair:
+                window.advance(today)
+        for ewma in self.ewma:
+            ewma.advance(today)
+        self.today = today
+
+    def window_stats(self, days):
+        """Summary of the `days`-day window ending today"""
+        with self._lock:
+            income, expenses = self.windows[days]
+            return {
+                'days': days,
+                'end_date': day_date(self.today),
+                'income': income.values(),
+                'expenses': expenses.values(),
+                'avg_income': income.mean,
+                'avg_expenses': expenses.mean,
+                'income_volatility': income.stdev,
+                'expense_volatility': expenses.stdev,
+            }
+
+    def ewma_stats(self):
+        """Exponentially weighted daily income and expense figures as of today"""
+        with self._lock:
+            (avg_income, income_volatility), (avg_expenses, expense_volatility) = (
+                ewma.current() for ewma in self.ewma
+            )
+            return {
+                'halflife_days': self.halflife_days,
+                'avg_income': avg_income,
+                'avg_expenses': avg_expenses,
+                'income_volatility': income_volatility,
+                'expense_volatility': expense_volatility,
+            }
+
+
+def current_stats():
+    """The shared frame's rolling stats, rolled over to today"""
+    today = day_number(date.today())
+    frame = transaction_frame.current_frame()
+
+    # Updated under the frame lock, so no append can slip in between
+    with transaction_frame.lock:
+        if frame.rolling is None:
+            frame.rolling = RollingStats.from_frame(frame, today)
+        elif frame.rolling.ewma_stale:
+            frame.rolling.rebuild_ewma(frame)
+        frame.rolling.advance(today)
+        return frame.rolling
+
+
+def window_stats(days):
+    """Stats for the `days`-day window ending today.
+
+    The WINDOWS lengths are maintained incrementally; any other length is
+    summed from the frame's daily totals on each call.
+    """
+    stats = current_stats()
+    if days in stats.windows:
+        return stats.window_stats(days)
+
+    frame = transaction_frame.current_frame()
+    income, expenses = frame.daily_totals(day_date(stats.today - days + 1), day_date(stats.today + 1))
+    one_off = RollingStats(stats.today, windows=())
+    one_off.windows[days] = (RollingWindow(days, stats.today, income), RollingWindow(days, stats.today, expenses))
+    return one_off.window_stats(days)
+
+
+def ewma_stats():
+    return current_stats().ewma_stats()
@@ -1,23 +1,41 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify
-from app import app, db
-from models import Transaction, Alert
+from flask import (Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify,
+                   Response, stream_with_context)
+from app import db
+from models import Transaction, CategoryCount, record_transaction_write
 from forms import TransactionForm
-from financial_calculator import FinancialCalculator
+from financial_calculator import FinancialCalculator, FinancialSnapshot
+from cache import forecast_cache
+from importer import import_statement, open_text_stream, StatementError
+from exporter import export_stream, EXPORT_FORMATS
+from pagination import keyset_paginate, decode_cursor
+from instrumentation import metrics
+from http_cache import ledger_conditional
+from services.alerts import queue_alert_check, get_latest_alerts, LEDGER_USER_ID
 from datetime import datetime
+import json
 
-@app.route('/')
+bp = Blueprint('main', __name__)
+
+# Ten years of daily points; longer ranges are clamped
+MAX_CHART_RANGE_DAYS = 3650
+
+@bp.route('/')
+@ledger_conditional
 def dashboard():
     """Main dashboard view"""
+    # Every figure below is derived from one request-scoped snapshot
+    snapshot = FinancialSnapshot.for_request()
+    
     # Get financial summary data
-    current_balance = Transaction.get_current_balance()
-    monthly_summary = Transaction.get_monthly_summary()
+    current_balance = snapshot.current_balance
+    monthly_summary = snapshot.monthly_summary
     recent_transactions = Transaction.query.order_by(Transaction.date_created.desc()).limit(5).all()
     
     # Generate alerts
-    alerts = FinancialCalculator.generate_alerts()
+    alerts = FinancialCalculator.generate_alerts(snapshot)
     
     # Get forecast data
-    forecast = FinancialCalculator.forecast_balance()
+    forecast = FinancialCalculator.forecast_balance(snapshot=snapshot)
     
     return render_template('dashboard.html',
                          current_balance=current_balance,
@@ -26,7 +44,7 @@ def dashboard():
                          alerts=alerts,
                          forecast=forecast)
 
-@app.route('/add_transaction', methods=['GET', 'POST'])
+@bp.route('/add_transaction', methods=['GET', 'POST'])
 def add_transaction():
     """Add new income or expense transaction"""
     form = TransactionForm()
@@ -41,44 +59,41 @@ def add_transaction():
         
         try:
             db.session.add(transaction)
+            record_transaction_write(transaction)
+            queue_alert_check(LEDGER_USER_ID)
             db.session.commit()
             
             flash_message = f'{"Income" if form.transaction_type.data == "income" else "Expense"} of P{form.amount.data:.2f} added successfully!'
             flash(flash_message, 'success')
             
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
             
         except Exception as e:
             db.session.rollback()
             flash('Error adding transaction. Please try again.', 'error')
-            app.logger.error(f'Error adding transaction: {str(e)}')
+            current_app.logger.error(f'Error adding transaction: {str(e)}')
     
     return render_template('add_transaction.html', form=form)
 
-@app.route('/transactions')
+@bp.route('/transactions')
 def transactions():
     """View all transactions with filtering"""
-    page = request.args.get('page', 1, type=int)
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
     transaction_type = request.args.get('type', 'all')
     category = request.args.get('category', 'all')
     
     # Build query
-    query = Transaction.query
-    
-    if transaction_type != 'all':
-        query = query.filter(Transaction.transaction_type == transaction_type)
+    query = Transaction.apply_filters(Transaction.query, transaction_type, category)
     
-    if category != 'all':
-        query = query.filter(Transaction.category == category)
-    
-    # Paginate results
-    transactions = query.order_by(Transaction.date_created.desc()).paginate(
-        page=page, per_page=20, error_out=False
+    # Keyset pagination: deep pages cost the same as page 1
+    transactions = keyset_paginate(
+        query, after=after, before=before, per_page=20,
+        total=CategoryCount.total(transaction_type, category)
     )
     
-    # Get unique categories for filter dropdown
-    categories = db.session.query(Transaction.category).distinct().all()
-    category_list = [cat[0] for cat in categories]
+    # Unique categories for filter dropdown, maintained on write and cached per ledger version
+    category_list = FinancialSnapshot.for_request().versioned(('categories',), CategoryCount.list_categories)
     
     return render_template('transactions.html',
                          transactions=transactions,
@@ -86,43 +101,146 @@ def transactions():
                          current_type=transaction_type,
                          current_category=category)
 
-@app.route('/forecast')
+@bp.route('/export')
+def export_transactions():
+    """Stream the full (optionally filtered) history as CSV or NDJSON"""
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '0') in ('1', 'true', 'yes')
+    transaction_type = request.args.get('type', 'all')
+    category = request.args.get('category', 'all')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unsupported export format'}), 400
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"transactions-{datetime.now().strftime('%Y%m%d')}.{extension}"
+    if compress:
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    body = export_stream(export_format, transaction_type, category, compress=compress)
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+
+@bp.route('/forecast')
+@ledger_conditional
 def forecast():
     """Detailed 30-day forecast view"""
-    forecast_data = FinancialCalculator.forecast_balance()
+    forecast_data = FinancialCalculator.forecast_balance(snapshot=FinancialSnapshot.for_request())
     return render_template('forecast.html', forecast=forecast_data)
 
-@app.route('/api/chart_data')
+@bp.route('/api/chart_data')
+@ledger_conditional
 def chart_data():
-    """API endpoint for chart data"""
+    """API endpoint for chart data
+    
+    Optional ?range=<days> (e.g. 90, 365; at most MAX_CHART_RANGE_DAYS) or
+    ?range=all for the full history.
+    """
+    chart_range = request.args.get('range', '30')
+    if chart_range == 'all':
+        days = None
+    elif chart_range.isdigit() and int(chart_range) > 0:
+        days = min(int(chart_range), MAX_CHART_RANGE_DAYS)
+    else:
+        return jsonify({'error': 'Invalid range'}), 400
+    
     try:
-        data = FinancialCalculator.get_chart_data()
+        data = FinancialCalculator.get_chart_data(days, snapshot=FinancialSnapshot.for_request())
         return jsonify(data)
     except Exception as e:
-        app.logger.error(f'Error getting chart data: {str(e)}')
+        current_app.logger.error(f'Error getting chart data: {str(e)}')
         return jsonify({'error': 'Unable to load chart data'}), 500
 
-@app.route('/delete_transaction/<int:transaction_id>', methods=['POST'])
+@bp.route('/api/forecast/probabilistic')
+def probabilistic_forecast():
+    """Monte Carlo shortfall probability and percentile bands"""
+    days = min(request.args.get('days', 90, type=int), 365)
+    paths = min(request.args.get('paths', 10000, type=int), 50000)
+    if days < 1 or paths < 1:
+        return jsonify({'error': 'days and paths must be positive'}), 400
+    
+    try:
+        data = FinancialCalculator.forecast_probabilistic(
+            days, paths, snapshot=FinancialSnapshot.for_request()
+        )
+        return jsonify(data)
+    except Exception as e:
+        current_app.logger.error(f'Error running probabilistic forecast: {str(e)}')
+        return jsonify({'error': 'Unable to run forecast'}), 500
+
+@bp.route('/api/import', methods=['POST'])
+def import_transactions():
+    """Import a CSV or OFX bank statement uploaded as 'statement'"""
+    upload = request.files.get('statement')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No statement uploaded'}), 400
+    
+    statement_format = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    
+    try:
+        summary = import_statement(open_text_stream(upload.stream), statement_format)
+        return jsonify(summary)
+    except StatementError as e:
+        # Chunks before the bad row are already committed
+        return jsonify({'error': str(e), 'imported': (e.summary or {}).get('imported', 0)}), 400
+    except Exception as e:
+        current_app.logger.error(f'Error importing statement: {str(e)}')
+        return jsonify({'error': 'Unable to import statement'}), 500
+
+@bp.route('/api/alerts')
+def stored_alerts():
+    """Active alerts stored by the background worker's last evaluation"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    return jsonify([{
+        'id': alert.id,
+        'type': alert.alert_type,
+        'severity': alert.severity,
+        'message': alert.message,
+        'details': json.loads(alert.details) if alert.details else {},
+        'date_created': alert.date_created.isoformat(),
+        'date_updated': alert.date_updated.isoformat() if alert.date_updated else None
+    } for alert in get_latest_alerts(LEDGER_USER_ID, limit)])
+
+@bp.route('/api/cache_stats')
+def cache_stats():
+    """Hit rate and size of the ledger-versioned forecast cache"""
+    return jsonify(forecast_cache.stats())
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Per-route request, SQL and timing metrics in Prometheus text format"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/metrics')
+def metrics_snapshot():
+    """The same per-route figures as JSON, with each route's slowest statement"""
+    return jsonify(metrics.snapshot())
+
+@bp.route('/delete_transaction/<int:transaction_id>', methods=['POST'])
 def delete_transaction(transaction_id):
     """Delete a transaction"""
     transaction = Transaction.query.get_or_404(transaction_id)
     
     try:
         db.session.delete(transaction)
+        record_transaction_write(transaction, reverse=True)
+        queue_alert_check(LEDGER_USER_ID)
         db.session.commit()
         flash('Transaction deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
         flash('Error deleting transaction. Please try again.', 'error')
-        app.logger.error(f'Error deleting transaction: {str(e)}')
+        current_app.logger.error(f'Error deleting transaction: {str(e)}')
     
-    return redirect(url_for('transactions'))
+    return redirect(url_for('main.transactions'))
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     return render_template('base.html', error_message='Page not found'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('base.html', error_message='Internal server error'), 500
@@ -4,42 +4,54 @@ This will demonstrate the shortfall detection system
 """
 
 from datetime import datetime, timedelta
-from app import app, db
-from models import Transaction
+from app import create_app, db
+from models import Transaction, rebuild_aggregates
+import migrations
 import random
 
+# Sample transaction patterns for Botswana
+INCOME_SOURCES = [
+    ('Salary - Government Job', 8500.00, 'salary'),
+    ('Freelance Web Design', 1200.00, 'freelance'),
+    ('Side Business - Crafts', 800.00, 'other_income'),
+]
+
+EXPENSE_CATEGORIES = [
+    ('Groceries - Choppies', 150.00, 300.00, 'food'),
+    ('Transport - Combis', 80.00, 150.00, 'transportation'),
+    ('Rent - 2BR Flat', 2200.00, 2200.00, 'housing'),
+    ('Electricity - BPC', 180.00, 280.00, 'utilities'),
+    ('Water Bill', 120.00, 180.00, 'utilities'),
+    ('Internet - Orange', 299.00, 299.00, 'utilities'),
+    ('Fuel - Shell/Engen', 200.00, 400.00, 'transportation'),
+    ('Medical - Consultation', 150.00, 500.00, 'healthcare'),
+    ('Entertainment - Movies', 80.00, 200.00, 'entertainment'),
+    ('Clothing - Game/Woolworths', 200.00, 800.00, 'shopping'),
+    ('Phone Airtime', 50.00, 100.00, 'utilities'),
+    ('Restaurant - Nandos/Steers', 120.00, 250.00, 'food'),
+]
+
+# (description, amount, category) added over the last few days
+RECENT_LARGE_EXPENSES = [
+    ('Car Repair - Brake Service', 1500.00, 'transportation'),
+    ('Medical Emergency', 2200.00, 'healthcare'),
+    ('Laptop Replacement', 4500.00, 'shopping'),
+    ('Insurance Premium', 1800.00, 'insurance'),
+]
+
+
 def create_sample_transactions():
     """Create sample transactions that will trigger shortfall detection"""
     
-    with app.app_context():
+    with create_app().app_context():
+        migrations.upgrade_schema()
+        
         # Clear existing transactions
         Transaction.query.delete()
         
         # Starting from 45 days ago to build historical data
         start_date = datetime.now() - timedelta(days=45)
         
-        # Sample transaction patterns for Botswana
-        income_sources = [
-            ('Salary - Government Job', 8500.00, 'salary'),
-            ('Freelance Web Design', 1200.00, 'freelance'),
-            ('Side Business - Crafts', 800.00, 'other_income'),
-        ]
-        
-        expense_categories = [
-            ('Groceries - Choppies', 150.00, 300.00, 'food'),
-            ('Transport - Combis', 80.00, 150.00, 'transportation'),
-            ('Rent - 2BR Flat', 2200.00, 2200.00, 'housing'),
-            ('Electricity - BPC', 180.00, 280.00, 'utilities'),
-            ('Water Bill', 120.00, 180.00, 'utilities'),
-            ('Internet - Orange', 299.00, 299.00, 'utilities'),
-            ('Fuel - Shell/Engen', 200.00, 400.00, 'transportation'),
-            ('Medical - Consultation', 150.00, 500.00, 'healthcare'),
-            ('Entertainment - Movies', 80.00, 200.00, 'entertainment'),
-            ('Clothing - Game/Woolworths', 200.00, 800.00, 'shopping'),
-            ('Phone Airtime', 50.00, 100.00, 'utilities'),
-            ('Restaurant - Nandos/Steers', 120.00, 250.00, 'food'),
-        ]
-        
         current_date = start_date
         
         # Create historical transactions (45 days)
@@ -48,17 +60,17 @@ def create_sample_transactions():
             # Add income (salary typically monthly, freelance irregular)
             if current_date.day == 25:  # Salary day
                 transaction = Transaction(
-                    description=income_sources[0][0],
-                    amount=income_sources[0][1],
+                    description=INCOME_SOURCES[0][0],
+                    amount=INCOME_SOURCES[0][1],
                     transaction_type='income',
-                    category=income_sources[0][2],
+                    category=INCOME_SOURCES[0][2],
                     date_created=current_date
                 )
                 db.session.add(transaction)
             
             # Freelance income (random)
             if random.random() < 0.1:  # 10% chance per day
-                source = random.choice(income_sources[1:])
+                source = random.choice(INCOME_SOURCES[1:])
                 transaction = Transaction(
                     description=source[0],
                     amount=random.uniform(source[1] * 0.5, source[1] * 1.5),
@@ -75,7 +87,7 @@ def create_sample_transactions():
                 # 1-3 expenses per day
                 num_expenses = random.randint(1, 3)
                 for _ in range(num_expenses):
-                    expense = random.choice(expense_categories)
+                    expense = random.choice(EXPENSE_CATEGORIES)
                     amount = random.uniform(expense[1], expense[2])
                     
                     transaction = Transaction(
@@ -90,14 +102,7 @@ def create_sample_transactions():
             current_date += timedelta(days=1)
         
         # Add some large recent expenses to trigger shortfall
-        recent_large_expenses = [
-            ('Car Repair - Brake Service', 1500.00, 'transportation'),
-            ('Medical Emergency', 2200.00, 'healthcare'),
-            ('Laptop Replacement', 4500.00, 'shopping'),
-            ('Insurance Premium', 1800.00, 'insurance'),
-        ]
-        
-        for i, expense in enumerate(recent_large_expenses):
+        for i, expense in enumerate(RECENT_LARGE_EXPENSES):
             transaction = Transaction(
                 description=expense[0],
                 amount=expense[1],
@@ -107,7 +112,9 @@ def create_sample_transactions():
             )
             db.session.add(transaction)
         
-        # Commit all transactions
+        # Commit all transactions together with the rebuilt aggregates
+        db.session.flush()
+        rebuild_aggregates()
         db.session.commit()
         
         print(f"Created sample transactions with BWP currency")
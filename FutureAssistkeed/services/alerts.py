@@ -1,70 +1,169 @@
 from datetime import datetime, timedelta
 from app import db
-from models import User, Transaction, Alert
-from services.forecasting import generate_forecast
+from models import Alert
+import jobs
+import json
 import logging
 
+# services.forecasting and rolling_stats (NumPy) are imported where they are
+# used: request paths import this module only to queue checks
 
-def check_alerts(user_id):
+# The transaction table has no owner column, so request paths queue the
+# alert check under this one user id
+LEDGER_USER_ID = 1
+
+# Forecast balances below this (BWP) raise a low-balance alert; the same
+# figure as the dashboard's low-balance alert and the settings default
+DEFAULT_ALERT_THRESHOLD = 100
+
+
+def queue_alert_check(user_id):
+    """
+    Schedule alert evaluation for a user on the background worker
+    
+    Call from request paths (e.g. after a transaction write) instead of
+    check_alerts(). Jobs are de-duplicated per user and writes arriving
+    within the coalescing window share one evaluation. The job is added to
+    the current session and commits with the caller's write.
+    
+    Args:
+        user_id (int): User ID
+    
+    Returns:
+        Job: The scheduled job
+    """
+    return jobs.enqueue('check_alerts', f'check_alerts:user:{user_id}', {'user_id': user_id})
+
+
+def run_alert_job(user_id):
+    """Worker entry point for 'check_alerts' jobs; errors propagate so jobs.run_job retries"""
+    from services.forecasting import ledger_forecast
+    evaluate_alerts(user_id, ledger_forecast(days=14))
+
+
+def get_latest_alerts(user_id, limit=20):
+    """
+    Read the most recent active alerts stored by the worker (served by /api/alerts)
+    
+    Args:
+        user_id (int): User ID
+        limit (int): Maximum number of alerts
+    
+    Returns:
+        list: Alert rows, newest first
+    """
+    return Alert.query.filter_by(user_id=user_id, is_active=True)\
+                      .order_by(Alert.date_created.desc())\
+                      .limit(limit).all()
+
+
+def check_alerts(user_id, forecast_data=None):
     """
     Check for financial alerts based on forecast data and user preferences
     
     Args:
         user_id (int): User ID
+        forecast_data (dict): Precomputed 14-day forecast (e.g. from generate_forecasts)
     
     Returns:
         list: List of triggered alerts
     """
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return []
-        
         # Generate forecast to check for potential issues
-        forecast_data = generate_forecast(user_id, days=14)  # 2-week forecast for alerts
-        
-        alerts_triggered = []
-        
-        # Check for cash shortfall alerts
-        shortfall_alerts = check_shortfall_alerts(user, forecast_data)
-        alerts_triggered.extend(shortfall_alerts)
-        
-        # Check for spending pattern alerts
-        spending_alerts = check_spending_alerts(user, forecast_data)
-        alerts_triggered.extend(spending_alerts)
-        
-        # Check for income pattern alerts
-        income_alerts = check_income_alerts(user, forecast_data)
-        alerts_triggered.extend(income_alerts)
-        
-        # Save alerts to database
-        for alert_data in alerts_triggered:
-            alert = Alert(
-                user_id=user_id,
-                alert_type=alert_data['type'],
-                message=alert_data['message'],
-                severity=alert_data['severity'],
-                metadata=str(alert_data.get('metadata', {}))
-            )
-            db.session.add(alert)
+        if forecast_data is None:
+            from services.forecasting import generate_forecast
+            forecast_data = generate_forecast(user_id, days=14)  # 2-week forecast for alerts
         
-        if alerts_triggered:
-            db.session.commit()
-        
-        return alerts_triggered
+        return evaluate_alerts(user_id, forecast_data)
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error checking alerts for user {user_id}: {str(e)}")
         return []
 
 
-def check_shortfall_alerts(user, forecast_data):
+def evaluate_alerts(user_id, forecast_data, threshold=DEFAULT_ALERT_THRESHOLD):
+    """
+    Raise, refresh and resolve a user's stored alerts from a forecast and commit
+    
+    Unlike check_alerts() this lets errors propagate.
+    
+    Args:
+        user_id (int): User ID
+        forecast_data (dict): 14-day forecast
+        threshold (float): Low-balance threshold
+    
+    Returns:
+        list: List of triggered alerts
+    """
+    alerts_triggered = []
+    
+    # Check for cash shortfall alerts
+    shortfall_alerts = check_shortfall_alerts(forecast_data, threshold)
+    alerts_triggered.extend(shortfall_alerts)
+    
+    # Check for spending pattern alerts
+    spending_alerts = check_spending_alerts(forecast_data)
+    alerts_triggered.extend(spending_alerts)
+    
+    # Check for income pattern alerts
+    income_alerts = check_income_alerts(forecast_data)
+    alerts_triggered.extend(income_alerts)
+    
+    # Save alerts: refresh rows already raised for the same type, subject
+    # and forecast date instead of inserting duplicates
+    fingerprints = set()
+    for alert_data in alerts_triggered:
+        fingerprint = Alert.make_fingerprint(
+            alert_data['type'],
+            alert_data.get('subject'),
+            alert_data.get('forecast_date'),
+            user_id=user_id
+        )
+        fingerprints.add(fingerprint)
+        Alert.upsert(
+            alert_data['type'],
+            alert_data['message'],
+            fingerprint,
+            user_id=user_id,
+            severity=alert_data['severity'],
+            details=json.dumps(alert_data.get('metadata', {}), default=str)
+        )
+    
+    # Alerts no longer raised are resolved
+    Alert.resolve_missing(user_id, fingerprints)
+    db.session.commit()
+    
+    return alerts_triggered
+
+
+def check_alerts_for_users(user_ids, workers=None):
+    """
+    Check alerts for many users, forecasting them all in one batch
+    
+    Args:
+        user_ids (iterable): User IDs
+        workers (int): Process pool size passed to generate_forecasts
+    
+    Returns:
+        dict: user_id -> list of triggered alerts
+    """
+    from services.forecasting import generate_forecasts
+    user_ids = list(user_ids)
+    forecasts = generate_forecasts(user_ids, days=14, workers=workers)
+    
+    return {
+        user_id: check_alerts(user_id, forecast_data=forecasts.get(user_id))
+        for user_id in user_ids
+    }
+
+
+def check_shortfall_alerts(forecast_data, threshold=DEFAULT_ALERT_THRESHOLD):
     """Check for potential cash shortfall alerts"""
     alerts = []
     
-    # Check if balance will go below user's threshold
+    # Check if balance will go below the threshold
     shortfalls = forecast_data.get('shortfalls', [])
-    threshold = user.alert_threshold
     
     if shortfalls:
         first_shortfall = min(shortfalls, key=lambda x: x['date'])
@@ -77,6 +176,8 @@ def check_shortfall_alerts(user, forecast_data):
             'message': f"Warning: Your balance may go negative in {days_until} days. "
                       f"Expected shortfall: BWP {abs(first_shortfall['predicted_balance']):.2f}",
             'severity': severity,
+            'subject': 'balance',
+            'forecast_date': first_shortfall['date'],
             'metadata': {
                 'days_until': days_until,
                 'shortfall_amount': abs(first_shortfall['predicted_balance']),
@@ -99,6 +200,8 @@ def check_shortfall_alerts(user, forecast_data):
             'message': f"Your balance will be low (BWP {first_low['predicted_balance']:.2f}) in {days_until} days. "
                       f"Consider reviewing your spending.",
             'severity': 'medium',
+            'subject': 'balance',
+            'forecast_date': first_low['date'],
             'metadata': {
                 'days_until': days_until,
                 'predicted_balance': first_low['predicted_balance'],
@@ -109,20 +212,17 @@ def check_shortfall_alerts(user, forecast_data):
     return alerts
 
 
-def check_spending_alerts(user, forecast_data):
+def check_spending_alerts(forecast_data):
     """Check for unusual spending pattern alerts"""
+    import rolling_stats
     alerts = []
     
     expense_analysis = forecast_data.get('expense_analysis', {})
     
-    # Check if daily spending is unusually high
-    recent_transactions = Transaction.query.filter_by(user_id=user.id)\
-                                         .filter(Transaction.amount < 0)\
-                                         .filter(Transaction.transaction_date >= datetime.now() - timedelta(days=7))\
-                                         .all()
+    # Check if daily spending is unusually high (rolling 7-day window)
+    recent_spending = rolling_stats.window_stats(7)['avg_expenses']  # Daily average
     
-    if recent_transactions:
-        recent_spending = sum(abs(t.amount) for t in recent_transactions) / 7  # Daily average
+    if recent_spending > 0:
         historical_average = expense_analysis.get('average_daily', 0)
         
         if recent_spending > historical_average * 1.5 and historical_average > 0:
@@ -131,6 +231,8 @@ def check_spending_alerts(user, forecast_data):
                 'message': f"Your spending has increased significantly. Daily average: BWP {recent_spending:.2f} "
                           f"vs usual BWP {historical_average:.2f}",
                 'severity': 'medium',
+                'subject': 'spending',
+                'forecast_date': datetime.now().date().isoformat(),
                 'metadata': {
                     'recent_daily': recent_spending,
                     'historical_daily': historical_average,
@@ -141,12 +243,12 @@ def check_spending_alerts(user, forecast_data):
     return alerts
 
 
-def check_income_alerts(user, forecast_data):
+def check_income_alerts(forecast_data):
     """Check for income-related alerts"""
     alerts = []
     
     income_analysis = forecast_data.get('income_analysis', {})
-    days_since_income = income_analysis.get('last_income_days_ago', 0)
+    days_since_income = income_analysis.get('last_income_days_ago') or 0  # None without income
     frequency = income_analysis.get('frequency_days', 30)
     
     # Alert if income is significantly overdue
@@ -156,6 +258,9 @@ def check_income_alerts(user, forecast_data):
             'message': f"It's been {days_since_income} days since your last income. "
                       f"Your typical frequency is every {frequency} days.",
             'severity': 'medium',
+            'subject': 'income',
+            # One alert per overdue episode: keyed by the last income date
+            'forecast_date': (datetime.now() - timedelta(days=days_since_income)).date().isoformat(),
             'metadata': {
                 'days_since_income': days_since_income,
                 'typical_frequency': frequency,
@@ -170,6 +275,7 @@ def check_income_alerts(user, forecast_data):
             'message': "Your income pattern is highly irregular. Consider building an emergency fund "
                       "and tracking income sources to better predict cash flow.",
             'severity': 'low',
+            'subject': 'income_pattern',
             'metadata': {
                 'consistency_score': income_analysis.get('income_consistency', 0),
                 'pattern_type': income_analysis.get('pattern_type')
@@ -192,20 +298,18 @@ def get_financial_advice(user_id, alert_type='general'):
         dict: Financial advice and recommendations
     """
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return {'error': 'User not found'}
+        from services.forecasting import generate_forecast
         
         # Get user's financial context
         forecast_data = generate_forecast(user_id, days=30)
         
         advice_map = {
-            'cash_shortfall': get_shortfall_advice(user, forecast_data),
-            'low_balance': get_low_balance_advice(user, forecast_data),
-            'high_spending': get_spending_advice(user, forecast_data),
-            'income_overdue': get_income_advice(user, forecast_data),
-            'irregular_income': get_irregular_income_advice(user, forecast_data),
-            'general': get_general_advice(user, forecast_data)
+            'cash_shortfall': get_shortfall_advice(user_id, forecast_data),
+            'low_balance': get_low_balance_advice(user_id, forecast_data),
+            'high_spending': get_spending_advice(user_id, forecast_data),
+            'income_overdue': get_income_advice(user_id, forecast_data),
+            'irregular_income': get_irregular_income_advice(user_id, forecast_data),
+            'general': get_general_advice(user_id, forecast_data)
         }
         
         return advice_map.get(alert_type, advice_map['general'])
@@ -215,7 +319,7 @@ def get_financial_advice(user_id, alert_type='general'):
         return {'error': 'Failed to generate advice'}
 
 
-def get_shortfall_advice(user, forecast_data):
+def get_shortfall_advice(user_id, forecast_data):
     """Advice for cash shortfall situations"""
     return {
         'title': 'Managing Cash Shortfalls',
@@ -242,7 +346,7 @@ def get_shortfall_advice(user, forecast_data):
     }
 
 
-def get_low_balance_advice(user, forecast_data):
+def get_low_balance_advice(user_id, forecast_data):
     """Advice for low balance situations"""
     return {
         'title': 'Managing Low Balance',
@@ -269,7 +373,7 @@ def get_low_balance_advice(user, forecast_data):
     }
 
 
-def get_spending_advice(user, forecast_data):
+def get_spending_advice(user_id, forecast_data):
     """Advice for high spending patterns"""
     expense_analysis = forecast_data.get('expense_analysis', {})
     categories = expense_analysis.get('categories', {})
@@ -307,7 +411,7 @@ def get_spending_advice(user, forecast_data):
     }
 
 
-def get_income_advice(user, forecast_data):
+def get_income_advice(user_id, forecast_data):
     """Advice for income-related issues"""
     return {
         'title': 'Increasing and Stabilizing Income',
@@ -340,7 +444,7 @@ def get_income_advice(user, forecast_data):
     }
 
 
-def get_irregular_income_advice(user, forecast_data):
+def get_irregular_income_advice(user_id, forecast_data):
     """Advice for managing irregular income"""
     return {
         'title': 'Managing Irregular Income',
@@ -373,7 +477,7 @@ def get_irregular_income_advice(user, forecast_data):
     }
 
 
-def get_general_advice(user, forecast_data):
+def get_general_advice(user_id, forecast_data):
     """General financial advice"""
     return {
         'title': 'Building Financial Wellness',
@@ -1,7 +1,101 @@
 import re
+from functools import lru_cache
 from models import TRANSACTION_CATEGORIES
 
 
+BOTSWANA_MERCHANTS = [
+    'spar', 'choppies', 'pick n pay', 'mascom', 'btc', 'orange',
+    'first national bank', 'fnb', 'standard chartered', 'barclays'
+]
+
+CLEAR_INDICATORS = {
+    'income': ['salary', 'wage', 'pay', 'allowance', 'grant'],
+    'expense': ['purchase', 'payment', 'bill', 'fee']
+}
+
+SUBCATEGORY_MAP = {
+    'food': {
+        'restaurant': ['restaurant', 'takeaway', 'fast food', 'cafe'],
+        'grocery': ['grocery', 'spar', 'choppies', 'pick n pay', 'supermarket'],
+        'street_food': ['vendor', 'street', 'market']
+    },
+    'transport': {
+        'taxi': ['taxi', 'combi'],
+        'fuel': ['fuel', 'petrol', 'diesel', 'gas'],
+        'public': ['bus', 'public transport']
+    },
+    'communication': {
+        'airtime': ['airtime', 'credit', 'recharge'],
+        'data': ['data', 'internet', 'wifi'],
+        'monthly': ['monthly', 'subscription', 'contract']
+    },
+    'healthcare': {
+        'medication': ['medicine', 'pharmacy', 'drugs'],
+        'consultation': ['doctor', 'clinic', 'consultation'],
+        'emergency': ['emergency', 'hospital', 'ambulance']
+    }
+}
+
+DAILY_EXPENSE_WORDS = ['taxi', 'food', 'lunch', 'breakfast']
+GOV_KEYWORDS = ['government', 'ministry', 'council', 'bdf', 'police', 'ipelegeng']
+EDU_KEYWORDS = ['university', 'school', 'college', 'ub', 'botho', 'limkokwing']
+
+
+def substring_matcher(words):
+    """Compile 'any(word in text for word in words)' into one regex search"""
+    return re.compile('|'.join(re.escape(word) for word in words)).search
+
+
+has_merchant = substring_matcher(BOTSWANA_MERCHANTS)
+has_indicator = {kind: substring_matcher(words) for kind, words in CLEAR_INDICATORS.items()}
+has_daily_expense_word = substring_matcher(DAILY_EXPENSE_WORDS)
+has_gov_keyword = substring_matcher(GOV_KEYWORDS)
+has_edu_keyword = substring_matcher(EDU_KEYWORDS)
+subcategory_matchers = {
+    category: [(subcategory, substring_matcher(keywords)) for subcategory, keywords in subcategories.items()]
+    for category, subcategories in SUBCATEGORY_MAP.items()
+}
+
+
+class KeywordMatcher:
+    """All keywords of one TRANSACTION_CATEGORIES group compiled into one regex.
+    
+    Keywords are ordered by their position in the category table and joined
+    into a single word-bounded alternation inside a lookahead, so one
+    finditer pass reports, at every position, the earliest-listed keyword
+    matching there. The minimum over all positions is therefore the same
+    keyword the original per-keyword loop would have picked first.
+    """
+    
+    def __init__(self, categories):
+        self.entries = []  # priority -> (category, keyword)
+        priorities = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self.entries.append((category, keyword))
+                priorities.setdefault(keyword.lower(), len(self.entries) - 1)
+        
+        self.priorities = priorities
+        self.exact = {}
+        for priority, (_, keyword) in enumerate(self.entries):
+            self.exact.setdefault(keyword, priority)
+        
+        alternation = '|'.join(re.escape(keyword) for keyword in priorities)
+        self.pattern = re.compile(r'(?=\b(' + alternation + r')\b)') if priorities else None
+    
+    def matches(self, description):
+        """Priorities of every keyword found in a lower-cased description"""
+        if self.pattern is None:
+            return set()
+        return {self.priorities[match.group(1)] for match in self.pattern.finditer(description)}
+
+
+@lru_cache(maxsize=None)
+def keyword_matcher(group):
+    """Compiled matcher for TRANSACTION_CATEGORIES['income'] or ['expenses']"""
+    return KeywordMatcher(TRANSACTION_CATEGORIES[group])
+
+
 def categorize_transaction(description, amount):
     """
     AI-based transaction categorization using keyword matching
@@ -18,7 +112,6 @@ def categorize_transaction(description, amount):
     
     # Determine if it's income or expense based on amount
     is_income = amount > 0
-    categories = TRANSACTION_CATEGORIES['income'] if is_income else TRANSACTION_CATEGORIES['expenses']
     
     best_match = {
         'category': 'other_income' if is_income else 'other_expenses',
@@ -28,20 +121,27 @@ def categorize_transaction(description, amount):
     }
     
     # Enhanced keyword matching with Botswana-specific terms
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            # Use word boundaries to avoid partial matches
-            pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-            if re.search(pattern, description_lower):
-                confidence = calculate_confidence(keyword, description_lower, is_income)
-                
-                if confidence > best_match['confidence']:
-                    best_match = {
-                        'category': category,
-                        'subcategory': get_subcategory(category, description_lower),
-                        'confidence': confidence,
-                        'explanation': f'Matched keyword "{keyword}" in description'
-                    }
+    matcher = keyword_matcher('income' if is_income else 'expenses')
+    matched = matcher.matches(description_lower)
+    
+    if matched:
+        # The first listed keyword wins unless an exact match scores higher
+        candidates = [min(matched)]
+        exact = matcher.exact.get(description_lower)
+        if exact is not None and matcher.priorities[description_lower] in matched and exact != candidates[0]:
+            candidates.append(exact)
+        
+        for priority in sorted(candidates):
+            category, keyword = matcher.entries[priority]
+            confidence = calculate_confidence(keyword, description_lower, is_income)
+            
+            if confidence > best_match['confidence']:
+                best_match = {
+                    'category': category,
+                    'subcategory': get_subcategory(category, description_lower),
+                    'confidence': confidence,
+                    'explanation': f'Matched keyword "{keyword}" in description'
+                }
     
     # Apply additional rules for better accuracy
     best_match = apply_categorization_rules(description_lower, amount, best_match)
@@ -49,6 +149,31 @@ def categorize_transaction(description, amount):
     return best_match
 
 
+def categorize_many(descriptions, amounts):
+    """
+    Categorize a batch of transactions (e.g. an imported bank statement)
+    
+    Statements repeat the same merchants many times, so results are
+    memoized per normalised description and per amount band that the
+    categorization rules distinguish.
+    
+    Args:
+        descriptions (iterable): Transaction descriptions
+        amounts (iterable): Matching amounts (positive income, negative expenses)
+    
+    Returns:
+        list: One categorization dict per transaction, as categorize_transaction()
+    """
+    results = []
+    memo = {}
+    for description, amount in zip(descriptions, amounts):
+        key = (description.lower().strip(), amount > 0, amount > 5000, 10 <= abs(amount) <= 100)
+        if key not in memo:
+            memo[key] = categorize_transaction(description, amount)
+        results.append(dict(memo[key]))
+    return results
+
+
 def calculate_confidence(keyword, description, is_income):
     """Calculate confidence score based on keyword match quality"""
     base_confidence = 0.6
@@ -58,22 +183,12 @@ def calculate_confidence(keyword, description, is_income):
         base_confidence += 0.3
     
     # Boost confidence for specific merchant names
-    botswana_merchants = [
-        'spar', 'choppies', 'pick n pay', 'mascom', 'btc', 'orange',
-        'first national bank', 'fnb', 'standard chartered', 'barclays'
-    ]
-    
-    if any(merchant in description for merchant in botswana_merchants):
+    if has_merchant(description):
         base_confidence += 0.2
     
     # Boost confidence for clear transaction types
-    clear_indicators = {
-        'income': ['salary', 'wage', 'pay', 'allowance', 'grant'],
-        'expense': ['purchase', 'payment', 'bill', 'fee']
-    }
-    
     indicator_type = 'income' if is_income else 'expense'
-    if any(indicator in description for indicator in clear_indicators.get(indicator_type, [])):
+    if has_indicator[indicator_type](description):
         base_confidence += 0.15
     
     return min(base_confidence, 0.95)  # Cap at 95%
@@ -81,33 +196,9 @@ def calculate_confidence(keyword, description, is_income):
 
 def get_subcategory(category, description):
     """Get more specific subcategory based on description"""
-    subcategory_map = {
-        'food': {
-            'restaurant': ['restaurant', 'takeaway', 'fast food', 'cafe'],
-            'grocery': ['grocery', 'spar', 'choppies', 'pick n pay', 'supermarket'],
-            'street_food': ['vendor', 'street', 'market']
-        },
-        'transport': {
-            'taxi': ['taxi', 'combi'],
-            'fuel': ['fuel', 'petrol', 'diesel', 'gas'],
-            'public': ['bus', 'public transport']
-        },
-        'communication': {
-            'airtime': ['airtime', 'credit', 'recharge'],
-            'data': ['data', 'internet', 'wifi'],
-            'monthly': ['monthly', 'subscription', 'contract']
-        },
-        'healthcare': {
-            'medication': ['medicine', 'pharmacy', 'drugs'],
-            'consultation': ['doctor', 'clinic', 'consultation'],
-            'emergency': ['emergency', 'hospital', 'ambulance']
-        }
-    }
-    
-    if category in subcategory_map:
-        for subcategory, keywords in subcategory_map[category].items():
-            if any(keyword in description for keyword in keywords):
-                return subcategory
+    for subcategory, matches in subcategory_matchers.get(category, []):
+        if matches(description):
+            return subcategory
     
     return None
 
@@ -123,20 +214,18 @@ def apply_categorization_rules(description, amount, current_match):
     
     # Rule 2: Regular small amounts might be daily expenses
     if 10 <= abs(amount) <= 100:  # BWP 10-100
-        if any(word in description for word in ['taxi', 'food', 'lunch', 'breakfast']):
+        if has_daily_expense_word(description):
             current_match['confidence'] = min(current_match['confidence'] + 0.05, 0.9)
     
     # Rule 3: Government-related terms
-    gov_keywords = ['government', 'ministry', 'council', 'bdf', 'police', 'ipelegeng']
-    if any(keyword in description for keyword in gov_keywords):
+    if has_gov_keyword(description):
         if amount > 0:
             current_match['category'] = 'government'
             current_match['confidence'] = min(current_match['confidence'] + 0.2, 0.9)
         current_match['explanation'] += ' (Government-related transaction detected)'
     
     # Rule 4: Educational institutions
-    edu_keywords = ['university', 'school', 'college', 'ub', 'botho', 'limkokwing']
-    if any(keyword in description for keyword in edu_keywords):
+    if has_edu_keyword(description):
         current_match['category'] = 'education'
         current_match['confidence'] = min(current_match['confidence'] + 0.15, 0.9)
         current_match['explanation'] += ' (Educational institution detected)'
@@ -0,0 +1,149 @@
+"""
+Vectorized forecast primitives shared by FinancialCalculator and
+services/forecasting.
+
+Forecasts are computed as whole arrays (one element per future day), so a
+365-day horizon costs about the same as a 30-day one. DailyForecastView
+exposes the arrays as the familiar list of per-day dicts without building
+them up front.
+"""
+
+from collections.abc import Sequence
+from datetime import timedelta
+import time
+import numpy as np
+
+
+def forecast_weekdays(start_date, days):
+    """Weekday numbers (0 = Monday) for start_date + 1 ... start_date + days"""
+    return (start_date.weekday() + np.arange(1, days + 1)) % 7
+
+
+def weekday_factors(start_date, days, table):
+    """Look up a 7-entry Monday-first multiplier table for each forecast day"""
+    return np.asarray(table, dtype=float)[forecast_weekdays(start_date, days)]
+
+
+def running_balance(current_balance, daily_net):
+    """Cumulative balance after each forecast day"""
+    return current_balance + np.cumsum(daily_net)
+
+
+def first_shortfall_day(balances, threshold=0, inclusive=True):
+    """1-based day on which the balance first reaches the threshold, or None"""
+    mask = balances <= threshold if inclusive else balances < threshold
+    if not mask.any():
+        return None
+    return int(np.argmax(mask)) + 1
+
+
+class DailyForecastView(Sequence):
+    """Read-only list-of-dicts view over per-day forecast arrays.
+
+    Each item is built on access as {'day', 'date', <column>: float, ...};
+    'day' is omitted when include_day is False.
+    """
+
+    def __init__(self, start_date, columns, date_format='%Y-%m-%d', include_day=True):
+        self.start_date = start_date
+        self.columns = columns
+        self.date_format = date_format
+        self.include_day = include_day
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('forecast day out of range')
+
+        day = index + 1
+        item = {'day': day} if self.include_day else {}
+        item['date'] = (self.start_date + timedelta(days=day)).strftime(self.date_format)
+        for name, values in self.columns.items():
+            item[name] = float(values[index])
+        return item
+
+    def to_list(self):
+        """Every item as a plain dict, e.g. for JSON output (the view itself is not serialisable)"""
+        values = {name: np.asarray(column, dtype=float).tolist() for name, column in self.columns.items()}
+        items = []
+        for index in range(self._length):
+            day = index + 1
+            item = {'day': day} if self.include_day else {}
+            item['date'] = (self.start_date + timedelta(days=day)).strftime(self.date_format)
+            for name, column in values.items():
+                item[name] = column[index]
+            items.append(item)
+        return items
+
+    def __repr__(self):
+        return f'<DailyForecastView {self._length} days>'
+
+
+def simulate_balance_paths(current_balance, daily_incomes, daily_expenses, days,
+                           paths=10000, percentiles=(5, 25, 50, 75, 95),
+                           seed=None, time_budget_ms=50, batch_size=2000,
+                           band_paths=2000):
+    """Monte Carlo balance forecast by bootstrapping historical days.
+
+    Each simulated day draws one observed (income, expenses) day from the
+    history, so the joint daily distribution is preserved. Paths are
+    simulated in batches; once time_budget_ms is spent the remaining
+    batches are skipped and the result reports how many paths ran.
+
+    Returns per-day probability of a negative balance (over every simulated
+    path), percentile bands of the balance, and the probability of at least
+    one shortfall day. Sorting dominates the cost of the bands, so they are
+    estimated from the first band_paths paths, which are an unbiased sample.
+
+    Shortfall counts are accumulated batch by batch and only the band_paths
+    rows are kept, so memory is bounded by (batch_size + band_paths) * days
+    whatever `paths` is: about 6 MB for a 365-day horizon.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    daily_incomes = np.asarray(daily_incomes, dtype=np.float64)
+    daily_expenses = np.asarray(daily_expenses, dtype=np.float64)
+    history_nets = (daily_incomes - daily_expenses).astype(np.float32)
+    if history_nets.size == 0:
+        history_nets = np.zeros(1, dtype=np.float32)
+
+    band_balances = np.empty((min(band_paths, paths), days), dtype=np.float32)
+    negative_days = np.zeros(days, dtype=np.int64)
+    any_negative = 0
+    simulated = 0
+    while simulated < paths:
+        count = min(batch_size, paths - simulated)
+        draws = rng.integers(0, history_nets.size, size=(count, days), dtype=np.int32)
+        batch = history_nets[draws]
+        np.cumsum(batch, axis=1, out=batch)
+        np.add(batch, current_balance, out=batch)
+
+        negative = batch < 0
+        negative_days += negative.sum(axis=0)
+        any_negative += int(negative.any(axis=1).sum())
+        if simulated < len(band_balances):
+            kept = min(count, len(band_balances) - simulated)
+            band_balances[simulated:simulated + kept] = batch[:kept]
+
+        simulated += count
+        if (time.perf_counter() - started) * 1000 >= time_budget_ms:
+            break
+
+    bands = np.percentile(band_balances[:simulated], percentiles, axis=0)
+
+    return {
+        'paths': simulated,
+        'days': days,
+        'shortfall_probability': negative_days / simulated,
+        'any_shortfall_probability': any_negative / simulated,
+        'percentiles': {int(p): band for p, band in zip(percentiles, bands)},
+        'elapsed_ms': (time.perf_counter() - started) * 1000
+    }
@@ -1,17 +1,36 @@
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import case, cast, String
 from app import db
-from models import Transaction, User
+from models import Transaction
+import transaction_frame
+from services.forecast_engine import (
+    DailyForecastView, weekday_factors, running_balance
+)
 import logging
 
 
+# Monday-first day-of-week multipliers used by the income/expense predictors.
+# Many informal workers get paid on Fridays; spending rises on Fridays,
+# weekends and at the start of the week.
+INCOME_WEEKDAY_MULTIPLIERS = (1.0, 1.0, 1.0, 1.0, 1.5, 0.7, 0.7)
+EXPENSE_WEEKDAY_MULTIPLIERS = (1.1, 1.0, 1.0, 1.0, 1.2, 1.3, 1.3)
+
+
+# Number of most recent transactions analysed per user
+HISTORY_LIMIT = 200
+
+
 def generate_forecast(user_id, days=30):
     """
     Generate cash balance forecast for the next 7-30 days
     Optimized for irregular income patterns common in Botswana
     
+    The history is the newest HISTORY_LIMIT rows of the shared transaction
+    frame. The transaction table has no owner column, so that is the one
+    ledger's history whichever user_id is given.
+    
     Args:
         user_id (int): User ID
         days (int): Number of days to forecast (default 30)
@@ -20,82 +39,216 @@ def generate_forecast(user_id, days=30):
         dict: Forecast data including daily balances and key insights
     """
     try:
-        # Get user's transaction history
-        transactions = Transaction.query.filter_by(user_id=user_id)\
-                                      .order_by(Transaction.transaction_date.desc())\
-                                      .limit(200).all()  # Last 200 transactions for analysis
-        
-        if not transactions:
-            return generate_empty_forecast(days)
-        
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame([{
-            'date': t.transaction_date,
-            'amount': t.amount,
-            'category': t.category,
-            'is_income': t.amount > 0
-        } for t in transactions])
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        
-        # Calculate current balance
-        current_balance = df['amount'].sum()
-        
-        # Analyze patterns
-        income_analysis = analyze_income_patterns(df)
-        expense_analysis = analyze_expense_patterns(df)
-        
-        # Generate daily forecasts
-        forecast_dates = [(datetime.now() + timedelta(days=i)).date() for i in range(1, days + 1)]
-        daily_forecasts = []
-        
-        running_balance = current_balance
-        
-        for date in forecast_dates:
-            # Predict daily income and expenses
-            daily_income = predict_daily_income(date, income_analysis)
-            daily_expenses = predict_daily_expenses(date, expense_analysis)
-            
-            daily_net = daily_income + daily_expenses  # expenses are negative
-            running_balance += daily_net
-            
-            daily_forecasts.append({
-                'date': date.isoformat(),
-                'predicted_income': daily_income,
-                'predicted_expenses': abs(daily_expenses),
-                'net_change': daily_net,
-                'predicted_balance': running_balance,
-                'confidence': calculate_prediction_confidence(date, income_analysis, expense_analysis)
-            })
-        
-        # Identify potential shortfalls
-        shortfalls = [day for day in daily_forecasts if day['predicted_balance'] < 0]
-        
-        # Calculate key insights
-        insights = generate_forecast_insights(daily_forecasts, income_analysis, expense_analysis)
-        
-        return {
-            'current_balance': current_balance,
-            'forecast_period': days,
-            'daily_forecasts': daily_forecasts,
-            'shortfalls': shortfalls,
-            'insights': insights,
-            'income_analysis': income_analysis,
-            'expense_analysis': expense_analysis,
-            'generated_at': datetime.now().isoformat()
-        }
+        return ledger_forecast(days)
         
     except Exception as e:
         logging.error(f"Error generating forecast for user {user_id}: {str(e)}")
         return generate_empty_forecast(days)
 
 
-def analyze_income_patterns(df):
-    """Analyze income patterns for irregular earners"""
-    income_df = df[df['is_income'] == True].copy()
+def ledger_forecast(days=30):
+    """generate_forecast() without its error fallback, for callers that retry (e.g. the alert job)"""
+    frame = transaction_frame.current_frame()
+    if not len(frame):
+        return generate_empty_forecast(days)
+    return forecast_history(HistoryColumns.from_frame(frame), days)
+
+
+def timestamp_text(column):
+    """Select a timestamp as ISO text, which NumPy parses far faster than datetime objects"""
+    return cast(column, String)
+
+
+def build_forecast(rows, days=30):
+    """
+    Build a forecast from (date, amount, category) rows without touching the database
     
-    if income_df.empty:
+    Args:
+        rows (list): Transaction rows, amounts positive for income and negative for expenses;
+            dates may be datetimes or ISO text (see timestamp_text)
+        days (int): Number of days to forecast
+    
+    Returns:
+        dict: Forecast data in the same shape as generate_forecast()
+    """
+    if not rows:
+        return generate_empty_forecast(days)
+    return forecast_history(HistoryColumns.from_rows(rows), days)
+
+
+def forecast_history(history, days=30):
+    """build_forecast() for a non-empty HistoryColumns"""
+    current_balance = history.amounts.sum()
+    income_analysis, expense_analysis = analyze_patterns(history)
+    
+    # Generate daily forecasts as whole arrays (one element per day)
+    today = datetime.now().date()
+    daily_income = forecast_daily_income(today, days, income_analysis)
+    daily_expenses = forecast_daily_expenses(today, days, expense_analysis)
+    
+    daily_net = daily_income + daily_expenses  # expenses are negative
+    balances = running_balance(current_balance, daily_net)
+    
+    # Plain dicts rather than the lazy view: forecasts are returned as JSON
+    # and pickled back from the process pool
+    daily_forecasts = DailyForecastView(today, {
+        'predicted_income': daily_income,
+        'predicted_expenses': np.abs(daily_expenses),
+        'net_change': daily_net,
+        'predicted_balance': balances,
+        'confidence': forecast_confidence(days, income_analysis, expense_analysis)
+    }, include_day=False).to_list()
+    
+    # Identify potential shortfalls
+    shortfalls = [daily_forecasts[int(i)] for i in np.flatnonzero(balances < 0)]
+    
+    # Calculate key insights
+    insights = generate_forecast_insights(daily_forecasts, income_analysis, expense_analysis)
+    
+    return {
+        'current_balance': float(current_balance),
+        'forecast_period': days,
+        'daily_forecasts': daily_forecasts,
+        'shortfalls': shortfalls,
+        'insights': insights,
+        'income_analysis': income_analysis,
+        'expense_analysis': expense_analysis,
+        'generated_at': datetime.now().isoformat()
+    }
+
+
+def generate_forecasts(user_ids, days=30, workers=None, chunk_size=500):
+    """
+    Generate forecasts for many users at once (e.g. the overnight refresh)
+    
+    Recent history is loaded with one query for the whole batch instead of
+    one ORM round trip per user. The transaction table has no owner column,
+    so every user shares the one ledger's history; each distinct history is
+    analysed once, and its users share the resulting forecast dict. Distinct
+    histories are analysed in chunks of `chunk_size` on a process pool when
+    there is more than one chunk.
+    
+    Args:
+        user_ids (iterable): User IDs to forecast
+        days (int): Number of days to forecast
+        workers (int): Process pool size (None = CPU count, 1 = run inline)
+        chunk_size (int): Distinct histories per pool task
+    
+    Returns:
+        dict: user_id -> forecast (same shape as generate_forecast())
+    """
+    user_ids = list(user_ids)
+    histories = load_recent_histories(user_ids)
+    
+    # Users whose history is the same rows get the same forecast
+    distinct = {}
+    for user_id in user_ids:
+        distinct.setdefault(id(histories[user_id]), (user_id, histories[user_id]))
+    jobs = list(distinct.values())
+    chunks = [jobs[start:start + chunk_size] for start in range(0, len(jobs), chunk_size)]
+    
+    results = {}
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.update(forecast_chunk(chunk, days))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for forecasts in executor.map(forecast_chunk, chunks, [days] * len(chunks)):
+                results.update(forecasts)
+    
+    return {user_id: results[distinct[id(histories[user_id])][0]] for user_id in user_ids}
+
+
+def load_recent_histories(user_ids, limit=HISTORY_LIMIT):
+    """
+    Fetch the newest `limit` (date, signed amount, category) rows for each user in one query
+    
+    With no owner column this is the one ledger's history, shared (as the
+    same list) by every user_id.
+    """
+    signed_amount = case((Transaction.transaction_type == 'income', Transaction.amount),
+                         else_=-Transaction.amount)
+    rows = db.session.query(
+        timestamp_text(Transaction.date_created),
+        signed_amount,
+        Transaction.category
+    ).order_by(Transaction.date_created.desc()).limit(limit).all()
+    
+    history = [tuple(row) for row in rows]
+    return {user_id: history for user_id in user_ids}
+
+
+def forecast_chunk(chunk, days):
+    """Process-pool task: build forecasts for a list of (user_id, rows)"""
+    forecasts = {}
+    for user_id, rows in chunk:
+        try:
+            forecasts[user_id] = build_forecast(rows, days)
+        except Exception as e:
+            logging.error(f"Error generating forecast for user {user_id}: {str(e)}")
+            forecasts[user_id] = generate_empty_forecast(days)
+    return forecasts
+
+
+class HistoryColumns:
+    """A transaction history as date-sorted NumPy columns.
+
+    dates are datetime64[us], amounts float64 (negative for expenses) and
+    categories integer codes into labels, in order of first appearance.
+    Building it and running analyze_patterns() take well under a
+    millisecond for HISTORY_LIMIT rows.
+    """
+
+    def __init__(self, dates, amounts, categories, labels):
+        self.dates = dates
+        self.amounts = amounts
+        self.categories = categories
+        self.labels = labels
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Columns from (date, amount, category) rows in any order; dates as datetimes or ISO text"""
+        dates, amounts, categories = zip(*rows)
+        dates = np.array(dates, dtype='datetime64[us]')
+        order = np.argsort(dates, kind='stable')
+        
+        codes = {}
+        category_codes = np.fromiter(
+            (codes.setdefault(categories[i], len(codes)) for i in order), dtype=np.int32, count=len(order)
+        )
+        return cls(dates[order], np.asarray(amounts, dtype=float)[order], category_codes, list(codes))
+
+    @classmethod
+    def from_frame(cls, frame, limit=HISTORY_LIMIT):
+        """Columns for the newest `limit` rows of a TransactionFrame, at day resolution"""
+        days, amounts, categories = (column[-limit:] for column in frame.columns())
+        return cls(days.astype('datetime64[D]').astype('datetime64[us]'), amounts, categories, frame.labels)
+
+
+def analyze_patterns(history, now=None):
+    """
+    Income and expense patterns of a history in one grouped pass
+    
+    Args:
+        history (HistoryColumns): The user's recent transactions
+        now (datetime): Reference time for days since the last income
+    
+    Returns:
+        tuple: (income_analysis, expense_analysis) dicts
+    """
+    dates, amounts = history.dates, history.amounts
+    days = dates.astype('datetime64[D]')
+    days_span = int((dates[-1] - dates[0]) // np.timedelta64(1, 'D')) or 1
+    is_income = amounts > 0
+    
+    return (analyze_income(dates[is_income], days[is_income], amounts[is_income], days_span, now),
+            analyze_expenses(days[~is_income], amounts[~is_income], history.categories[~is_income],
+                             history.labels, days_span))
+
+
+def analyze_income(dates, days, amounts, days_span, now=None):
+    """Analyze income patterns for irregular earners"""
+    if amounts.size == 0:
         return {
             'average_daily': 0,
             'frequency_days': 30,
@@ -105,21 +258,18 @@ def analyze_income_patterns(df):
         }
     
     # Calculate income statistics
-    total_income = income_df['amount'].sum()
-    days_span = (df['date'].max() - df['date'].min()).days or 1
-    average_daily = total_income / days_span
+    average_daily = amounts.sum() / days_span
     
     # Analyze frequency
-    income_dates = income_df['date'].dt.date.unique()
-    if len(income_dates) > 1:
-        date_diffs = np.diff(sorted(income_dates))
-        avg_frequency = np.mean([diff.days for diff in date_diffs])
+    income_days = np.unique(days)
+    if income_days.size > 1:
+        avg_frequency = np.diff(income_days).astype(np.int64).mean()
     else:
         avg_frequency = 30  # Default assumption
     
     # Determine pattern type
-    income_amounts = income_df['amount'].values
-    cv = np.std(income_amounts) / np.mean(income_amounts) if np.mean(income_amounts) > 0 else 1
+    mean = amounts.mean()
+    cv = amounts.std() / mean if mean > 0 else 1
     
     if cv < 0.2:
         pattern_type = 'regular'
@@ -132,8 +282,8 @@ def analyze_income_patterns(df):
         variability = 'high'
     
     # Days since last income
-    last_income_date = income_df['date'].max()
-    days_since_income = (datetime.now() - last_income_date).days
+    last_income_date = dates[-1].astype(datetime)
+    days_since_income = ((now or datetime.now()) - last_income_date).days
     
     return {
         'average_daily': average_daily,
@@ -141,16 +291,14 @@ def analyze_income_patterns(df):
         'variability': variability,
         'pattern_type': pattern_type,
         'last_income_days_ago': days_since_income,
-        'typical_amount': np.median(income_amounts),
+        'typical_amount': np.median(amounts),
         'income_consistency': 1 - cv  # Higher = more consistent
     }
 
 
-def analyze_expense_patterns(df):
+def analyze_expenses(days, amounts, categories, labels, days_span):
     """Analyze expense patterns"""
-    expense_df = df[df['is_income'] == False].copy()
-    
-    if expense_df.empty:
+    if amounts.size == 0:
         return {
             'average_daily': 0,
             'pattern_type': 'no_data',
@@ -159,23 +307,25 @@ def analyze_expense_patterns(df):
         }
     
     # Calculate expense statistics
-    total_expenses = abs(expense_df['amount'].sum())
-    days_span = (df['date'].max() - df['date'].min()).days or 1
-    average_daily = total_expenses / days_span
-    
-    # Analyze by category
-    category_analysis = {}
-    for category in expense_df['category'].dropna().unique():
-        cat_expenses = expense_df[expense_df['category'] == category]['amount']
-        category_analysis[category] = {
-            'total': abs(cat_expenses.sum()),
-            'average': abs(cat_expenses.mean()),
-            'frequency': len(cat_expenses)
+    average_daily = abs(amounts.sum()) / days_span
+    
+    # Per-category totals and counts, grouped by category code
+    totals = np.bincount(categories, weights=amounts, minlength=len(labels))
+    counts = np.bincount(categories, minlength=len(labels))
+    category_analysis = {
+        label: {
+            'total': abs(totals[code]),
+            'average': abs(totals[code] / counts[code]),
+            'frequency': int(counts[code])
         }
+        for code, label in enumerate(labels) if counts[code] and label is not None
+    }
     
-    # Determine variability
-    daily_expenses = expense_df.groupby(expense_df['date'].dt.date)['amount'].sum()
-    cv = np.std(daily_expenses) / np.mean(daily_expenses) if np.mean(daily_expenses) != 0 else 0
+    # Determine variability from the per-day expense totals
+    _, day_index = np.unique(days, return_inverse=True)
+    daily_expenses = np.bincount(day_index, weights=amounts)
+    mean = daily_expenses.mean()
+    cv = daily_expenses.std() / mean if mean != 0 else 0
     
     if cv < 0.3:
         variability = 'low'
@@ -196,36 +346,44 @@ def analyze_expense_patterns(df):
     }
 
 
+def income_timing_factor(income_analysis):
+    """Scale income by how far into the usual pay cycle we are"""
+    days_since = income_analysis.get('last_income_days_ago', 0)
+    frequency = income_analysis.get('frequency_days', 30)
+    
+    if days_since >= frequency:
+        # Overdue for income - increase probability
+        return 1.5
+    elif days_since < frequency / 2:
+        # Recent income - decrease probability
+        return 0.3
+    return 1.0
+
+
 def predict_daily_income(date, income_analysis):
     """Predict income for a specific date"""
     if income_analysis['pattern_type'] == 'no_data':
         return 0
     
     # Day of week effects (many informal workers get paid on specific days)
-    weekday = date.weekday()  # 0 = Monday
+    day_multiplier = INCOME_WEEKDAY_MULTIPLIERS[date.weekday()]
     
-    # Higher probability of income on Fridays (end of work week)
-    day_multiplier = 1.0
-    if weekday == 4:  # Friday
-        day_multiplier = 1.5
-    elif weekday in [5, 6]:  # Weekend
-        day_multiplier = 0.7
-    
-    # Base daily income prediction
+    # Base daily income prediction, adjusted by days since last income
     base_income = income_analysis['average_daily'] * day_multiplier
+    base_income *= income_timing_factor(income_analysis)
     
-    # Adjust based on days since last income
-    days_since = income_analysis.get('last_income_days_ago', 0)
-    frequency = income_analysis.get('frequency_days', 30)
+    return max(0, base_income)
+
+
+def forecast_daily_income(start_date, days, income_analysis):
+    """Vectorized predict_daily_income for the `days` days after start_date"""
+    if income_analysis['pattern_type'] == 'no_data':
+        return np.zeros(days)
     
-    if days_since >= frequency:
-        # Overdue for income - increase probability
-        base_income *= 1.5
-    elif days_since < frequency / 2:
-        # Recent income - decrease probability
-        base_income *= 0.3
+    factors = weekday_factors(start_date, days, INCOME_WEEKDAY_MULTIPLIERS)
+    base_income = income_analysis['average_daily'] * income_timing_factor(income_analysis)
     
-    return max(0, base_income)
+    return np.maximum(0, base_income * factors)
 
 
 def predict_daily_expenses(date, expense_analysis):
@@ -233,38 +391,41 @@ def predict_daily_expenses(date, expense_analysis):
     if expense_analysis['pattern_type'] == 'no_data':
         return 0
     
-    # Base daily expenses
-    base_expenses = expense_analysis['average_daily']
-    
-    # Day of week effects
-    weekday = date.weekday()
+    # Higher expenses on weekends, Fridays and Mondays
+    day_multiplier = EXPENSE_WEEKDAY_MULTIPLIERS[date.weekday()]
+    predicted_expenses = expense_analysis['average_daily'] * day_multiplier
     
-    # Higher expenses on weekends and Fridays
-    day_multiplier = 1.0
-    if weekday == 4:  # Friday
-        day_multiplier = 1.2
-    elif weekday in [5, 6]:  # Weekend
-        day_multiplier = 1.3
-    elif weekday == 0:  # Monday (start of week)
-        day_multiplier = 1.1
+    return -predicted_expenses  # Return as negative for expenses
+
+
+def forecast_daily_expenses(start_date, days, expense_analysis):
+    """Vectorized predict_daily_expenses (negative values)"""
+    if expense_analysis['pattern_type'] == 'no_data':
+        return np.zeros(days)
     
-    predicted_expenses = base_expenses * day_multiplier
+    factors = weekday_factors(start_date, days, EXPENSE_WEEKDAY_MULTIPLIERS)
     
-    return -predicted_expenses  # Return as negative for expenses
+    return -expense_analysis['average_daily'] * factors
 
 
-def calculate_prediction_confidence(date, income_analysis, expense_analysis):
-    """Calculate confidence level for predictions"""
+def base_prediction_confidence(income_analysis, expense_analysis):
+    """Confidence before the horizon penalty, from data consistency"""
     # Base confidence starts at 0.5
     confidence = 0.5
     
-    # Increase confidence based on data consistency
     if income_analysis.get('income_consistency', 0) > 0.7:
         confidence += 0.2
     
     if expense_analysis.get('expense_consistency', 0) > 0.7:
         confidence += 0.2
     
+    return confidence
+
+
+def calculate_prediction_confidence(date, income_analysis, expense_analysis):
+    """Calculate confidence level for predictions"""
+    confidence = base_prediction_confidence(income_analysis, expense_analysis)
+    
     # Decrease confidence for far future dates
     days_ahead = (date - datetime.now().date()).days
     if days_ahead > 14:
@@ -275,6 +436,15 @@ def calculate_prediction_confidence(date, income_analysis, expense_analysis):
     return max(0.1, min(0.9, confidence))
 
 
+def forecast_confidence(days, income_analysis, expense_analysis):
+    """Vectorized calculate_prediction_confidence for days 1..days"""
+    days_ahead = np.arange(1, days + 1)
+    confidence = base_prediction_confidence(income_analysis, expense_analysis)
+    confidence = confidence - 0.1 * (days_ahead > 14) - 0.1 * (days_ahead > 21)
+    
+    return np.clip(confidence, 0.1, 0.9)
+
+
 def generate_forecast_insights(daily_forecasts, income_analysis, expense_analysis):
     """Generate actionable insights from forecast data"""
     insights = []
@@ -302,7 +472,7 @@ def generate_forecast_insights(daily_forecasts, income_analysis, expense_analysi
         })
     
     # Days since last income
-    days_since_income = income_analysis.get('last_income_days_ago', 0)
+    days_since_income = income_analysis.get('last_income_days_ago') or 0  # None without income
     if days_since_income > 7:
         insights.append({
             'type': 'info',
@@ -1,8 +1,8 @@
 // Service Worker for FutureAssist PWA
 // Handles caching, offline functionality, and background sync
 
-const CACHE_NAME = 'futureassist-v1.0.0';
-const DYNAMIC_CACHE = 'futureassist-dynamic-v1.0.0';
+const CACHE_NAME = 'futureassist-v1.1.0';
+const DYNAMIC_CACHE = 'futureassist-dynamic-v1.1.0';
 
 // Files to cache immediately (critical resources)
 const STATIC_ASSETS = [
@@ -20,8 +20,10 @@ const STATIC_ASSETS = [
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
 ];
 
-// Routes to cache dynamically
+// Routes to cache dynamically. Network requests go through the browser's
+// HTTP cache, so refetching an unchanged page or API response is a 304.
 const DYNAMIC_ROUTES = [
+    '/',
     '/transactions',
     '/forecast',
     '/settings'
@@ -29,6 +31,7 @@ const DYNAMIC_ROUTES = [
 
 // API endpoints that should be cached for offline viewing
 const CACHEABLE_APIS = [
+    '/api/chart_data',
     '/api/transactions',
     '/api/forecast',
     '/api/alerts/settings'
@@ -87,13 +90,13 @@ self.addEventListener('fetch', event => {
         return;
     }
     
-    // Handle different types of requests
-    if (isStaticAsset(url)) {
+    // Handle different types of requests ('/' is precached but served network first)
+    if (isDynamicRoute(url)) {
+        event.respondWith(handleDynamicRoute(request));
+    } else if (isStaticAsset(url)) {
         event.respondWith(handleStaticAsset(request));
     } else if (isAPIRequest(url)) {
         event.respondWith(handleAPIRequest(request));
-    } else if (isDynamicRoute(url)) {
-        event.respondWith(handleDynamicRoute(request));
     } else {
         event.respondWith(handleOtherRequests(request));
     }
@@ -113,7 +116,7 @@ function isAPIRequest(url) {
 
 // Check if request is for a dynamic route
 function isDynamicRoute(url) {
-    return DYNAMIC_ROUTES.includes(url.pathname);
+    return url.hostname === location.hostname && DYNAMIC_ROUTES.includes(url.pathname);
 }
 
 // Handle static assets (cache first strategy)
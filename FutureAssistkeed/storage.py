@@ -0,0 +1,136 @@
+"""
+Storage profiles: database URI and engine tuning per backend.
+
+The profile is chosen with STORAGE_PROFILE, or inferred from DATABASE_URL
+(SQLite instance file when neither is set):
+
+- sqlite:       WAL journal, synchronous=NORMAL, mmap and a busy timeout,
+                applied to every new connection through a connect event.
+                Readers no longer block on a writer, and concurrent writers
+                wait instead of failing with "database is locked".
+- sqlite-basic: SQLite with the driver defaults (rollback journal,
+                synchronous=FULL); kept as the baseline for benchmarks.
+- postgresql:   psycopg2 with a sized QueuePool. Every gunicorn worker has
+                its own pool, so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+                must stay below the server's max_connections.
+
+Every number can be overridden through the environment variables below.
+"""
+
+import os
+from sqlalchemy import event
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,  # milliseconds
+    'temp_store': 'MEMORY',
+}
+
+# Environment overrides for SQLITE_PRAGMAS
+SQLITE_PRAGMA_ENV = {
+    'mmap_size': 'SQLITE_MMAP_SIZE',
+    'busy_timeout': 'SQLITE_BUSY_TIMEOUT_MS',
+    'synchronous': 'SQLITE_SYNCHRONOUS',
+}
+
+POSTGRES_POOL = {
+    'pool_size': ('DB_POOL_SIZE', 5),
+    'max_overflow': ('DB_MAX_OVERFLOW', 5),
+    'pool_timeout': ('DB_POOL_TIMEOUT', 10),
+    'pool_recycle': ('DB_POOL_RECYCLE', 1800),
+}
+
+STORAGE_PROFILES = ('sqlite', 'sqlite-basic', 'postgresql')
+
+
+def default_sqlite_uri(instance_path):
+    os.makedirs(instance_path, exist_ok=True)
+    return f"sqlite:///{os.path.join(instance_path, 'financial_tracker.db')}"
+
+
+def database_uri(instance_path):
+    """DATABASE_URL (with Heroku-style postgres:// fixed up) or the instance SQLite file"""
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        return default_sqlite_uri(instance_path)
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def resolve_profile(uri):
+    profile = os.environ.get('STORAGE_PROFILE')
+    if profile is None:
+        profile = 'postgresql' if uri.startswith('postgresql') else 'sqlite'
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f'Unknown STORAGE_PROFILE {profile!r}; expected one of {", ".join(STORAGE_PROFILES)}')
+    return profile
+
+
+def sqlite_pragmas():
+    pragmas = dict(SQLITE_PRAGMAS)
+    for name, variable in SQLITE_PRAGMA_ENV.items():
+        if variable in os.environ:
+            pragmas[name] = os.environ[variable]
+    return pragmas
+
+
+def engine_options(profile):
+    """SQLALCHEMY_ENGINE_OPTIONS for a profile"""
+    if profile == 'postgresql':
+        options = {name: int(os.environ.get(variable, default))
+                   for name, (variable, default) in POSTGRES_POOL.items()}
+        options['pool_pre_ping'] = True
+        options['connect_args'] = {
+            'application_name': os.environ.get('DB_APPLICATION_NAME', 'futureassist'),
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        }
+        return options
+
+    # SQLite connections are local files: nothing to ping or recycle
+    return {}
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Run the PRAGMAs on every new DBAPI connection of engine"""
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def configure_storage(app, instance_path):
+    """Set the database URI and engine options on app for the selected profile"""
+    uri = database_uri(instance_path)
+    profile = resolve_profile(uri)
+    if profile.startswith('sqlite') and not uri.startswith('sqlite'):
+        raise ValueError(f'STORAGE_PROFILE {profile!r} needs a sqlite:// DATABASE_URL')
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(profile)
+    app.config['STORAGE_PROFILE'] = profile
+    return profile
+
+
+def init_engine(app, db):
+    """Attach per-connection setup to the engine; call inside an app context"""
+    if app.config.get('STORAGE_PROFILE') == 'sqlite':
+        install_sqlite_pragmas(db.engine, sqlite_pragmas())
+
+
+def describe(db):
+    """Effective settings of the live engine, for benchmarks and diagnostics"""
+    engine = db.engine
+    report = {'dialect': engine.dialect.name, 'pool': type(engine.pool).__name__}
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            for name in ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout'):
+                report[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+    else:
+        report['pool_size'] = engine.pool.size()
+    return report
@@ -0,0 +1,273 @@
+"""
+Deterministic synthetic transaction generator for benchmarks and load runs.
+
+Unlike sample_data.py, which writes a few weeks of unseeded rows, this
+generates any number of users and years of history from a seed:
+
+    flask generate-data --seed 7 --users 500 --years 3 --profile mixed --replace
+
+Every user gets its own random stream, derived from (seed, user number), and
+draws its own income level, payday and spending habits. The same seed,
+user count, profile and end date therefore always produce the same rows,
+whatever the chunk size. Pass end_date (--end-date) to pin a dataset. By
+default history ends today, so recent-window features have data.
+
+Income profiles:
+- salaried:  a monthly salary on a fixed payday, occasional side income
+- irregular: freelance/contract payments on random days
+- informal:  frequent small sales, busiest towards the weekend
+- mixed:     each user draws one of the three (50% / 25% / 25%)
+
+The transaction table has no owner column, so every user's rows go into
+the one ledger. A user here is an independent stream of history. Rows are
+built as NumPy arrays per user and written with executemany INSERTs in
+committed chunks. The maintained aggregates are rebuilt once at the end.
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from app import db
+from models import Transaction, rebuild_aggregates
+
+INCOME_PROFILES = {
+    'salaried': {
+        'salary': (5000.00, 18000.00),      # monthly, drawn once per user
+        'side_income_chance': 0.03,         # per day
+        'side_income': (200.00, 1500.00),
+    },
+    'irregular': {
+        'payment_chance': 0.12,             # per day
+        'payment': (300.00, 4000.00),
+    },
+    'informal': {
+        'sale_chance': 0.75,                # per day, scaled by weekday
+        'sale': (40.00, 350.00),
+    },
+}
+
+# Share of users per profile when profile='mixed'
+MIXED_PROFILE_SHARES = {'salaried': 0.5, 'irregular': 0.25, 'informal': 0.25}
+
+# Monday-first multipliers; informal sales and spending peak on Fri-Sun
+SALES_WEEKDAY_FACTORS = np.array([0.9, 0.9, 0.9, 1.0, 1.4, 1.3, 0.6])
+SPENDING_WEEKDAY_FACTORS = np.array([1.1, 1.0, 1.0, 1.0, 1.2, 1.3, 1.3])
+
+# (description, category, transaction_type)
+INCOME_ENTRIES = [
+    ('Salary - Government Job', 'salary', 'income'),
+    ('Salary - Private Sector', 'salary', 'income'),
+    ('Freelance Web Design', 'freelance', 'income'),
+    ('Consulting Invoice', 'freelance', 'income'),
+    ('Piece Job Payment', 'freelance', 'income'),
+    ('Side Business - Crafts', 'other_income', 'income'),
+    ('Market Stall Sales', 'other_income', 'income'),
+    ('Tuckshop Sales', 'other_income', 'income'),
+]
+
+# (description, category, share of monthly income, day of month)
+FIXED_BILLS = [
+    ('Rent - 2BR Flat', 'housing', 0.28, 1),
+    ('Electricity - BPC', 'utilities', 0.03, 5),
+    ('Water Bill - WUC', 'utilities', 0.02, 7),
+    ('Internet - Orange', 'utilities', 0.03, 10),
+    ('Funeral Cover Premium', 'insurance', 0.02, 15),
+]
+
+# (description, category, relative frequency, relative amount)
+VARIABLE_EXPENSES = [
+    ('Groceries - Choppies', 'food', 0.22, 1.0),
+    ('Groceries - Sefalana', 'food', 0.10, 1.4),
+    ('Restaurant - Nandos/Steers', 'food', 0.08, 0.8),
+    ('Transport - Combis', 'transportation', 0.20, 0.25),
+    ('Fuel - Shell/Engen', 'transportation', 0.08, 1.6),
+    ('Phone Airtime - Mascom', 'utilities', 0.10, 0.3),
+    ('Medical - Consultation', 'healthcare', 0.03, 2.0),
+    ('Entertainment - Movies', 'entertainment', 0.05, 0.8),
+    ('Clothing - Game/Woolworths', 'shopping', 0.05, 2.5),
+    ('School Fees', 'education', 0.01, 6.0),
+    ('Motshelo Contribution', 'savings', 0.03, 2.0),
+    ('Bank Charge', 'other_expense', 0.05, 0.1),
+]
+
+ENTRIES = (
+    INCOME_ENTRIES
+    + [(description, category, 'expense') for description, category, _, _ in FIXED_BILLS]
+    + [(description, category, 'expense') for description, category, _, _ in VARIABLE_EXPENSES]
+)
+SALARY, SALARY_PRIVATE, FREELANCE, CONSULTING, PIECE_JOB, CRAFTS, MARKET, TUCKSHOP = range(len(INCOME_ENTRIES))
+FIXED_OFFSET = len(INCOME_ENTRIES)
+VARIABLE_OFFSET = FIXED_OFFSET + len(FIXED_BILLS)
+
+VARIABLE_FREQUENCY = np.array([expense[2] for expense in VARIABLE_EXPENSES])
+VARIABLE_FREQUENCY = VARIABLE_FREQUENCY / VARIABLE_FREQUENCY.sum()
+VARIABLE_SIZE = np.array([expense[3] for expense in VARIABLE_EXPENSES])
+# Mean size of one variable expense in units of the per-event budget
+MEAN_VARIABLE_SIZE = float(VARIABLE_FREQUENCY @ VARIABLE_SIZE)
+
+
+def calendar(start, days):
+    """(weekday Monday=0, day of month) arrays for start ... start + days - 1"""
+    dates = np.datetime64(start, 'D') + np.arange(days)
+    weekdays = (dates.astype('int64') + 3) % 7  # 1970-01-01 was a Thursday
+    month_days = (dates - dates.astype('datetime64[M]').astype('datetime64[D]')).astype('int64') + 1
+    return weekdays, month_days
+
+
+def pick_profile(rng, profile):
+    if profile != 'mixed':
+        return profile
+    names = list(MIXED_PROFILE_SHARES)
+    return names[rng.choice(len(names), p=list(MIXED_PROFILE_SHARES.values()))]
+
+
+def user_events(seed, user, start, days, profile):
+    """Arrays (day, second of day, entry index, amount) for one user's history, in time order"""
+    rng = np.random.default_rng([seed, user])
+    profile = pick_profile(rng, profile)
+    settings = INCOME_PROFILES[profile]
+    weekdays, month_days = calendar(start, days)
+    day_numbers = np.arange(days)
+    parts = []
+
+    def add(mask_or_days, entry, amounts):
+        selected = day_numbers[mask_or_days] if mask_or_days.dtype == bool else mask_or_days
+        entries = np.broadcast_to(np.asarray(entry), selected.shape)
+        parts.append((selected, entries, np.broadcast_to(amounts, selected.shape)))
+
+    # Income
+    if profile == 'salaried':
+        salary = rng.uniform(*settings['salary'])
+        payday = int(rng.choice([25, 25, 25, 28, 1]))
+        paydays = month_days == payday
+        add(paydays, rng.choice([SALARY, SALARY_PRIVATE]), salary)
+        side = rng.random(days) < settings['side_income_chance']
+        add(side, rng.choice([FREELANCE, CRAFTS], size=int(side.sum())),
+            rng.uniform(*settings['side_income'], size=int(side.sum())))
+        monthly_income = salary + 30 * settings['side_income_chance'] * np.mean(settings['side_income'])
+    elif profile == 'irregular':
+        chance = settings['payment_chance'] * rng.uniform(0.6, 1.4)
+        paid = rng.random(days) < chance
+        add(paid, rng.choice([FREELANCE, CONSULTING, PIECE_JOB], size=int(paid.sum())),
+            rng.uniform(*settings['payment'], size=int(paid.sum())))
+        monthly_income = 30 * chance * np.mean(settings['payment'])
+    else:
+        level = rng.uniform(0.6, 1.6)
+        sold = rng.random(days) < np.minimum(settings['sale_chance'] * SALES_WEEKDAY_FACTORS[weekdays], 1)
+        add(sold, rng.choice([MARKET, TUCKSHOP, CRAFTS], size=int(sold.sum())),
+            level * SALES_WEEKDAY_FACTORS[weekdays[sold]] * rng.uniform(*settings['sale'], size=int(sold.sum())))
+        monthly_income = 30 * settings['sale_chance'] * level * np.mean(settings['sale'])
+
+    # Fixed monthly bills
+    for index, (_, _, share, bill_day) in enumerate(FIXED_BILLS):
+        due = month_days == bill_day
+        add(due, FIXED_OFFSET + index, share * monthly_income * rng.uniform(0.95, 1.05, size=int(due.sum())))
+
+    # Variable spending: some users live beyond their means
+    spend_ratio = rng.uniform(0.75, 1.1)
+    fixed_share = sum(bill[2] for bill in FIXED_BILLS)
+    budget = max(spend_ratio - fixed_share, 0.05) * monthly_income
+    events_per_day = rng.uniform(1.0, 2.5)
+    counts = rng.poisson(events_per_day * SPENDING_WEEKDAY_FACTORS[weekdays])
+    spend_days = np.repeat(day_numbers, counts)
+    picks = rng.choice(len(VARIABLE_EXPENSES), size=spend_days.size, p=VARIABLE_FREQUENCY)
+    unit = budget / (30 * events_per_day * SPENDING_WEEKDAY_FACTORS.mean() * MEAN_VARIABLE_SIZE)
+    amounts = unit * VARIABLE_SIZE[picks] * rng.lognormal(-0.125, 0.5, size=spend_days.size)
+    add(spend_days, VARIABLE_OFFSET + picks, amounts)
+
+    event_days = np.concatenate([part[0] for part in parts])
+    event_entries = np.concatenate([part[1] for part in parts])
+    event_amounts = np.concatenate([part[2] for part in parts]).round(2)
+    seconds = rng.integers(7 * 3600, 21 * 3600, size=event_days.size)
+
+    order = np.lexsort((seconds, event_days))
+    keep = event_amounts[order] > 0
+    order = order[keep]
+    return event_days[order], seconds[order], event_entries[order], event_amounts[order]
+
+
+def generate_rows(seed=0, users=1, years=1.0, profile='mixed', end_date=None, max_rows=None, chunk_size=50000):
+    """Yield lists of Transaction row dicts, user by user.
+
+    With max_rows, generation stops after that many rows. users may then be
+    None to keep adding users until the limit is reached.
+    """
+    if profile != 'mixed' and profile not in INCOME_PROFILES:
+        raise ValueError(f'Unknown income profile {profile!r}')
+    end_date = end_date or date.today()
+    days = max(1, int(round(years * 365)))
+    start = end_date - timedelta(days=days - 1)
+    start_at = datetime.combine(start, datetime.min.time())
+
+    chunk = []
+    produced = 0
+    user = 0
+    while (users is None or user < users) and (max_rows is None or produced < max_rows):
+        event_days, seconds, entries, amounts = user_events(seed, user, start, days, profile)
+        offsets = event_days.astype('int64') * 86400 + seconds
+        for offset, entry, amount in zip(offsets.tolist(), entries.tolist(), amounts.tolist()):
+            description, category, transaction_type = ENTRIES[entry]
+            chunk.append({
+                'description': description,
+                'amount': amount,
+                'transaction_type': transaction_type,
+                'category': category,
+                'date_created': start_at + timedelta(seconds=offset)
+            })
+            produced += 1
+            if max_rows is not None and produced >= max_rows:
+                break
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        user += 1
+
+    if chunk:
+        yield chunk
+
+
+def generate_dataset(seed=0, users=1, years=1.0, profile='mixed', end_date=None, max_rows=None,
+                     replace=False, chunk_size=50000, progress=None):
+    """
+    Bulk-insert a synthetic dataset into the transaction table
+
+    Args:
+        seed (int): Dataset seed
+        users (int): Independent user histories to generate (None: until max_rows)
+        years (float): Years of history, ending on end_date
+        profile (str): 'salaried', 'irregular', 'informal' or 'mixed'
+        end_date (date): Last day of history (default today)
+        max_rows (int): Stop after this many rows
+        replace (bool): Delete existing transactions first
+        chunk_size (int): Rows per executemany INSERT and commit
+        progress (callable): Called with the number of rows inserted so far
+
+    Returns:
+        dict: Rows inserted and the resulting balance
+    """
+    if replace:
+        Transaction.query.delete()
+        db.session.commit()
+
+    inserted = 0
+    try:
+        for rows in generate_rows(seed, users, years, profile, end_date, max_rows, chunk_size):
+            db.session.execute(insert(Transaction), rows)
+            db.session.commit()
+            inserted += len(rows)
+            if progress is not None:
+                progress(inserted)
+    except BaseException:
+        # Keep the aggregates in step with the chunks that did commit
+        db.session.rollback()
+        rebuild_aggregates()
+        db.session.commit()
+        raise
+
+    # One pass over the table is far cheaper than per-chunk upserts here
+    rebuild_aggregates()
+    db.session.commit()
+
+    return {'rows': inserted, 'balance': Transaction.get_current_balance()}
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """One app bound to a throwaway SQLite file for the whole run"""
+    database = tmp_path_factory.mktemp('db') / 'test.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ['STORAGE_PROFILE'] = 'sqlite'
+    os.environ.pop('AUTO_MIGRATE', None)
+
+    from app import create_app
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def db(app):
+    """An app context over a freshly migrated, empty schema"""
+    from app import db
+    from cache import forecast_cache
+    import migrations
+    import transaction_frame
+
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade_schema()
+        forecast_cache.clear()
+        transaction_frame.reset()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_transaction(db):
+    """Insert one committed transaction the way the add_transaction route does"""
+    from models import Transaction, record_transaction_write
+
+    def add(amount, transaction_type='expense', category=None, date_created=None, description='Test'):
+        transaction = Transaction(
+            description=description,
+            amount=amount,
+            transaction_type=transaction_type,
+            category=category or ('salary' if transaction_type == 'income' else 'food'),
+            date_created=date_created or datetime.now()
+        )
+        db.session.add(transaction)
+        record_transaction_write(transaction)
+        db.session.commit()
+        return transaction
+    return add
+
+
+@pytest.fixture
+def delete_transaction(db):
+    """Delete one transaction the way the delete_transaction route does"""
+    from models import Transaction, record_transaction_write
+
+    def delete(transaction_id):
+        transaction = db.session.get(Transaction, transaction_id)
+        db.session.delete(transaction)
+        record_transaction_write(transaction, reverse=True)
+        db.session.commit()
+    return delete
@@ -0,0 +1,229 @@
+import io
+from datetime import datetime, timedelta
+import pytest
+import jobs
+from models import Job, Alert, Transaction
+from services.alerts import LEDGER_USER_ID, queue_alert_check
+
+ALERT_JOB_KEY = f'check_alerts:user:{LEDGER_USER_ID}'
+
+
+def alert_jobs():
+    return Job.query.filter_by(job_type='check_alerts').all()
+
+
+def run_alert_jobs():
+    """Make the queued alert jobs due and run them"""
+    Job.query.update({'run_after': datetime.utcnow() - timedelta(seconds=1)})
+    return [jobs.run_job(job) for job in jobs.claim_due_jobs()]
+
+
+def test_transaction_writes_queue_one_check(client, db):
+    for amount in (50, 60):
+        response = client.post('/add_transaction', data={
+            'description': 'Groceries', 'amount': amount, 'transaction_type': 'expense', 'category': 'food'
+        })
+        assert response.status_code == 302
+    assert [job.dedupe_key for job in alert_jobs()] == [ALERT_JOB_KEY]
+
+    run_alert_jobs()
+    assert db.session.get(Job, alert_jobs()[0].id).status == 'done'
+
+    transaction = Transaction.query.first()
+    client.post(f'/delete_transaction/{transaction.id}')
+    assert [job.status for job in alert_jobs()] == ['pending']
+
+
+def test_import_queues_check(client, db):
+    statement = b'Date,Description,Amount\n2026-01-05,Salary,1500.00\n2026-01-06,Spar,-80.00\n'
+    response = client.post('/api/import', data={'statement': (io.BytesIO(statement), 'statement.csv')})
+    assert response.status_code == 200
+    assert [job.dedupe_key for job in alert_jobs()] == [ALERT_JOB_KEY]
+
+
+def test_enqueue_coalesces_by_state(db):
+    job = jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9})
+    db.session.commit()
+    run_after = job.run_after
+
+    # Pending: left alone
+    job = jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 10})
+    assert (job.status, job.payload, job.run_after) == ('pending', '{"user_id": 9}', run_after)
+
+    # Running: flagged to run once more
+    job.status, job.attempts = 'running', 1
+    db.session.commit()
+    job = jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9})
+    assert (job.status, job.rerun, job.attempts) == ('running', True, 1)
+
+    # Finished or failed: re-armed
+    job.status, job.rerun, job.attempts = 'failed', False, 3
+    db.session.commit()
+    job = jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9})
+    assert (job.status, job.attempts) == ('pending', 0)
+    db.session.commit()
+    assert Job.query.filter_by(dedupe_key='check_alerts:user:9').count() == 1
+
+
+def test_enqueue_rides_on_a_job_committed_elsewhere(db, add_transaction):
+    # Another worker committed the job after this session last looked
+    with db.engine.begin() as connection:
+        connection.execute(Job.__table__.insert().values(
+            job_type='check_alerts', dedupe_key=ALERT_JOB_KEY, payload='{}', status='done',
+            rerun=False, attempts=1, run_after=datetime.utcnow()
+        ))
+
+    transaction = add_transaction(25, 'expense')
+    queue_alert_check(LEDGER_USER_ID)
+    db.session.commit()
+
+    assert db.session.get(Transaction, transaction.id) is not None
+    assert [job.status for job in alert_jobs()] == ['pending']
+
+
+def test_alert_job_stores_alerts(db, add_transaction):
+    add_transaction(500, 'income', date_created=datetime.now() - timedelta(days=20))
+    for offset in range(10):
+        add_transaction(200, 'expense', date_created=datetime.now() - timedelta(days=offset))
+    queue_alert_check(LEDGER_USER_ID)
+    db.session.commit()
+
+    assert run_alert_jobs() == ['done']
+    types = {alert.alert_type for alert in Alert.query.filter_by(user_id=LEDGER_USER_ID, is_active=True)}
+    assert 'cash_shortfall' in types
+
+
+def test_alerts_api_serves_stored_alerts(client, db, add_transaction):
+    assert client.get('/api/alerts').get_json() == []
+
+    add_transaction(500, 'income', date_created=datetime.now() - timedelta(days=20))
+    for offset in range(10):
+        add_transaction(200, 'expense', date_created=datetime.now() - timedelta(days=offset))
+    queue_alert_check(LEDGER_USER_ID)
+    db.session.commit()
+    run_alert_jobs()
+
+    served = client.get('/api/alerts').get_json()
+    stored = Alert.query.filter_by(user_id=LEDGER_USER_ID, is_active=True).all()
+    assert {alert['id'] for alert in served} == {alert.id for alert in stored}
+    assert 'cash_shortfall' in {alert['type'] for alert in served}
+    assert all(isinstance(alert['details'], dict) for alert in served)
+    assert len(client.get('/api/alerts?limit=1').get_json()) == 1
+
+    # Resolved alerts drop out of the feed
+    Alert.resolve_missing(LEDGER_USER_ID, set())
+    db.session.commit()
+    assert client.get('/api/alerts').get_json() == []
+
+
+def test_alert_job_failures_are_retried(db, add_transaction, monkeypatch):
+    import services.forecasting
+
+    def broken_forecast(days=30):
+        raise RuntimeError('forecast failed')
+    monkeypatch.setattr(services.forecasting, 'ledger_forecast', broken_forecast)
+
+    add_transaction(10, 'expense')
+    queue_alert_check(LEDGER_USER_ID)
+    db.session.commit()
+
+    assert run_alert_jobs() == ['pending']
+    job = alert_jobs()[0]
+    assert job.attempts == 1
+    assert job.last_error == 'forecast failed'
+    assert job.run_after > datetime.utcnow()
+
+
+def test_check_alerts_still_swallows_errors(db, monkeypatch):
+    import services.alerts
+
+    def broken(forecast_data, threshold=None):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(services.alerts, 'check_shortfall_alerts', broken)
+    assert services.alerts.check_alerts(LEDGER_USER_ID, forecast_data={}) == []
+
+
+def test_upsert_refreshes_one_row_per_fingerprint(db):
+    fingerprint = Alert.make_fingerprint('cash_shortfall', 'balance', '2026-03-01', user_id=7)
+    assert fingerprint == Alert.make_fingerprint('cash_shortfall', 'balance', '2026-03-01', user_id=7)
+    assert fingerprint != Alert.make_fingerprint('cash_shortfall', 'balance', '2026-03-02', user_id=7)
+
+    Alert.upsert('cash_shortfall', 'Short by P50', fingerprint, user_id=7, severity='high')
+    db.session.commit()
+    first = Alert.query.one()
+    first.is_active = False
+    db.session.commit()
+
+    Alert.upsert('cash_shortfall', 'Short by P80', fingerprint, user_id=7, severity='high')
+    db.session.commit()
+    alert = Alert.query.populate_existing().one()
+    assert (alert.id, alert.message, alert.is_active) == (first.id, 'Short by P80', True)
+
+
+def test_resolve_missing_and_compact(app, db):
+    keep, drop = (Alert.make_fingerprint('income_delay', subject, user_id=7) for subject in ('keep', 'drop'))
+    for fingerprint in (keep, drop):
+        Alert.upsert('income_delay', fingerprint, fingerprint, user_id=7)
+    Alert.upsert('income_delay', 'other user', Alert.make_fingerprint('income_delay', 'drop', user_id=8), user_id=8)
+    db.session.commit()
+
+    assert Alert.resolve_missing(7, {keep}) == 1
+    db.session.commit()
+    active = {alert.message: alert.is_active for alert in Alert.query}
+    assert active == {keep: True, drop: False, 'other user': True}
+
+    # Resolved recently: kept until it ages out of the retention window
+    assert Alert.compact(retention_days=30) == 0
+    Alert.query.filter_by(is_active=False).update({'date_updated': datetime.utcnow() - timedelta(days=31)})
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['compact-alerts', '--days', '30'])
+    assert 'Deleted 1 inactive alerts' in result.output
+    assert {alert.message for alert in Alert.query} == {keep, 'other user'}
+
+
+def test_repeated_alert_runs_do_not_duplicate(db, add_transaction):
+    add_transaction(500, 'income', date_created=datetime.now() - timedelta(days=20))
+    for offset in range(10):
+        add_transaction(200, 'expense', date_created=datetime.now() - timedelta(days=offset))
+
+    for _ in range(3):
+        queue_alert_check(LEDGER_USER_ID)
+        db.session.commit()
+        assert run_alert_jobs() == ['done']
+
+    fingerprints = [alert.fingerprint for alert in Alert.query]
+    assert fingerprints and len(fingerprints) == len(set(fingerprints))
+
+
+def test_crashed_claim_is_reclaimed_after_its_lease(db):
+    jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9}, delay_seconds=0)
+    db.session.commit()
+
+    def crash_and_expire():
+        # The worker claimed the job, then died without recording an outcome
+        [job] = jobs.claim_due_jobs()
+        assert job.status == 'running'
+        assert jobs.claim_due_jobs() == []
+        job.claimed_at -= timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+        db.session.commit()
+        return job
+
+    for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+        job = crash_and_expire()
+        assert job.attempts == attempt
+
+    # Out of attempts: failed rather than claimed again, and re-armed by the next write
+    assert jobs.claim_due_jobs() == []
+    job = db.session.get(Job, job.id)
+    assert (job.status, job.last_error) == ('failed', 'Worker lease expired')
+    job = jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9}, delay_seconds=0)
+    assert (job.status, job.attempts) == ('pending', 0)
+
+
+def test_finished_jobs_release_their_lease(db):
+    jobs.enqueue('check_alerts', 'check_alerts:user:9', {'user_id': 9}, delay_seconds=0)
+    db.session.commit()
+    [job] = jobs.claim_due_jobs()
+    assert job.claimed_at is not None
+    assert jobs.run_job(job) == 'done'
+    assert db.session.get(Job, job.id).claimed_at is None
@@ -0,0 +1,73 @@
+from flask import g
+from cache import LRUCache, forecast_cache
+from financial_calculator import FinancialSnapshot
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+    assert cache.get_or_compute('a', lambda: 99) == 1
+
+
+def test_versioned_figures_are_shared_until_a_write(db, add_transaction):
+    add_transaction(500, 'income')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return FinancialSnapshot().current_balance
+
+    assert FinancialSnapshot().versioned(('balance',), compute) == 500
+    assert FinancialSnapshot().versioned(('balance',), compute) == 500
+    assert len(calls) == 1
+
+    add_transaction(80, 'expense')
+    assert FinancialSnapshot().versioned(('balance',), compute) == 420
+    assert len(calls) == 2
+
+
+def dashboard(client):
+    # Test requests share the fixture's app context; start each with a fresh snapshot
+    g.pop('financial_snapshot', None)
+    return client.get('/')
+
+
+def test_dashboard_hits_cache_on_repeat(client, add_transaction):
+    add_transaction(500, 'income')
+    assert dashboard(client).status_code == 200
+    misses = forecast_cache.stats()['misses']
+
+    assert dashboard(client).status_code == 200
+    stats = client.get('/api/cache_stats').get_json()
+    assert stats['misses'] == misses
+    assert stats['hits'] > 0
+
+    add_transaction(80, 'expense')
+    assert dashboard(client).status_code == 200
+    assert forecast_cache.stats()['misses'] > misses
+
+
+def test_migration_adds_ledger_counters(db):
+    from sqlalchemy import text
+    import migrations
+    from models import BalanceLedger
+
+    # A ledger table from before the counter columns existed
+    with db.engine.begin() as connection:
+        connection.execute(text('DROP TABLE balance_ledger'))
+        connection.execute(text('CREATE TABLE balance_ledger (id INTEGER PRIMARY KEY, total_income FLOAT NOT NULL, '
+                                'total_expenses FLOAT NOT NULL, transaction_count INTEGER NOT NULL, '
+                                'date_updated DATETIME)'))
+        connection.execute(text('INSERT INTO balance_ledger VALUES (1, 50, 20, 2, NULL)'))
+
+    assert migrations.add_ledger_counter_columns() == list(migrations.LEDGER_COUNTER_COLUMNS)
+    assert migrations.add_ledger_counter_columns() == []
+    ledger = db.session.get(BalanceLedger, 1)
+    assert (ledger.balance, ledger.version, ledger.epoch, ledger.deletions) == (30, 0, 0, 0)
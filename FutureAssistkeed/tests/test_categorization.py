@@ -0,0 +1,58 @@
+import re
+import pytest
+from models import TRANSACTION_CATEGORIES
+from services.categorization import (categorize_transaction, categorize_many, calculate_confidence,
+                                     get_subcategory, apply_categorization_rules)
+
+
+def reference_categorize(description, amount):
+    """The original one-regex-per-keyword loop"""
+    description_lower = description.lower().strip()
+    is_income = amount > 0
+    categories = TRANSACTION_CATEGORIES['income'] if is_income else TRANSACTION_CATEGORIES['expenses']
+    best_match = {
+        'category': 'other_income' if is_income else 'other_expenses',
+        'subcategory': None,
+        'confidence': 0.1,
+        'explanation': 'Default category assigned - no specific keywords matched'
+    }
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', description_lower):
+                confidence = calculate_confidence(keyword, description_lower, is_income)
+                if confidence > best_match['confidence']:
+                    best_match = {
+                        'category': category,
+                        'subcategory': get_subcategory(category, description_lower),
+                        'confidence': confidence,
+                        'explanation': f'Matched keyword "{keyword}" in description'
+                    }
+    return apply_categorization_rules(description_lower, amount, best_match)
+
+
+def sample_descriptions():
+    descriptions = ['', 'Unknown transfer', 'BDF allowance', 'UB tuition fee', 'Spar lunch',
+                    'Taxi to Gaborone', 'Combi and airtime', 'Mascom data bundle payment']
+    for group in TRANSACTION_CATEGORIES.values():
+        for keywords in group.values():
+            for keyword in keywords:
+                descriptions += [keyword, f'  {keyword.upper()} ', f'{keyword} at spar', f'x{keyword}x']
+    return descriptions
+
+
+@pytest.mark.parametrize('amount', [-45.0, -250.0, 80.0, 1200.0, 9000.0])
+def test_matches_reference_loop(amount):
+    for description in sample_descriptions():
+        assert categorize_transaction(description, amount) == reference_categorize(description, amount), description
+
+
+def test_categorize_many_matches_single_calls():
+    descriptions = sample_descriptions() * 2
+    amounts = [(-45.0, 1200.0, -250.0, 9000.0, 60.0)[index % 5] for index in range(len(descriptions))]
+    results = categorize_many(descriptions, amounts)
+
+    assert results == [categorize_transaction(d, a) for d, a in zip(descriptions, amounts)]
+    # Repeated descriptions share a memo entry but not the dict handed out
+    first, again = categorize_many(['Spar', 'Spar'], [-45.0, -45.0])
+    first['category'] = 'changed'
+    assert again['category'] == 'food'
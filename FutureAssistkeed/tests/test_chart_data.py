@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from financial_calculator import FinancialCalculator
+from models import Transaction
+
+
+def brute_force_closing_balance(db, day):
+    """Balance at the end of `day`, summed straight from the transaction table"""
+    signed = case((Transaction.transaction_type == 'income', Transaction.amount), else_=-Transaction.amount)
+    return db.session.query(func.coalesce(func.sum(signed), 0)).filter(
+        Transaction.date_created < datetime.combine(day + timedelta(days=1), datetime.min.time())
+    ).scalar()
+
+
+def seed_history(add_transaction):
+    now = datetime.now()
+    add_transaction(1000, 'income', date_created=now - timedelta(days=45))
+    add_transaction(200, 'expense', date_created=now - timedelta(days=40))
+    for offset in range(0, 30, 3):
+        add_transaction(50 + offset, 'expense', date_created=now - timedelta(days=offset, hours=1))
+    add_transaction(300, 'income', date_created=now - timedelta(days=10))
+
+
+def test_balance_trend_matches_brute_force(db, add_transaction):
+    seed_history(add_transaction)
+    today = datetime.now().date()
+
+    trend = FinancialCalculator.get_balance_trend(30)
+    assert len(trend['data']) == 30
+    for offset, balance in enumerate(trend['data']):
+        day = today - timedelta(days=29 - offset)
+        assert abs(balance - brute_force_closing_balance(db, day)) < 1e-6, day
+
+
+def test_full_history_trend_starts_at_first_transaction(db, add_transaction):
+    seed_history(add_transaction)
+    trend = FinancialCalculator.get_balance_trend(None)
+    assert len(trend['data']) == 46
+    assert trend['data'][0] == 1000
+    assert abs(trend['data'][-1] - brute_force_closing_balance(db, datetime.now().date())) < 1e-6
+
+
+def test_chart_data_range_is_validated_and_clamped(client, add_transaction):
+    add_transaction(10, 'income')
+    assert client.get('/api/chart_data?range=abc').status_code == 400
+    assert client.get('/api/chart_data?range=0').status_code == 400
+
+    response = client.get('/api/chart_data?range=99999999999999')
+    assert response.status_code == 200
+    assert len(response.get_json()['balance_trend']['data']) == 3650
+
+    response = client.get('/api/chart_data?range=all')
+    assert response.get_json()['balance_trend']['data'] == [10]
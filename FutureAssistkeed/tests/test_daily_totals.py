@@ -0,0 +1,80 @@
+import io
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from models import Transaction, DailyTotal, CategoryCount, current_month_range
+from importer import import_statement
+
+
+def rollup():
+    """{(day, type, category): (total, count)} from daily_totals, ignoring emptied keys"""
+    return {
+        (row.day, row.transaction_type, row.category): (round(row.total, 6), row.count)
+        for row in DailyTotal.query if row.count
+    }
+
+
+def brute_force(db):
+    """The same figures grouped straight from the transaction table"""
+    rows = db.session.query(
+        func.date(Transaction.date_created), Transaction.transaction_type, Transaction.category,
+        func.sum(Transaction.amount), func.count(Transaction.id)
+    ).group_by(func.date(Transaction.date_created), Transaction.transaction_type, Transaction.category)
+    return {
+        (datetime.strptime(day, '%Y-%m-%d').date(), transaction_type, category): (round(total, 6), count)
+        for day, transaction_type, category, total, count in rows
+    }
+
+
+def seed(add_transaction):
+    now = datetime.now()
+    rows = []
+    for offset in range(40):
+        date = now - timedelta(days=offset, hours=offset % 5)
+        rows.append(add_transaction(100 + offset, 'income' if offset % 4 == 0 else 'expense',
+                                    'salary' if offset % 4 == 0 else ('food', 'housing', 'utilities')[offset % 3],
+                                    date_created=date))
+    return rows
+
+
+def test_rollup_follows_inserts_deletes_and_imports(db, add_transaction, delete_transaction):
+    rows = seed(add_transaction)
+    for transaction in rows[::7]:
+        delete_transaction(transaction.id)
+    import_statement(io.StringIO('Date,Description,Amount\n'
+                                 '2026-01-05,Salary,1500.00\n2026-01-05,Spar groceries,-80.50\n'
+                                 '2026-01-06,BPC electricity,-200.00\n'), 'csv')
+
+    assert rollup() == brute_force(db)
+
+
+def test_monthly_summary_and_breakdown_match_raw_rows(db, add_transaction):
+    seed(add_transaction)
+    month_start, month_end = current_month_range()
+    in_month = Transaction.query.filter(Transaction.date_created >= month_start,
+                                        Transaction.date_created < month_end).all()
+
+    income = sum(t.amount for t in in_month if t.transaction_type == 'income')
+    expenses = sum(t.amount for t in in_month if t.transaction_type == 'expense')
+    summary = Transaction.get_monthly_summary()
+    assert summary['income'] == income
+    assert summary['expenses'] == expenses
+
+    breakdown = {item['category']: item['amount'] for item in Transaction.get_category_breakdown('expense')}
+    expected = {}
+    for t in in_month:
+        if t.transaction_type == 'expense':
+            expected[t.category] = expected.get(t.category, 0) + t.amount
+    assert breakdown == expected
+
+
+def test_rebuild_command_repairs_rollup(app, db, add_transaction):
+    seed(add_transaction)
+    expected = brute_force(db)
+    DailyTotal.query.delete()
+    CategoryCount.query.delete()
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rebuild-aggregates'])
+    assert result.exit_code == 0, result.output
+    assert rollup() == expected
+    assert CategoryCount.total() == Transaction.query.count()
@@ -0,0 +1,61 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+from exporter import export_stream, iter_rows, encode_csv, EXPORT_COLUMNS
+from models import Transaction
+
+
+def seed(add_transaction, count=25):
+    start = datetime(2026, 2, 1, 9)
+    for index in range(count):
+        add_transaction(10 + index, 'income' if index % 4 == 0 else 'expense',
+                        'salary' if index % 4 == 0 else 'food',
+                        date_created=start + timedelta(hours=count - index),
+                        description=f'Row, "{index}"')
+
+
+def expected_rows(**filters):
+    query = Transaction.query.order_by(Transaction.date_created, Transaction.id)
+    if filters.get('transaction_type'):
+        query = query.filter_by(transaction_type=filters['transaction_type'])
+    return [{
+        'id': t.id, 'date_created': t.date_created.isoformat(), 'description': t.description,
+        'amount': t.amount, 'transaction_type': t.transaction_type, 'category': t.category
+    } for t in query]
+
+
+def test_csv_export_matches_table(db, add_transaction):
+    seed(add_transaction)
+    expected = [{key: str(value) for key, value in row.items()} for row in expected_rows()]
+    rows = list(csv.DictReader(io.StringIO(b''.join(export_stream('csv')).decode())))
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    assert rows == expected
+
+    batches = list(iter_rows(batch_size=4))
+    assert [len(batch) for batch in batches] == [4] * 6 + [1]
+    assert list(csv.DictReader(io.StringIO(''.join(encode_csv(batches))))) == expected
+
+
+def test_ndjson_export_is_filtered(db, add_transaction):
+    seed(add_transaction)
+    body = b''.join(export_stream('ndjson', transaction_type='expense')).decode()
+    assert [json.loads(line) for line in body.splitlines()] == expected_rows(transaction_type='expense')
+
+
+def test_export_route_gzip(client, add_transaction):
+    seed(add_transaction)
+    response = client.get('/export?format=ndjson&gzip=1')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert '.ndjson.gz' in response.headers['Content-Disposition']
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert [json.loads(line) for line in lines] == expected_rows()
+
+    assert client.get('/export?format=xml').status_code == 400
+
+
+def test_empty_export(client):
+    assert client.get('/export').data.decode().strip() == ','.join(EXPORT_COLUMNS)
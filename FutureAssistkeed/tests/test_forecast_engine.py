@@ -0,0 +1,80 @@
+import json
+import tracemalloc
+from datetime import date
+import numpy as np
+from services.forecast_engine import (
+    DailyForecastView, first_shortfall_day, running_balance, simulate_balance_paths
+)
+
+
+def test_view_items_and_to_list_agree():
+    view = DailyForecastView(date(2026, 1, 30), {
+        'daily_net': np.array([10.0, -25.5, 3.0]),
+        'running_balance': running_balance(5.0, np.array([10.0, -25.5, 3.0]))
+    })
+
+    assert view[1] == {'day': 2, 'date': '2026-02-01', 'daily_net': -25.5, 'running_balance': -10.5}
+    assert view[-1]['day'] == 3
+    assert view.to_list() == list(view)
+    assert json.loads(json.dumps(view.to_list())) == list(view)
+
+
+def test_first_shortfall_day():
+    balances = np.array([50.0, 0.0, -5.0])
+    assert first_shortfall_day(balances) == 2
+    assert first_shortfall_day(balances, inclusive=False) == 3
+    assert first_shortfall_day(np.array([1.0, 2.0])) is None
+
+
+def simulate_all_paths(current_balance, nets, days, paths, seed, batch_size=2000, band_paths=2000,
+                       percentiles=(5, 25, 50, 75, 95)):
+    """The simulation keeping every path in one (paths, days) matrix, for reference"""
+    rng = np.random.default_rng(seed)
+    nets = np.asarray(nets, dtype=np.float32)
+    balances = np.empty((paths, days), dtype=np.float32)
+    for start in range(0, paths, batch_size):
+        count = min(batch_size, paths - start)
+        batch = nets[rng.integers(0, nets.size, size=(count, days), dtype=np.int32)]
+        np.cumsum(batch, axis=1, out=batch)
+        balances[start:start + count] = current_balance + batch
+    negative = balances < 0
+    return (negative.mean(axis=0), float(negative.any(axis=1).mean()),
+            np.percentile(balances[:band_paths], percentiles, axis=0))
+
+
+def test_batched_simulation_matches_full_matrix():
+    incomes = [0, 0, 300, 0, 50, 0, 0, 500, 0, 0]
+    expenses = [40, 35, 60, 20, 80, 45, 30, 55, 25, 70]
+    result = simulate_balance_paths(200.0, incomes, expenses, 60, paths=5000, seed=7,
+                                    time_budget_ms=60000, batch_size=1500, band_paths=2000)
+    probability, any_probability, bands = simulate_all_paths(
+        200.0, np.subtract(incomes, expenses), 60, 5000, seed=7, batch_size=1500)
+
+    assert result['paths'] == 5000
+    assert np.allclose(result['shortfall_probability'], probability)
+    assert result['any_shortfall_probability'] == any_probability
+    for band, expected in zip(result['percentiles'].values(), bands):
+        assert np.allclose(band, expected)
+
+
+def test_simulation_memory_does_not_grow_with_paths():
+    tracemalloc.start()
+    try:
+        simulate_balance_paths(1000.0, [100, 0, 0], [30, 40, 50], 365, paths=50000, seed=1,
+                               time_budget_ms=60000)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # The full (paths, days) float32 matrix alone would be 73 MB
+    assert peak < 16 * 2 ** 20
+
+
+def test_probabilistic_route_caps(client, add_transaction):
+    add_transaction(500, 'income')
+    add_transaction(80, 'expense')
+
+    data = client.get('/api/forecast/probabilistic?days=1000&paths=999999').get_json()
+    assert data['days_ahead'] == 365
+    assert 0 < data['paths'] <= 50000
+    assert len(data['shortfall_probability']) == 365
+    assert client.get('/api/forecast/probabilistic?days=0').status_code == 400
@@ -0,0 +1,210 @@
+import json
+import math
+import statistics
+from datetime import datetime, timedelta
+import pytest
+
+
+def sample_rows(now, days=60):
+    """(date, signed amount, category) rows: weekly pay, mixed daily spending"""
+    rows = []
+    for offset in range(days):
+        day = (now - timedelta(days=days - offset)).replace(hour=0, minute=0, second=0, microsecond=0)
+        if offset % 7 == 0:
+            rows.append((day, 800.0 + 40 * (offset % 3), 'salary'))
+        rows.append((day, -(20.0 + offset % 11), 'food'))
+        if offset % 3 == 0:
+            rows.append((day, -(50.0 + offset % 5), 'transport'))
+    return rows
+
+
+def reference_analysis(rows, now):
+    """The income/expense analysis written out in plain Python, as it read before NumPy"""
+    dates = [date for date, _, _ in rows]
+    days_span = (max(dates) - min(dates)).days or 1
+
+    income = [(date, amount) for date, amount, _ in rows if amount > 0]
+    income_amounts = [amount for _, amount in income]
+    income_dates = sorted({date.date() for date, _ in income})
+    frequency = (statistics.mean((b - a).days for a, b in zip(income_dates, income_dates[1:]))
+                 if len(income_dates) > 1 else 30)
+    income_cv = statistics.pstdev(income_amounts) / statistics.mean(income_amounts)
+    income_analysis = {
+        'average_daily': sum(income_amounts) / days_span,
+        'frequency_days': frequency,
+        'last_income_days_ago': (now - max(date for date, _ in income)).days,
+        'typical_amount': statistics.median(income_amounts),
+        'income_consistency': 1 - income_cv,
+    }
+
+    expenses = [(date, amount, category) for date, amount, category in rows if amount <= 0]
+    categories = {}
+    for _, amount, category in expenses:
+        categories.setdefault(category, []).append(amount)
+    daily = {}
+    for date, amount, _ in expenses:
+        daily[date.date()] = daily.get(date.date(), 0) + amount
+    expense_cv = statistics.pstdev(daily.values()) / statistics.mean(daily.values())
+    expense_analysis = {
+        'average_daily': abs(sum(amount for _, amount, _ in expenses)) / days_span,
+        'categories': {
+            category: {'total': abs(sum(amounts)), 'average': abs(statistics.mean(amounts)),
+                       'frequency': len(amounts)}
+            for category, amounts in categories.items()
+        },
+        'expense_consistency': 1 - expense_cv,
+    }
+    return income_analysis, expense_analysis
+
+
+def assert_analysis_matches(actual, expected):
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            assert actual[key].keys() == value.keys()
+            for category, figures in value.items():
+                assert actual[key][category] == pytest.approx(figures)
+        else:
+            assert actual[key] == pytest.approx(value), key
+
+
+def test_analysis_matches_plain_python_reference():
+    from services.forecasting import HistoryColumns, analyze_patterns
+
+    now = datetime(2026, 3, 15, 12)
+    rows = sample_rows(now)
+    income_analysis, expense_analysis = analyze_patterns(HistoryColumns.from_rows(rows), now)
+    expected_income, expected_expenses = reference_analysis(rows, now)
+
+    assert_analysis_matches(income_analysis, expected_income)
+    assert_analysis_matches(expense_analysis, expected_expenses)
+
+
+def test_frame_history_matches_row_history(db, add_transaction):
+    from services.forecasting import HistoryColumns, analyze_patterns
+    import transaction_frame
+
+    now = datetime.now()
+    rows = sample_rows(now, days=40)
+    for date, amount, category in rows:
+        add_transaction(abs(amount), 'income' if amount > 0 else 'expense', category, date_created=date)
+
+    from_rows = analyze_patterns(HistoryColumns.from_rows(rows), now)
+    from_frame = analyze_patterns(HistoryColumns.from_frame(transaction_frame.current_frame()), now)
+    for expected, actual in zip(from_rows, from_frame):
+        assert_analysis_matches(actual, expected)
+
+
+def test_generate_forecast_runs(db, add_transaction):
+    from services.forecasting import generate_forecast
+
+    for date, amount, category in sample_rows(datetime.now(), days=30):
+        add_transaction(abs(amount), 'income' if amount > 0 else 'expense', category, date_created=date)
+
+    forecast = generate_forecast(1, days=30)
+    assert forecast['forecast_period'] == 30
+    assert len(forecast['daily_forecasts']) == 30
+    assert forecast['income_analysis']['pattern_type'] != 'no_data'
+    assert forecast['expense_analysis']['categories'].keys() == {'food', 'transport'}
+
+    first = forecast['daily_forecasts'][0]
+    assert math.isclose(first['predicted_balance'], forecast['current_balance'] + first['net_change'])
+
+
+def test_generate_forecast_without_history(db):
+    from services.forecasting import generate_forecast
+
+    forecast = generate_forecast(1, days=7)
+    assert forecast['daily_forecasts'] == []
+    assert forecast['income_analysis'] == {'pattern_type': 'no_data'}
+
+
+def test_forecast_is_json_serialisable(db, add_transaction):
+    from services.forecasting import generate_forecast
+
+    # Spending far above income, so the forecast runs into shortfalls
+    for offset in range(10):
+        add_transaction(300, 'expense', date_created=datetime.now() - timedelta(days=offset))
+    add_transaction(1000, 'income', date_created=datetime.now() - timedelta(days=10))
+
+    forecast = generate_forecast(1, days=365)
+    assert forecast['shortfalls']
+    assert forecast['shortfalls'][0]['predicted_balance'] < 0
+
+    decoded = json.loads(json.dumps(forecast))
+    assert len(decoded['daily_forecasts']) == 365
+    assert decoded['shortfalls'][0] == forecast['shortfalls'][0]
+
+
+def test_vectorised_predictions_match_per_day_loop():
+    from services.forecasting import (
+        forecast_daily_income, forecast_daily_expenses, forecast_confidence,
+        predict_daily_income, predict_daily_expenses, calculate_prediction_confidence
+    )
+
+    income_analysis = {'pattern_type': 'regular', 'average_daily': 120.0, 'frequency_days': 7,
+                       'last_income_days_ago': 2, 'income_consistency': 0.9}
+    expense_analysis = {'pattern_type': 'irregular', 'average_daily': 80.0, 'expense_consistency': 0.4}
+    today = datetime.now().date()
+    dates = [today + timedelta(days=day) for day in range(1, 366)]
+
+    assert forecast_daily_income(today, 365, income_analysis).tolist() == pytest.approx(
+        [predict_daily_income(date, income_analysis) for date in dates])
+    assert forecast_daily_expenses(today, 365, expense_analysis).tolist() == pytest.approx(
+        [predict_daily_expenses(date, expense_analysis) for date in dates])
+    assert forecast_confidence(365, income_analysis, expense_analysis).tolist() == pytest.approx(
+        [calculate_prediction_confidence(date, income_analysis, expense_analysis) for date in dates])
+
+
+def seed_midnight_history(add_transaction, days=30):
+    # Midnight timestamps, so the row history and the day-resolution frame agree
+    for date, amount, category in sample_rows(datetime.now(), days=days):
+        add_transaction(abs(amount), 'income' if amount > 0 else 'expense', category, date_created=date)
+
+
+def test_generate_forecasts_matches_generate_forecast(db, add_transaction):
+    from services.forecasting import generate_forecast, generate_forecasts
+
+    seed_midnight_history(add_transaction)
+    single = generate_forecast(1, days=14)
+    batch = generate_forecasts([1, 2, 3], days=14, workers=1)
+
+    assert batch.keys() == {1, 2, 3}
+    for forecast in batch.values():
+        assert forecast['daily_forecasts'] == single['daily_forecasts']
+        assert forecast['income_analysis'] == pytest.approx(single['income_analysis'])
+
+
+def test_generate_forecasts_on_process_pool(db, add_transaction, monkeypatch):
+    import services.forecasting as forecasting
+
+    seed_midnight_history(add_transaction)
+    inline = forecasting.generate_forecasts([1, 2], days=7, workers=1)
+
+    # Give each user a history object of their own, so there is more than one chunk to farm out
+    load = forecasting.load_recent_histories
+    monkeypatch.setattr(forecasting, 'load_recent_histories',
+                        lambda user_ids: {user_id: list(rows) for user_id, rows in load(user_ids).items()})
+    pooled = forecasting.generate_forecasts([1, 2], days=7, workers=2, chunk_size=1)
+
+    for user_id in (1, 2):
+        assert pooled[user_id]['daily_forecasts'] == inline[user_id]['daily_forecasts']
+
+
+def test_generate_forecasts_without_history(db):
+    from services.forecasting import generate_forecasts
+
+    forecasts = generate_forecasts([7], days=7, workers=1)
+    assert forecasts[7]['income_analysis'] == {'pattern_type': 'no_data'}
+    assert generate_forecasts([], workers=1) == {}
+
+
+def test_forecast_without_income(db, add_transaction):
+    from services.forecasting import ledger_forecast
+
+    add_transaction(40, 'expense', date_created=datetime.now() - timedelta(days=2))
+    add_transaction(60, 'expense')
+
+    forecast = ledger_forecast(days=7)
+    assert forecast['income_analysis']['pattern_type'] == 'no_data'
+    assert len(forecast['daily_forecasts']) == 7
+    assert forecast['shortfalls']
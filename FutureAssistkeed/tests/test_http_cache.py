@@ -0,0 +1,56 @@
+import gzip
+from flask import g
+
+
+def get(client, path, **headers):
+    # Test requests share the fixture's app context; start each with a fresh snapshot
+    g.pop('financial_snapshot', None)
+    return client.get(path, headers=headers)
+
+
+def test_ledger_views_revalidate_until_a_write(client, add_transaction):
+    add_transaction(500, 'income')
+    for path in ('/', '/forecast', '/api/chart_data?days=30'):
+        first = get(client, path)
+        etag, weak = first.get_etag()
+        assert first.status_code == 200 and weak
+        assert first.headers['Cache-Control'] in ('private, no-cache', 'no-cache, private')
+
+        again = get(client, path, **{'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304 and again.data == b''
+        assert get(client, path, **{'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+    dashboard = get(client, '/').headers['ETag']
+    assert get(client, '/forecast').headers['ETag'] != dashboard
+
+    add_transaction(80, 'expense')
+    response = get(client, '/', **{'If-None-Match': dashboard})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != dashboard
+
+
+def test_flashed_pages_are_not_validated(client):
+    client.post('/add_transaction', data={
+        'description': 'Groceries', 'amount': 50, 'transaction_type': 'expense', 'category': 'food'
+    })
+    response = get(client, '/')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_large_bodies_are_gzipped(client, add_transaction):
+    add_transaction(500, 'income')
+    plain = get(client, '/')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = get(client, '/', **{'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.get_etag() == plain.get_etag()
+
+    small = get(client, '/api/cache_stats', **{'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+    export = get(client, '/export', **{'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in export.headers
@@ -0,0 +1,101 @@
+import io
+from datetime import datetime
+import pytest
+from importer import parse_amount, import_statement, iter_csv_rows, iter_ofx_rows, StatementError
+from models import Transaction, BalanceLedger
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20260105120000[+2:CAT]
+<TRNAMT>1500.00
+<NAME>Salary
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20260106
+<TRNAMT>-80.50
+<NAME>Spar
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.mark.parametrize('text, amount', [
+    ('BWP 1,200.00', 1200.0),
+    ('P1,200.00', 1200.0),
+    ('-P 45.50', -45.5),
+    ('(BWP 300)', -300.0),
+    ('1 000.25', 1000.25),
+    ('', 0.0),
+])
+def test_parse_amount(text, amount):
+    assert parse_amount(text) == amount
+
+
+def test_parse_amount_rejects_garbage():
+    with pytest.raises(StatementError, match='Unrecognised amount'):
+        parse_amount('12.3.4')
+
+
+def test_csv_and_ofx_rows():
+    csv_rows = list(iter_csv_rows(io.StringIO(
+        'Date,Description,Debit,Credit\n2026-01-05,Salary,,"BWP 1,500.00"\n06/01/2026,Spar,80.50,\n'
+    )))
+    assert csv_rows == [
+        (datetime(2026, 1, 5), 'Salary', 1500.0),
+        (datetime(2026, 1, 6), 'Spar', -80.5),
+    ]
+
+    assert list(iter_ofx_rows(io.StringIO(OFX))) == [
+        (datetime(2026, 1, 5), 'Salary', 1500.0),
+        (datetime(2026, 1, 6), 'Spar', -80.5),
+    ]
+
+
+@pytest.mark.parametrize('statement, message', [
+    ('Date,Description,Amount\n2026-01-05,Salary,1500\n2026-01-06,Spar,lots\n', 'Row 3: Unrecognised amount'),
+    ('Date,Description,Amount\n2026-01-05,Salary,1500\nnot a date,Spar,-5\n', 'Row 3: Unrecognised date'),
+    ('Date,Description,Amount\n2026-01-05,Salary\n', 'Row 2: missing columns'),
+])
+def test_csv_row_errors_name_the_row(statement, message):
+    with pytest.raises(StatementError, match=message):
+        list(iter_csv_rows(io.StringIO(statement)))
+
+
+def test_ofx_transaction_without_date():
+    statement = OFX.replace('<DTPOSTED>20260106\n', '')
+    with pytest.raises(StatementError, match='Transaction 2: missing DTPOSTED'):
+        list(iter_ofx_rows(io.StringIO(statement)))
+
+
+def test_failed_import_reports_committed_chunks(db):
+    statement = ('Date,Description,Amount\n'
+                 '2026-01-05,Salary,1500\n2026-01-06,Spar,-80\n'
+                 '2026-01-07,Taxi,-20\n2026-01-08,Combi,oops\n')
+    with pytest.raises(StatementError) as error:
+        import_statement(io.StringIO(statement), 'csv', chunk_size=2)
+
+    assert 'Row 5' in str(error.value)
+    assert error.value.summary['imported'] == 2
+    assert Transaction.query.count() == 2
+    assert BalanceLedger.check_consistency()['consistent']
+
+
+def test_import_route_reports_row_errors(client):
+    statement = b'Date,Description,Amount\n2026-01-05,Salary,BWP 1200.00\n2026-01-06,Spar,??\n'
+    response = client.post('/api/import', data={'statement': (io.BytesIO(statement), 'statement.csv')})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Row 3: Unrecognised amount: '??'", 'imported': 0}
+
+
+def test_import_cli_reports_row_errors(app, db, tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text('Date,Description,Amount\n2026-01-05,Salary,1500\n2026-01-06,Spar,x\n')
+
+    result = app.test_cli_runner().invoke(args=['import-statement', str(path), '--chunk-size', '1'])
+    assert result.exit_code == 1
+    assert 'Row 3: Unrecognised amount' in result.output
+    assert '1 rows before it were imported' in result.output
@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from financial_calculator import FinancialCalculator
+from models import Transaction
+import migrations
+
+
+@contextmanager
+def captured_selects(db):
+    """Collect (sql, params) for every SELECT issued inside the block"""
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def query_plans(db, statements):
+    with db.engine.connect() as connection:
+        return [
+            ' | '.join(row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params))
+            for sql, params in statements
+        ]
+
+
+def plans_for(db, function):
+    with captured_selects(db) as statements:
+        function()
+    return query_plans(db, statements)
+
+
+def seed(add_transaction):
+    now = datetime.now()
+    for offset in range(20):
+        add_transaction(10 + offset, 'expense', date_created=now - timedelta(days=offset))
+    add_transaction(500, 'income')
+
+
+def test_monthly_summary_uses_rollup_day_index(db, add_transaction):
+    seed(add_transaction)
+    plans = plans_for(db, Transaction.get_monthly_summary)
+    assert plans
+    assert all('daily_totals USING INDEX sqlite_autoindex_daily_totals_1 (day>? AND day<?)' in plan
+               for plan in plans), plans
+
+
+def test_chart_data_never_scans_the_transaction_table(db, add_transaction):
+    seed(add_transaction)
+    plans = plans_for(db, lambda: FinancialCalculator.get_chart_data(30))
+    assert plans and not any('transaction' in plan.replace('daily_totals', '') for plan in plans), plans
+    # The category breakdown is a day-range search on the rollup
+    assert any('SEARCH daily_totals USING INDEX' in plan for plan in plans), plans
+
+
+def test_transaction_list_filters_use_composite_indexes(client, db, add_transaction):
+    seed(add_transaction)
+    expected = {
+        '/transactions?type=expense': 'ix_transaction_type_date',
+        '/transactions?category=food': 'ix_transaction_category_date',
+        '/transactions': 'ix_transaction_date_created',
+    }
+    for path, index in expected.items():
+        plans = plans_for(db, lambda: client.get(path))
+        listing = [plan for plan in plans if 'transaction USING' in plan and 'balance_ledger' not in plan]
+        assert any(index in plan for plan in listing), (path, plans)
+        assert not any(plan.startswith('SCAN transaction') and 'INDEX' not in plan for plan in plans), (path, plans)
+
+
+def test_check_index_usage_reports_every_query_ok(db, add_transaction):
+    seed(add_transaction)
+    report = migrations.check_index_usage()
+    assert report and all(entry['uses_index'] for entry in report), report
@@ -0,0 +1,61 @@
+import logging
+from sqlalchemy import create_engine, text
+from instrumentation import metrics, install_query_timing, format_labels, one_line
+
+
+def test_requests_are_recorded_per_route(client, add_transaction):
+    transaction = add_transaction(40, 'expense')
+    metrics.reset()
+
+    assert client.get('/transactions').status_code == 200
+    assert client.post(f'/delete_transaction/{transaction.id}').status_code == 302
+    response = client.get('/export')
+    response.get_data()
+    response.close()
+
+    routes = metrics.snapshot()
+    assert set(routes) == {'/transactions', '/delete_transaction/<int:transaction_id>', '/export'}
+    for stats in routes.values():
+        assert stats['requests'] == 1
+        assert stats['queries'] > 0
+        assert stats['python_seconds'] >= 0
+    # The export streams its query after the view returns
+    assert 'SELECT' in routes['/export']['slowest_statement']
+
+
+def test_prometheus_text(client):
+    metrics.reset()
+    client.get('/transactions')
+    body = client.get('/metrics').data.decode()
+
+    assert '# TYPE futureassist_http_requests_total counter' in body
+    assert 'futureassist_http_requests_total{route="/transactions",method="GET",status="200"} 1' in body
+    assert 'futureassist_http_request_duration_seconds_bucket{route="/transactions",le="+Inf"} 1' in body
+    assert 'futureassist_http_request_duration_seconds_count{route="/transactions"} 1' in body
+    assert body.endswith('\n')
+
+    # Statement text is served as JSON, never as a label
+    slowest = [line for line in body.splitlines() if line.startswith('futureassist_slowest_query_seconds{')]
+    assert slowest and all(line.startswith('futureassist_slowest_query_seconds{route="') and '",' not in line
+                           for line in slowest)
+    assert 'SELECT' in client.get('/api/metrics').get_json()['/transactions']['slowest_statement']
+
+
+def test_slow_queries_are_logged_without_parameters(caplog):
+    engine = create_engine('sqlite://')
+    install_query_timing(engine, slow_query_ms=1e-9)
+    slow_queries = metrics.slow_queries
+
+    with caplog.at_level(logging.WARNING, logger='futureassist.slow_queries'):
+        with engine.connect() as connection:
+            connection.execute(text('SELECT :secret'), {'secret': 'account-1234'})
+
+    assert metrics.slow_queries == slow_queries + 1
+    assert 'outside a request' in caplog.text
+    assert 'account-1234' not in caplog.text
+
+
+def test_label_formatting():
+    assert format_labels({'statement': 'a "b"\\\nc'}) == '{statement="a \\"b\\"\\\\\\nc"}'
+    assert format_labels({}) == ''
+    assert one_line('SELECT *\n   FROM t', length=8) == 'SELEC...'
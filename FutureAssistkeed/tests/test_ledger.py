@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from models import Transaction, BalanceLedger, record_transaction_write
+
+
+def test_ledger_tracks_inserts_and_deletes(db, add_transaction, delete_transaction):
+    add_transaction(100, 'income')
+    add_transaction(30, 'expense')
+    lunch = add_transaction(12.5, 'expense', date_created=datetime.now() - timedelta(days=3))
+
+    delete_transaction(lunch.id)
+
+    report = BalanceLedger.check_consistency()
+    assert report['consistent']
+    assert report['ledger_balance'] == 70
+    assert report['ledger_count'] == 2
+
+
+def test_first_write_without_ledger_row_is_counted_once(db, add_transaction):
+    add_transaction(50, 'income')
+    db.session.query(BalanceLedger).delete()
+    db.session.commit()
+
+    transaction = Transaction(description='Pay', amount=40, transaction_type='income', category='salary')
+    db.session.add(transaction)
+    record_transaction_write(transaction)
+    db.session.commit()
+
+    report = BalanceLedger.check_consistency()
+    assert report['consistent'], report
+    assert report['ledger_count'] == 2
+    assert report['ledger_balance'] == 90
+
+
+def test_version_changes_on_every_write(db, add_transaction):
+    before = BalanceLedger.get_version()
+    add_transaction(10)
+    assert BalanceLedger.get_version() > before
+
+
+def test_repair_rebuilds_a_drifted_ledger(db, add_transaction):
+    add_transaction(20, 'income')
+    db.session.query(BalanceLedger).update({'total_income': 999})
+    db.session.commit()
+
+    report = BalanceLedger.check_consistency(repair=True)
+    assert not report['consistent'] and report['repaired']
+    assert BalanceLedger.check_consistency()['consistent']
@@ -0,0 +1,97 @@
+import math
+import statistics
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import func
+from financial_calculator import FinancialCalculator
+from models import Transaction
+from rolling_stats import EWMA_HALFLIFE_DAYS
+
+
+def daily_totals_by_sql(db, first_day, last_day):
+    """(income, expenses) per calendar day in [first_day, last_day], grouped straight from transactions"""
+    rows = db.session.query(
+        func.date(Transaction.date_created), Transaction.transaction_type, func.sum(Transaction.amount)
+    ).filter(
+        Transaction.date_created >= datetime.combine(first_day, datetime.min.time()),
+        Transaction.date_created < datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    ).group_by(func.date(Transaction.date_created), Transaction.transaction_type)
+
+    totals = {}
+    for day, transaction_type, amount in rows:
+        totals[(date.fromisoformat(day), transaction_type)] = amount
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    return ([totals.get((day, 'income'), 0.0) for day in days],
+            [totals.get((day, 'expense'), 0.0) for day in days])
+
+
+def brute_force_average(db, days):
+    today = date.today()
+    income, expenses = daily_totals_by_sql(db, today - timedelta(days=days - 1), today)
+    return {
+        'avg_daily_income': statistics.mean(income),
+        'avg_daily_expenses': statistics.mean(expenses),
+        'median_daily_expenses': statistics.median(expenses),
+        'expense_volatility': statistics.stdev(expenses),
+        'daily_nets': [i - e for i, e in zip(income, expenses)],
+    }
+
+
+def brute_force_ewma(db):
+    """EWMA of daily expenses from the first transaction to today, folding today in last"""
+    first = db.session.query(func.min(Transaction.date_created)).scalar().date()
+    _, expenses = daily_totals_by_sql(db, min(first, date.today() - timedelta(days=89)), date.today())
+    alpha = 1 - 0.5 ** (1 / EWMA_HALFLIFE_DAYS)
+    mean, variance = None, 0.0
+    for total in expenses:
+        if mean is None:
+            mean = total
+        else:
+            delta = total - mean
+            mean, variance = mean + alpha * delta, (1 - alpha) * (variance + alpha * delta * delta)
+    return mean, math.sqrt(variance)
+
+
+def assert_matches_sql(db, days):
+    actual = FinancialCalculator.calculate_moving_average(days)
+    expected = brute_force_average(db, days)
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, abs=1e-9), (days, key)
+    assert len(actual['daily_data']) == days
+
+
+def seed(add_transaction):
+    now = datetime.now()
+    rows = []
+    for offset in range(0, 120, 2):
+        when = now - timedelta(days=offset)
+        rows.append(add_transaction(40 + offset % 13, 'expense', date_created=when))
+        if offset % 14 == 0:
+            rows.append(add_transaction(900, 'income', date_created=when))
+    return rows
+
+
+@pytest.mark.parametrize('days', [7, 30, 90, 45])
+def test_moving_average_matches_sql(db, add_transaction, days):
+    seed(add_transaction)
+    assert_matches_sql(db, days)
+
+
+def test_moving_average_follows_writes(db, add_transaction, delete_transaction):
+    rows = seed(add_transaction)
+    for days in (7, 30, 90):
+        FinancialCalculator.calculate_moving_average(days)
+
+    now = datetime.now()
+    add_transaction(75, 'expense', date_created=now)
+    add_transaction(30, 'expense', date_created=now - timedelta(days=5))  # back-dated
+    add_transaction(500, 'income', date_created=now + timedelta(days=3))  # future-dated, outside the window
+    delete_transaction(rows[3].id)
+
+    for days in (7, 30, 90):
+        assert_matches_sql(db, days)
+
+    averages = FinancialCalculator.calculate_moving_average(30)
+    mean, volatility = brute_force_ewma(db)
+    assert averages['ewma_daily_expenses'] == pytest.approx(mean)
+    assert averages['ewma_expense_volatility'] == pytest.approx(volatility)
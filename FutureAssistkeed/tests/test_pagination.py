@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from models import Transaction, CategoryCount
+from pagination import keyset_paginate, decode_cursor, encode_cursor
+from financial_calculator import FinancialSnapshot
+
+
+def seed(add_transaction):
+    now = datetime(2026, 3, 1, 12)
+    for index in range(47):
+        # Every third row shares its timestamp with the previous one, so ids break ties
+        when = now - timedelta(hours=index - index // 3)
+        add_transaction(10 + index, 'income' if index % 5 == 0 else 'expense',
+                        'salary' if index % 5 == 0 else ('food', 'housing')[index % 2], date_created=when)
+
+
+def newest_first(query):
+    return [t.id for t in query.order_by(Transaction.date_created.desc(), Transaction.id.desc())]
+
+
+def walk(query, per_page=10):
+    """Page forward to the end, then back to the start; ids seen each way"""
+    forward, pages = [], []
+    page = keyset_paginate(query, per_page=per_page)
+    while True:
+        pages.append(page)
+        forward.extend(t.id for t in page.items)
+        if not page.has_next:
+            break
+        page = keyset_paginate(query, after=decode_cursor(page.next_cursor), per_page=per_page)
+
+    backward = [t.id for t in page.items]
+    while page.has_prev:
+        page = keyset_paginate(query, before=decode_cursor(page.prev_cursor), per_page=per_page)
+        backward = [t.id for t in page.items] + backward
+    return forward, backward, pages
+
+
+def test_pages_cover_every_row_once(db, add_transaction):
+    seed(add_transaction)
+    for transaction_type, category in (('all', 'all'), ('expense', 'all'), ('all', 'food')):
+        query = Transaction.apply_filters(Transaction.query, transaction_type, category)
+        forward, backward, pages = walk(query)
+
+        assert forward == newest_first(query)
+        assert backward == forward
+        assert not pages[0].has_prev and not pages[-1].has_next
+        assert CategoryCount.total(transaction_type, category) == len(forward)
+
+
+def test_cursor_round_trip_and_invalid_cursors(db, add_transaction):
+    transaction = add_transaction(5, date_created=datetime(2026, 1, 2, 3, 4, 5, 678))
+    assert decode_cursor(encode_cursor(transaction)) == (transaction.date_created, transaction.id)
+    assert decode_cursor('garbage') is None
+    assert decode_cursor('') is None
+
+
+def test_deep_page_route(client, db, add_transaction):
+    seed(add_transaction)
+    ids = newest_first(Transaction.query)
+    cursor = encode_cursor(db.session.get(Transaction, ids[39]))
+
+    page = keyset_paginate(Transaction.query, after=decode_cursor(cursor))
+    assert [t.id for t in page.items] == ids[40:]
+    assert client.get(f'/transactions?after={cursor}').status_code == 200
+
+
+def test_category_list_is_maintained_on_write(db, add_transaction, delete_transaction):
+    first = add_transaction(10, 'expense', 'food')
+    add_transaction(20, 'income', 'salary')
+    assert CategoryCount.list_categories() == ['food', 'salary']
+    assert FinancialSnapshot().versioned(('categories',), CategoryCount.list_categories) == ['food', 'salary']
+
+    delete_transaction(first.id)
+    add_transaction(5, 'expense', 'housing')
+    assert CategoryCount.list_categories() == ['housing', 'salary']
+    # The ledger version moved, so the cached list is not reused
+    assert FinancialSnapshot().versioned(('categories',), CategoryCount.list_categories) == ['housing', 'salary']
+
+
+def test_record_counts_is_one_statement(db, add_transaction):
+    from sqlalchemy import event
+
+    add_transaction(10, 'expense', 'food')
+    statements = []
+    listener = lambda connection, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        CategoryCount.record_counts({('food', 'expense'): 2, ('rent', 'expense'): 1, ('salary', 'income'): 3})
+        db.session.flush()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len([statement for statement in statements if 'category_counts' in statement]) == 1
+    assert CategoryCount.total('expense') == 4
+    assert CategoryCount.total('income', 'salary') == 3
@@ -0,0 +1,25 @@
+from datetime import date, datetime
+import pytest
+import partitioning
+
+
+def test_month_helpers():
+    assert partitioning.month_start(datetime(2025, 6, 17, 8)) == date(2025, 6, 1)
+    assert partitioning.add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert partitioning.add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partitioning.partition_name(date(2025, 6, 1)) == 'transaction_y2025m06'
+    assert partitioning.parse_month('2025-06') == date(2025, 6, 1)
+    with pytest.raises(partitioning.PartitioningError, match='YYYY-MM'):
+        partitioning.parse_month('June')
+
+
+def test_sqlite_is_left_unpartitioned(app, db):
+    assert not partitioning.is_supported()
+    assert not partitioning.is_partitioned()
+    with pytest.raises(partitioning.PartitioningError, match='postgresql'):
+        partitioning.ensure_future_partitions()
+
+    for command in ('partition-transactions', 'create-partitions', 'list-partitions'):
+        result = app.test_cli_runner().invoke(args=[command])
+        assert result.exit_code == 1
+        assert 'requires the postgresql storage profile' in result.output
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import rolling_stats
+from financial_calculator import FinancialCalculator, FinancialSnapshot
+from models import Transaction
+
+
+def count_calls(monkeypatch, owner, name):
+    calls = []
+    original = getattr(owner, name)
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(owner, name, counted)
+    return calls
+
+
+def test_snapshot_computes_each_figure_once(db, add_transaction, monkeypatch):
+    add_transaction(1000, 'income', date_created=datetime.now() - timedelta(days=3))
+    add_transaction(120, 'expense')
+
+    summaries = count_calls(monkeypatch, Transaction, 'get_monthly_summary')
+    windows = count_calls(monkeypatch, rolling_stats, 'window_stats')
+
+    snapshot = FinancialSnapshot()
+    FinancialCalculator.generate_alerts(snapshot)
+    FinancialCalculator.forecast_balance(snapshot=snapshot)
+    FinancialCalculator.forecast_balance(snapshot=snapshot)
+    snapshot.monthly_summary
+
+    assert len(summaries) == 1
+    assert len(windows) == 1
+    assert snapshot.current_balance == 880
+
+
+def test_dashboard_uses_one_snapshot(client, add_transaction, monkeypatch):
+    add_transaction(1000, 'income', date_created=datetime.now() - timedelta(days=3))
+    add_transaction(120, 'expense')
+
+    summaries = count_calls(monkeypatch, Transaction, 'get_monthly_summary')
+    windows = count_calls(monkeypatch, rolling_stats, 'window_stats')
+
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'880.00' in response.data
+    assert len(summaries) == 1
+    assert len(windows) == 1
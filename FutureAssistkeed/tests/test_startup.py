@@ -0,0 +1,19 @@
+import json
+import os
+import subprocess
+import sys
+from benchmarks.startup import APP_DIR, HEAVY_MODULES
+
+PROBE = f"""
+import json, sys
+import main
+print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))
+"""
+
+
+def test_boot_path_skips_heavy_modules(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}", STORAGE_PROFILE='sqlite')
+    env.pop('AUTO_MIGRATE', None)
+    completed = subprocess.run([sys.executable, '-c', PROBE], cwd=APP_DIR, env=env,
+                               capture_output=True, text=True, check=True)
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,44 @@
+import pytest
+import storage
+
+
+def test_profile_follows_database_url(monkeypatch, tmp_path):
+    monkeypatch.delenv('STORAGE_PROFILE', raising=False)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    uri = storage.database_uri(str(tmp_path))
+    assert uri == f"sqlite:///{tmp_path / 'financial_tracker.db'}"
+    assert storage.resolve_profile(uri) == 'sqlite'
+
+    monkeypatch.setenv('DATABASE_URL', 'postgres://user@host/db')
+    uri = storage.database_uri(str(tmp_path))
+    assert uri == 'postgresql://user@host/db'
+    assert storage.resolve_profile(uri) == 'postgresql'
+
+    monkeypatch.setenv('STORAGE_PROFILE', 'mysql')
+    with pytest.raises(ValueError, match='Unknown STORAGE_PROFILE'):
+        storage.resolve_profile(uri)
+
+
+def test_environment_overrides(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '12')
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '250')
+    options = storage.engine_options('postgresql')
+    assert (options['pool_size'], options['max_overflow'], options['pool_pre_ping']) == (12, 5, True)
+    assert storage.engine_options('sqlite') == {}
+    assert storage.sqlite_pragmas()['busy_timeout'] == '250'
+
+
+def test_sqlite_profile_needs_sqlite_url(monkeypatch, tmp_path):
+    from flask import Flask
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://user@host/db')
+    monkeypatch.setenv('STORAGE_PROFILE', 'sqlite')
+    with pytest.raises(ValueError, match='needs a sqlite://'):
+        storage.configure_storage(Flask(__name__), str(tmp_path))
+
+
+def test_live_engine_uses_wal(db):
+    report = storage.describe(db)
+    assert report['dialect'] == 'sqlite'
+    assert report['journal_mode'] == 'wal'
+    assert report['synchronous'] == 1  # NORMAL
+    assert report['busy_timeout'] == storage.SQLITE_PRAGMAS['busy_timeout']
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+import pytest
+from models import Transaction, BalanceLedger, DailyTotal
+from synthetic_data import calendar, generate_rows, generate_dataset, INCOME_PROFILES
+
+END_DATE = date(2026, 3, 31)
+
+
+def flatten(chunks):
+    return [row for chunk in chunks for row in chunk]
+
+
+def test_same_seed_same_rows_whatever_the_chunk_size():
+    rows = flatten(generate_rows(seed=7, users=3, years=0.5, end_date=END_DATE, chunk_size=50000))
+    assert rows == flatten(generate_rows(seed=7, users=3, years=0.5, end_date=END_DATE, chunk_size=37))
+    assert rows != flatten(generate_rows(seed=8, users=3, years=0.5, end_date=END_DATE))
+
+    first_day = END_DATE - timedelta(days=round(0.5 * 365) - 1)
+    assert all(first_day <= row['date_created'].date() <= END_DATE for row in rows)
+    assert all(row['amount'] > 0 for row in rows)
+    assert {row['transaction_type'] for row in rows} == {'income', 'expense'}
+
+
+@pytest.mark.parametrize('profile', list(INCOME_PROFILES))
+def test_profiles_generate_income(profile):
+    rows = flatten(generate_rows(seed=1, users=2, years=0.25, profile=profile, end_date=END_DATE))
+    assert any(row['transaction_type'] == 'income' for row in rows)
+
+
+def test_max_rows_and_unknown_profile():
+    assert len(flatten(generate_rows(seed=1, users=None, max_rows=250, end_date=END_DATE, chunk_size=100))) == 250
+    with pytest.raises(ValueError, match='Unknown income profile'):
+        list(generate_rows(profile='lottery'))
+
+
+def test_calendar_matches_dates():
+    start = date(2024, 2, 27)
+    weekdays, month_days = calendar(start, 5)
+    days = [start + timedelta(days=offset) for offset in range(5)]
+    assert weekdays.tolist() == [day.weekday() for day in days]
+    assert month_days.tolist() == [day.day for day in days]
+
+
+def test_generated_dataset_keeps_aggregates(app, db, add_transaction):
+    add_transaction(10, 'expense')
+    result = app.test_cli_runner().invoke(args=['generate-data', '--seed', '3', '--users', '2', '--years', '0.2',
+                                                '--end-date', '2026-03-31', '--replace', '--chunk-size', '100'])
+    assert result.exit_code == 0, result.output
+
+    rows = flatten(generate_rows(seed=3, users=2, years=0.2, end_date=END_DATE))
+    assert Transaction.query.count() == len(rows)
+    assert BalanceLedger.check_consistency()['consistent']
+    assert sum(row.count for row in DailyTotal.query) == len(rows)
+
+    summary = generate_dataset(seed=3, users=1, years=0.1, end_date=END_DATE, replace=True)
+    assert summary['rows'] == Transaction.query.count()
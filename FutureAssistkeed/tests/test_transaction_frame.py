@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+import pytest
+import transaction_frame
+from models import BalanceLedger
+
+# The real loader, kept before any test swaps it out
+load_frame = transaction_frame.load_frame
+
+
+def frame_rows(frame):
+    """The frame's rows as sorted (day, amount, category) tuples"""
+    days, amounts, categories = frame.columns()
+    return sorted(zip(days.tolist(), amounts.tolist(), (frame.labels[code] for code in categories.tolist())))
+
+
+def fresh_rows():
+    return frame_rows(load_frame(BalanceLedger.get()))
+
+
+@pytest.fixture
+def forbid_reload(monkeypatch):
+    """Call to fail the test if current_frame() then reloads the whole table"""
+    def load_frame(ledger):
+        raise AssertionError('frame was reloaded')
+    return lambda: monkeypatch.setattr(transaction_frame, 'load_frame', load_frame)
+
+
+def seed(add_transaction, days=10):
+    now = datetime.now()
+    rows = []
+    for offset in range(days):
+        date = now - timedelta(days=offset)
+        rows.append(add_transaction(500, 'income', date_created=date))
+        rows.append(add_transaction(20 + offset, 'expense', 'food', date_created=date))
+        rows.append(add_transaction(7, 'expense', 'transport', date_created=date))
+    return rows
+
+
+def test_unchanged_ledger_reuses_frame(db, add_transaction):
+    seed(add_transaction)
+    frame = transaction_frame.current_frame()
+    assert transaction_frame.current_frame() is frame
+
+
+def test_inserts_are_appended(db, add_transaction, forbid_reload):
+    seed(add_transaction)
+    frame = transaction_frame.current_frame()
+    forbid_reload()
+
+    add_transaction(42, 'expense', 'food', date_created=datetime.now() - timedelta(days=30))
+    assert transaction_frame.current_frame() is frame
+    assert frame_rows(frame) == fresh_rows()
+
+
+def test_deletes_reread_only_their_days(db, add_transaction, delete_transaction, forbid_reload, monkeypatch):
+    rows = seed(add_transaction)
+    transaction_frame.current_frame()
+    forbid_reload()
+
+    reread = []
+    refresh_days = transaction_frame.refresh_days
+    monkeypatch.setattr(transaction_frame, 'refresh_days',
+                        lambda frame, days: reread.append(days) or refresh_days(frame, days))
+
+    delete_transaction(rows[4].id)
+    delete_transaction(rows[15].id)
+    add_transaction(9, 'expense', 'food', date_created=rows[15].date_created)
+    frame = transaction_frame.current_frame()
+
+    assert reread == [sorted({transaction_frame.day_number(rows[4].date_created),
+                              transaction_frame.day_number(rows[15].date_created)})]
+    assert frame_rows(frame) == fresh_rows()
+    assert len(frame) == BalanceLedger.get().transaction_count
+
+
+def test_rolling_stats_follow_deletes(db, add_transaction, delete_transaction):
+    import rolling_stats
+
+    rows = seed(add_transaction)
+    rolling_stats.window_stats(7)
+
+    delete_transaction(rows[1].id)
+    incremental = rolling_stats.window_stats(7)
+
+    transaction_frame.reset()
+    rebuilt = rolling_stats.window_stats(7)
+    assert incremental['expenses'] == pytest.approx(rebuilt['expenses'])
+    assert incremental['avg_expenses'] == pytest.approx(rebuilt['avg_expenses'])
+
+
+def test_rebuild_reloads_frame(db, add_transaction):
+    seed(add_transaction, days=2)
+    frame = transaction_frame.current_frame()
+
+    BalanceLedger.rebuild()
+    db.session.commit()
+    assert transaction_frame.current_frame() is not frame
+
+
+def archive_month(db, month_start, month_end):
+    """What partitioning.detach_partition does, emulated on SQLite: the month's
+    rows leave the table, their totals move to archived_partitions and the
+    daily_totals rollup keeps its rows"""
+    from sqlalchemy import func
+    from models import Transaction, ArchivedPartition, CategoryCount
+
+    in_month = Transaction.query.filter(Transaction.date_created >= month_start, Transaction.date_created < month_end)
+    income, expenses = (in_month.filter_by(transaction_type=kind).with_entities(func.sum(Transaction.amount)).scalar() or 0
+                        for kind in ('income', 'expense'))
+    counts = in_month.with_entities(Transaction.category, Transaction.transaction_type, func.count()).group_by(
+        Transaction.category, Transaction.transaction_type).all()
+    db.session.add(ArchivedPartition(name='transaction_archived', range_start=month_start.date(),
+                                     range_end=month_end.date(), total_income=income, total_expenses=expenses,
+                                     transaction_count=in_month.count()))
+    in_month.delete(synchronize_session=False)
+    CategoryCount.record_counts({(category, kind): -count for category, kind, count in counts})
+    BalanceLedger.record_totals(removed=True)
+    db.session.commit()
+
+
+def test_archived_days_are_not_stale(db, add_transaction, delete_transaction, forbid_reload, monkeypatch):
+    now = datetime.now()
+    month_start = datetime(now.year - 1, now.month, 1)
+    month_end = datetime(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+    for offset in range(5):
+        add_transaction(30 + offset, 'expense', date_created=month_start + timedelta(days=offset))
+    rows = seed(add_transaction)
+
+    archive_month(db, month_start, month_end)
+    frame = transaction_frame.current_frame()
+    assert frame_rows(frame) == fresh_rows()
+    assert transaction_frame.stale_days(frame) == []
+    forbid_reload()
+
+    reread = []
+    refresh_days = transaction_frame.refresh_days
+    monkeypatch.setattr(transaction_frame, 'refresh_days',
+                        lambda frame, days: reread.append(days) or refresh_days(frame, days))
+    delete_transaction(rows[4].id)
+    frame = transaction_frame.current_frame()
+
+    assert reread == [[transaction_frame.day_number(rows[4].date_created)]]
+    assert frame_rows(frame) == fresh_rows()
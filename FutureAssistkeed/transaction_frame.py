@@ -0,0 +1,294 @@
+"""
+Compact, read-only in-memory copy of the transaction table.
+
+The calculator's moving averages, the forecast history and the spending
+alerts all read overlapping windows of the same rows. A TransactionFrame
+holds the columns they need once per process:
+
+- days:       int32 day numbers (days since 1970-01-01)
+- amounts:    float64, positive for income and negative for expenses
+- categories: int16 codes into labels, interned in order of first appearance
+
+Rows are kept sorted by day, so a date window is two binary searches. That
+is 14 bytes per row, about 1.4 MB per 100k transactions (benchmarks/suite.py
+reports the measured size per dataset). Descriptions and exact times are
+not kept; use the ORM for those. The rolling window statistics
+(rolling_stats.py) are built from a frame and updated by its appends.
+
+current_frame() keeps the frame in step with the balance ledger. The frame
+records the ledger version, epoch and deletion count it reflects:
+
+- same version: the frame is current and no query is issued.
+- same epoch, newer version: the rows with a larger id are appended with
+  one indexed query.
+- rows were deleted, or the row count does not add up (e.g. concurrent
+  PostgreSQL inserts that committed out of id order): the per-day row
+  counts are compared with the daily_totals rollup, and only the days
+  that differ are re-read, into a copy of the frame.
+- new epoch (aggregates rebuilt or a partition detached), or the count
+  still does not add up: the frame is reloaded.
+"""
+
+import threading
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from sqlalchemy import select, func, case, cast, String, and_, or_, not_
+from app import db
+from models import Transaction, BalanceLedger, ArchivedPartition, DailyTotal
+
+EPOCH_DAY = date(1970, 1, 1)
+LOAD_CHUNK_SIZE = 50000
+
+
+def day_number(value):
+    """Days since 1970-01-01 for a date or datetime"""
+    if hasattr(value, 'date'):
+        value = value.date()
+    return (value - EPOCH_DAY).days
+
+
+class TransactionFrame:
+    """Day-sorted transaction columns with amortized O(1) appends.
+
+    The buffers are swapped as one tuple and rows below `size` are never
+    written in place, so columns() taken while another thread appends
+    stays a consistent copy.
+    """
+
+    DTYPES = (np.int32, np.float64, np.int16)
+
+    def __init__(self, capacity=1024):
+        self._buffers = tuple(np.empty(capacity, dtype=dtype) for dtype in self.DTYPES)
+        self.size = 0
+        self.labels = []
+        self.codes = {}
+        self.max_id = 0
+        self.version = None
+        self.epoch = None
+        self.deletions = None
+        # RollingStats derived from these rows (rolling_stats.py), fed by append_rows
+        self.rolling = None
+
+    def __len__(self):
+        return self.size
+
+    def columns(self):
+        """(days, amounts, categories) views of the current rows"""
+        size = self.size
+        return tuple(buffer[:size] for buffer in self._buffers)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column buffers, including unused capacity"""
+        return sum(buffer.nbytes for buffer in self._buffers)
+
+    def intern(self, category):
+        code = self.codes.get(category)
+        if code is None:
+            code = self.codes[category] = len(self.labels)
+            self.labels.append(category)
+        return code
+
+    def reserve(self, capacity):
+        if capacity <= len(self._buffers[0]):
+            return
+        grown = tuple(np.empty(capacity, dtype=dtype) for dtype in self.DTYPES)
+        for old, new in zip(self._buffers, grown):
+            new[:self.size] = old[:self.size]
+        self._buffers = grown
+
+    def append_rows(self, rows):
+        """Append (id, 'YYYY-MM-DD', signed amount, category) rows, e.g. from load_rows()"""
+        if not rows:
+            return
+        ids, days, amounts, categories = zip(*rows)
+        start, end = self.size, self.size + len(rows)
+        if end > len(self._buffers[0]):
+            self.reserve(max(end, 2 * len(self._buffers[0])))
+
+        day_buffer, amount_buffer, category_buffer = self._buffers
+        days = np.array(days, dtype='datetime64[D]').astype(np.int32)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        day_buffer[start:end] = days
+        amount_buffer[start:end] = amounts
+        category_buffer[start:end] = np.fromiter(
+            (self.intern(category) for category in categories), dtype=np.int16, count=len(rows)
+        )
+        self.max_id = max(self.max_id, max(ids))
+
+        # Back-dated rows (e.g. an imported statement) land out of order
+        if np.any(np.diff(day_buffer[max(start - 1, 0):end]) < 0):
+            order = np.argsort(day_buffer[:end], kind='stable')
+            sorted_buffers = tuple(np.empty(len(buffer), dtype=buffer.dtype) for buffer in self._buffers)
+            for old, new in zip(self._buffers, sorted_buffers):
+                new[:end] = old[:end][order]
+            self._buffers = sorted_buffers
+        self.size = end
+
+        if self.rolling is not None:
+            self.rolling.add_many(days, amounts)
+
+    def without_days(self, day_numbers):
+        """Copy of the frame minus the rows dated on day_numbers.
+
+        A copy rather than an edit in place, so threads still reading this
+        frame keep a consistent view. The rolling stats are not carried
+        over; they are rebuilt from the copy on first use.
+        """
+        days, amounts, categories = self.columns()
+        keep = ~np.isin(days, day_numbers)
+        frame = TransactionFrame(capacity=len(self._buffers[0]))
+        for column, buffer in zip((days, amounts, categories), frame._buffers):
+            kept = column[keep]
+            buffer[:len(kept)] = kept
+        frame.size = int(np.count_nonzero(keep))
+        frame.labels, frame.codes = list(self.labels), dict(self.codes)
+        frame.max_id, frame.version, frame.epoch, frame.deletions = (
+            self.max_id, self.version, self.epoch, self.deletions
+        )
+        return frame
+
+    def window(self, start_day, end_day, days=None):
+        """Slice of the rows dated in [start_day, end_day)"""
+        if days is None:
+            days = self.columns()[0]
+        start = np.searchsorted(days, day_number(start_day), side='left')
+        end = np.searchsorted(days, day_number(end_day), side='left')
+        return slice(int(start), int(end))
+
+    def daily_totals(self, start_day, end_day):
+        """(income, expenses) arrays with one total per day in [start_day, end_day)"""
+        days, amounts, _ = self.columns()
+        rows = self.window(start_day, end_day, days)
+        offsets = days[rows] - day_number(start_day)
+        amounts = amounts[rows]
+        length = (end_day - start_day).days
+        income = np.bincount(offsets, weights=np.where(amounts > 0, amounts, 0), minlength=length)
+        expenses = np.bincount(offsets, weights=np.where(amounts < 0, -amounts, 0), minlength=length)
+        return income, expenses
+
+
+def day_ranges(day_numbers):
+    """Sorted day numbers as half-open [start, end) datetime ranges, one per run of consecutive days"""
+    ranges = []
+    for day in day_numbers:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + 1
+        else:
+            ranges.append([day, day + 1])
+    return [tuple(datetime.combine(EPOCH_DAY + timedelta(days=int(day)), time()) for day in pair)
+            for pair in ranges]
+
+
+def load_rows(after_id=0, through_id=None, days=None):
+    """Chunks of (id, day text, signed amount, category) rows with id > after_id
+
+    through_id caps the ids, and days (sorted day numbers) limits the rows
+    to those dated on one of them.
+    """
+    signed_amount = case((Transaction.transaction_type == 'income', Transaction.amount),
+                         else_=-Transaction.amount)
+    query = select(Transaction.id, cast(func.date(Transaction.date_created), String), signed_amount,
+                   Transaction.category).where(Transaction.id > after_id)
+    if through_id is not None:
+        query = query.where(Transaction.id <= through_id)
+    if days is not None:
+        query = query.where(or_(*(
+            and_(Transaction.date_created >= start, Transaction.date_created < end)
+            for start, end in day_ranges(days)
+        )))
+    # Core execution: these are plain tuples, so skip the ORM's row processing
+    result = db.session.connection().execute(
+        query.order_by(Transaction.id).execution_options(yield_per=LOAD_CHUNK_SIZE)
+    )
+    for chunk in result.partitions():
+        yield chunk
+
+
+def live_row_count(ledger):
+    """Rows in the transaction table according to the ledger (which also counts archived rows)"""
+    return ledger.transaction_count - ArchivedPartition.totals()[2]
+
+
+def stale_days(frame):
+    """Day numbers whose row count in the frame differs from the daily_totals rollup
+
+    Days of archived (detached) partitions are skipped: the rollup keeps
+    their totals, but their rows are no longer in the table or the frame.
+    """
+    archived = db.session.query(ArchivedPartition.range_start, ArchivedPartition.range_end).all()
+    archived_days = [(day_number(start), day_number(end)) for start, end in archived]
+
+    def is_archived(day):
+        return any(start <= day < end for start, end in archived_days)
+
+    frame_days, frame_counts = np.unique(frame.columns()[0], return_counts=True)
+    counts = dict(zip(frame_days.tolist(), frame_counts.tolist()))
+
+    stale = []
+    rows = db.session.query(DailyTotal.day, func.sum(DailyTotal.count)).group_by(DailyTotal.day)
+    if archived:
+        rows = rows.filter(not_(or_(*(
+            and_(DailyTotal.day >= start, DailyTotal.day < end) for start, end in archived
+        ))))
+    for day, count in rows:
+        if counts.pop(day_number(day), 0) != count:
+            stale.append(day_number(day))
+    # Days the frame has but the rollup does not
+    stale.extend(day for day in counts if not is_archived(day))
+    return sorted(stale)
+
+
+def refresh_days(frame, days):
+    """Copy of the frame with the rows dated on `days` re-read from the table"""
+    frame = frame.without_days(days)
+    for chunk in load_rows(through_id=frame.max_id, days=days):
+        frame.append_rows(chunk)
+    return frame
+
+
+def load_frame(ledger):
+    expected = live_row_count(ledger)
+    frame = TransactionFrame(capacity=max(expected, 1024))
+    for chunk in load_rows():
+        frame.append_rows(chunk)
+    frame.version, frame.epoch, frame.deletions = ledger.version, ledger.epoch, ledger.deletions
+    return frame
+
+
+_frame = None
+# Held while the frame is loaded or appended to, and while state derived from it is built
+lock = threading.Lock()
+
+
+def current_frame():
+    """The process-wide frame, brought up to date with the ledger"""
+    global _frame
+    ledger = BalanceLedger.get()
+
+    with lock:
+        frame = _frame
+        if frame is not None and frame.version == ledger.version:
+            return frame
+
+        if frame is not None and frame.epoch == ledger.epoch:
+            for chunk in load_rows(after_id=frame.max_id):
+                frame.append_rows(chunk)
+            expected = live_row_count(ledger)
+            if frame.deletions != ledger.deletions or frame.size != expected:
+                days = stale_days(frame)
+                if days:
+                    _frame = frame = refresh_days(frame, days)
+            if frame.size == expected:
+                frame.version, frame.deletions = ledger.version, ledger.deletions
+                return frame
+
+        _frame = load_frame(ledger)
+        return _frame
+
+
+def reset():
+    """Drop the process-wide frame (it is reloaded on next use)"""
+    global _frame
+    with lock:
+        _frame = None